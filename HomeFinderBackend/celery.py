@@ -16,6 +16,11 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Load task-specific configuration from celeryconfig.py
 app.config_from_object('HomeFinderBackend.celeryconfig')
 
+# celeryconfig replaces the settings above; keep eager mode from Django
+# settings (test_settings runs tasks inline)
+app.conf.task_always_eager = getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False)
+app.conf.task_eager_propagates = getattr(settings, 'CELERY_TASK_EAGER_PROPAGATES', False)
+
 # Auto-discover tasks in all installed apps
 app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)
 
@@ -34,4 +39,25 @@ app.conf.beat_schedule = {
         'task': 'payments.tasks.cleanup_expired_transactions',
         'schedule': 300.0,  # Run every 5 minutes (300 seconds)
     },
+    'refresh-similarity-matrix': {
+        'task': 'properties.tasks.refresh_similarity_matrix',
+        'schedule': crontab(minute='*/5'),  # Every 5 minutes
+    },
+    'rebuild-similarity-matrix': {
+        'task': 'properties.tasks.refresh_similarity_matrix',
+        'schedule': crontab(minute=30, hour=3),  # Nightly
+        'kwargs': {'full': True},
+    },
+    'refresh-price-stats': {
+        'task': 'properties.tasks.refresh_price_stats',
+        'schedule': crontab(minute=15),  # Hourly
+    },
+    'match-saved-searches': {
+        'task': 'properties.tasks.match_saved_searches',
+        'schedule': crontab(minute='*'),  # Every minute
+    },
+    'flush-property-views': {
+        'task': 'properties.tasks.flush_property_views',
+        'schedule': crontab(minute='*/5'),  # Every 5 minutes
+    },
 }
\ No newline at end of file
@@ -50,6 +50,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # Trigram lookups for fuzzy city matching
     'storages',
 
     # Third-party apps
@@ -174,6 +175,10 @@ STORAGES = {
     },
 }
 
+# Property images are uploaded straight to the bucket with presigned POSTs
+PROPERTY_IMAGE_UPLOAD_BACKEND = 'properties.uploads.S3UploadBackend'
+PROPERTY_IMAGE_UPLOAD_MAX_BYTES = 20 * 1024 * 1024
+
 # Media files configuration
 MEDIA_URL = f"https://{os.getenv('AWS_STORAGE_BUCKET_NAME')}.s3.{os.getenv('AWS_S3_REGION_NAME', 'us-east-1')}.amazonaws.com/media/"
 MEDIA_ROOT = "media/"
@@ -300,6 +305,15 @@ CACHES = {
 # Cache time to live is 15 minutes
 CACHE_TTL = 60 * 15
 
+# In-process NumPy index for simple property list filters (per gunicorn worker)
+PROPERTY_SEARCH_INDEX_ENABLED = os.getenv('PROPERTY_SEARCH_INDEX_ENABLED', 'False').lower() == 'true'
+PROPERTY_SEARCH_INDEX_REFRESH_SECONDS = int(os.getenv('PROPERTY_SEARCH_INDEX_REFRESH_SECONDS', '5'))
+PROPERTY_SEARCH_INDEX_REBUILD_SECONDS = int(os.getenv('PROPERTY_SEARCH_INDEX_REBUILD_SECONDS', '600'))
+
+# Reverse proxies in front of gunicorn that append to X-Forwarded-For; the
+# view counter trusts that many hops of the header and no more
+PROPERTY_VIEW_TRUSTED_PROXIES = int(os.getenv('PROPERTY_VIEW_TRUSTED_PROXIES', '0'))
+
 # Logging configuration
 LOG_DIR = os.path.join(BASE_DIR, 'logs')
 os.makedirs(LOG_DIR, exist_ok=True)  # Ensure log directory exists
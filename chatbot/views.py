@@ -412,9 +412,8 @@ def format_property_response(properties, context=None):
                     f"in {prop.city}, {prop.state} for ${int(prop.price):,}.")
 
         # Add a primary image URL if available
-        primary_image = PropertyImage.objects.filter(property=prop, is_primary=True).first()
-        if primary_image:
-            response += f" You can view the primary image at {primary_image.image.url}"
+        if prop.primary_image_url:
+            response += f" You can view the primary image at {prop.primary_image_url}"
 
         return response, {"properties": [{"id": prop.id, "title": prop.title}]}
     else:
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Property, PropertyType, PropertyImage, Favorite, Reservation
+from .models import Property, PropertyType, PropertyImage, Favorite, Reservation, CityPriceStats, SavedSearch
 
 @admin.register(Property)
 class PropertyAdmin(admin.ModelAdmin):
@@ -32,3 +32,15 @@ class ReservationAdmin(admin.ModelAdmin):
     readonly_fields = ('booking_fee', 'total_amount', 'payment_reference')
     date_hierarchy = 'created_at'
     ordering = ('-created_at',)
+
+@admin.register(CityPriceStats)
+class CityPriceStatsAdmin(admin.ModelAdmin):
+    list_display = ('city', 'listing_type', 'bedrooms', 'listings', 'price_median', 'computed_at')
+    list_filter = ('listing_type', 'bedrooms')
+    search_fields = ('city',)
+
+@admin.register(SavedSearch)
+class SavedSearchAdmin(admin.ModelAdmin):
+    list_display = ('user', 'name', 'filters', 'matched_until', 'created_at')
+    search_fields = ('user__username', 'name')
+    raw_id_fields = ('user',)
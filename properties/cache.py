@@ -0,0 +1,158 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.conf import settings
+
+CACHE_TTL = getattr(settings, 'CACHE_TTL', DEFAULT_TIMEOUT)
+
+# Generation namespaces. Every cached key embeds the current generation of the
+# namespaces it depends on; bumping a counter orphans all of those keys at
+# once, so invalidation is a single INCR and never needs a key scan. Orphaned
+# entries simply age out through their TTL.
+LIST_NAMESPACE = 'list'
+PROPERTY_TYPE_NAMESPACE = 'property_types'
+PRICE_STATS_NAMESPACE = 'price_stats'
+
+
+def property_namespace(property_id):
+    return f'property:{property_id}'
+
+
+def owner_namespace(user_id):
+    return f'owner:{user_id}'
+
+
+def favorites_namespace(user_id):
+    return f'favorites:{user_id}'
+
+
+def map_tile_namespace(tile):
+    return f'map:{tile}'
+
+
+def property_reviews_namespace(property_id):
+    return f'reviews:{property_id}'
+
+
+def _generation_key(namespace):
+    return f'gen:{namespace}'
+
+
+def _seed():
+    # Seed from the clock so an evicted counter never reuses an old value
+    return int(time.time() * 1000)
+
+
+def get_generations(*namespaces):
+    """Return the current generation of each namespace, in one round trip."""
+    keys = [_generation_key(namespace) for namespace in namespaces]
+    found = cache.get_many(keys)
+    generations = []
+    for key in keys:
+        if key not in found:
+            cache.add(key, _seed(), None)
+            found[key] = cache.get(key, 0)
+        generations.append(found[key])
+    return generations
+
+
+def bump_generation(*namespaces):
+    for namespace in namespaces:
+        key = _generation_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _seed(), None)
+
+
+def generation_key(prefix, namespaces, *parts):
+    """
+    Build a cache key of the form ``prefix:<gen>[:<gen>...]:<parts>`` for the
+    given namespaces.
+    """
+    generations = get_generations(*namespaces)
+    return ':'.join(str(part) for part in (prefix, *generations, *parts))
+
+
+def query_fingerprint(query_params):
+    """
+    Canonical digest of a QueryDict: parameters are sorted by name (and values
+    within a name), so ``?city=a&min_price=1`` and ``?min_price=1&city=a``
+    map to the same key.
+    """
+    items = sorted(
+        (key, value)
+        for key, values in query_params.lists()
+        for value in values
+    )
+    return hashlib.md5(urlencode(items).encode('utf-8')).hexdigest()
+
+
+def property_list_cache_key(request, user_id=None):
+    """
+    Pass ``user_id`` for pages carrying per-user data (``is_favorited``);
+    those are cached per user and also expire with the user's favorites.
+    """
+    # Pagination links are absolute, so the host is part of the page
+    namespaces = [LIST_NAMESPACE]
+    parts = [request.get_host(), query_fingerprint(request.query_params)]
+    if user_id is not None:
+        namespaces.append(favorites_namespace(user_id))
+        parts.append(f'u{user_id}')
+    return generation_key('property_list_page', namespaces, *parts)
+
+
+def property_facets_cache_key(request):
+    return generation_key(
+        'property_facets', [LIST_NAMESPACE], query_fingerprint(request.query_params)
+    )
+
+
+def property_detail_cache_key(property_id):
+    # The entry embeds the property type too; its owner is checked per entry
+    # (see PropertyDetailView.get_object), as the key is built before it is known
+    return generation_key(
+        'property_detail', [property_namespace(property_id), PROPERTY_TYPE_NAMESPACE], property_id
+    )
+
+
+def property_images_cache_key(property_id):
+    return generation_key('property_images', [property_namespace(property_id)], property_id)
+
+
+def favorite_cards_cache_key(request):
+    user_id = request.user.pk
+    # Cards show listing data too, so any listing change expires them
+    return generation_key(
+        'favorite_cards', [LIST_NAMESPACE, favorites_namespace(user_id)],
+        user_id, request.get_host(), query_fingerprint(request.query_params)
+    )
+
+
+def favorite_ids_cache_key(user_id):
+    return generation_key('favorite_ids', [favorites_namespace(user_id)], user_id)
+
+
+def property_types_cache_key():
+    return generation_key('property_types_list', [PROPERTY_TYPE_NAMESPACE])
+
+
+def property_type_ids_cache_key():
+    return generation_key('property_type_ids', [PROPERTY_TYPE_NAMESPACE])
+
+
+def price_stats_cache_key(request):
+    return generation_key(
+        'price_stats', [PRICE_STATS_NAMESPACE], query_fingerprint(request.query_params)
+    )
+
+
+def similarity_matrix_cache_key():
+    return 'similarity_matrix'
+
+
+def similarity_version_cache_key():
+    return 'similarity_matrix_version'
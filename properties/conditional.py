@@ -0,0 +1,57 @@
+import functools
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    """Strong ETag from the version parts of a representation."""
+    digest = hashlib.md5(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'"{digest}"'
+
+
+def not_modified(request, etag=None, last_modified=None):
+    """
+    Return a 304 response when the client's copy is still current (per
+    ``If-None-Match`` / ``If-Modified-Since``), otherwise None.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag=None, last_modified=None):
+    """Attach ETag/Last-Modified to a 200 or 304 and ask clients to revalidate."""
+    if response.status_code not in (200, 304):
+        return response
+    if etag:
+        response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Clients may keep the copy but must revalidate it before reuse
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def conditional(validators):
+    """
+    Decorator for GET view methods. ``validators(view, request, *args,
+    **kwargs)`` returns ``(etag, last_modified)`` and must be cheap: when
+    the client's copy is current the method (and its serialization) is
+    skipped and a 304 is returned.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            etag, last_modified = validators(view, request, *args, **kwargs)
+            response = not_modified(request, etag, last_modified)
+            if response is not None:
+                return response
+            return set_validators(method(view, request, *args, **kwargs), etag, last_modified)
+        return wrapper
+    return decorator
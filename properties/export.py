@@ -0,0 +1,151 @@
+import csv
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.negotiation import BaseContentNegotiation
+
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+# Rows fetched per round trip; on PostgreSQL iterator() reads them through a
+# server-side cursor, so memory stays flat however large the table is
+EXPORT_CHUNK_SIZE = 2000
+# Rendered lines are joined into writes of about this many bytes
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+# (header, values() lookup) pairs for each export
+PROPERTY_EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('title', 'title'),
+    ('description', 'description'),
+    ('listing_type', 'listing_type'),
+    ('status', 'status'),
+    ('price', 'price'),
+    ('reservation_price', 'reservation_price'),
+    ('property_type', 'property_type__name'),
+    ('bedrooms', 'bedrooms'),
+    ('bathrooms', 'bathrooms'),
+    ('square_feet', 'square_feet'),
+    ('address', 'address'),
+    ('city', 'city'),
+    ('state', 'state'),
+    ('zip_code', 'zip_code'),
+    ('latitude', 'latitude'),
+    ('longitude', 'longitude'),
+    ('owner', 'owner_id'),
+    ('is_verified', 'is_verified'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+]
+RESERVATION_EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('property', 'property_id'),
+    ('user', 'user_id'),
+    ('reservation_price', 'reservation_price'),
+    ('booking_fee', 'booking_fee'),
+    ('total_amount', 'total_amount'),
+    ('status', 'status'),
+    ('payment_status', 'payment_status'),
+    ('payment_reference', 'payment_reference'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+]
+
+
+class ExportContentNegotiation(BaseContentNegotiation):
+    """
+    Export responses are rendered by export_response(), not a DRF renderer,
+    so an ``Accept: text/csv`` client must not be turned away with a 406.
+    Errors still render with the view's first renderer.
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0] if parsers else None
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class _Echo:
+    """File-like object whose write() hands the rendered line back."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def csv_lines(rows, headers):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+def ndjson_lines(rows, headers):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(dict(zip(headers, row))) + '\n'
+
+
+def buffered(lines, size=EXPORT_BUFFER_SIZE):
+    """Join small lines into larger UTF-8 writes."""
+    parts = []
+    length = 0
+    for line in lines:
+        data = line.encode('utf-8')
+        parts.append(data)
+        length += len(data)
+        if length >= size:
+            yield b''.join(parts)
+            parts = []
+            length = 0
+    if parts:
+        yield b''.join(parts)
+
+
+def gzipped(chunks):
+    """Compress a byte stream on the fly as a single gzip member."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def accepts_gzip(request):
+    return 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+
+
+def export_response(request, queryset, columns, export_format, filename):
+    """
+    Stream ``queryset`` as CSV or NDJSON. Rows are read as tuples with
+    ``values_list().iterator()`` and rendered one at a time; the body is
+    gzip-encoded on the fly when the client accepts it.
+    """
+    headers = [header for header, _ in columns]
+    rows = queryset.values_list(*[lookup for _, lookup in columns]) \
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    lines = csv_lines(rows, headers) if export_format == 'csv' else ndjson_lines(rows, headers)
+    body = buffered(lines)
+
+    use_gzip = accepts_gzip(request)
+    response = StreamingHttpResponse(
+        gzipped(body) if use_gzip else body,
+        content_type=EXPORT_CONTENT_TYPES[export_format],
+    )
+    if use_gzip:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
@@ -0,0 +1,108 @@
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.db import connections
+from django.db.models import CharField, Case, Count, F, Value, When
+from django.db.models.functions import Cast
+
+from .search import is_postgres
+
+# Upper bounds of the price buckets shown in the filter sidebar
+PRICE_BUCKET_EDGES = [10000, 50000, 100000, 500000, 1000000, 5000000, 10000000]
+
+FACET_FIELDS = OrderedDict([
+    ('listing_type', 'listing_type'),
+    ('bedrooms', 'bedrooms'),
+    ('property_type', 'facet_property_type'),
+    ('city', 'city'),
+    ('price', 'facet_price'),
+])
+
+
+def price_bucket_labels():
+    labels = []
+    lower = 0
+    for upper in PRICE_BUCKET_EDGES:
+        labels.append(f'{lower}-{upper}')
+        lower = upper
+    labels.append(f'{lower}+')
+    return labels
+
+
+def price_bucket_expression():
+    labels = price_bucket_labels()
+    return Case(
+        *[
+            When(price__lt=Decimal(upper), then=Value(label))
+            for upper, label in zip(PRICE_BUCKET_EDGES, labels)
+        ],
+        default=Value(labels[-1]),
+        output_field=CharField(),
+    )
+
+
+def _facet_rows(queryset):
+    return queryset.order_by().annotate(
+        facet_property_type=F('property_type__name'),
+        facet_price=price_bucket_expression(),
+    )
+
+
+def _grouping_sets(queryset):
+    """PostgreSQL: every facet from one scan with GROUP BY GROUPING SETS."""
+    columns = list(FACET_FIELDS.values())
+    inner_sql, params = _facet_rows(queryset).values(*columns).query.sql_with_params()
+    sql = (
+        'SELECT {groupings}, {columns}, COUNT(*) FROM ({inner}) facets '
+        'GROUP BY GROUPING SETS ({sets})'
+    ).format(
+        groupings=', '.join(f'GROUPING({column})' for column in columns),
+        columns=', '.join(columns),
+        inner=inner_sql,
+        sets=', '.join(f'({column})' for column in columns),
+    )
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        for row in cursor.fetchall():
+            flags, values, count = row[:len(columns)], row[len(columns):-1], row[-1]
+            # GROUPING() is 0 for the column this row is grouped by
+            index = flags.index(0)
+            yield index, values[index], count
+
+
+def _union_all(queryset):
+    """Other backends: one UNION ALL query with a GROUP BY per facet."""
+    rows = _facet_rows(queryset)
+    parts = [
+        rows.annotate(
+            facet_index=Value(index),
+            facet_value=Cast(column, CharField()),
+        ).values('facet_index', 'facet_value').annotate(count=Count('id')).order_by()
+        for index, column in enumerate(FACET_FIELDS.values())
+    ]
+    for row in parts[0].union(*parts[1:], all=True):
+        yield row['facet_index'], row['facet_value'], row['count']
+
+
+def compute_facets(queryset):
+    """
+    Counts per listing type, bedrooms, property type, city and price bucket
+    for an already-filtered Property queryset, in a single round trip.
+    """
+    names = list(FACET_FIELDS)
+    facets = OrderedDict((name, {}) for name in names)
+    rows = _grouping_sets(queryset) if is_postgres(queryset) else _union_all(queryset)
+    for index, value, count in rows:
+        if value is None:
+            continue
+        facets[names[index]][str(value)] = count
+
+    # Present values most-common first; price buckets keep their natural order
+    result = OrderedDict()
+    for name, counts in facets.items():
+        if name == 'price':
+            ordered = [(label, counts[label]) for label in price_bucket_labels() if label in counts]
+        else:
+            ordered = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        result[name] = [{'value': value, 'count': count} for value, count in ordered]
+    return result
@@ -0,0 +1,93 @@
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+# Entry kinds in a compiled plan
+VALUE, FILE, NESTED, COLUMN = range(4)
+
+
+class FastPathUnsupported(Exception):
+    pass
+
+
+def _compile(serializer, prefix=''):
+    """
+    Turn a serializer's readable fields into a flat plan of
+    ``(name, kind, column, converter, children)`` entries over ``values()``
+    columns. The converters are the serializer fields' own
+    ``to_representation`` methods, so the output matches field for field.
+    """
+    model = serializer.Meta.model
+    plan = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.SerializerMethodField):
+            # Method fields opt in by naming the column they can be served from
+            values_fields = getattr(serializer, 'values_fields', {})
+            if name not in values_fields:
+                raise FastPathUnsupported(f"{type(serializer).__name__}.{name}")
+            column, converter = values_fields[name]
+            plan.append((name, COLUMN, prefix + column, converter, None))
+        elif isinstance(field, serializers.BaseSerializer):
+            if getattr(field, 'many', False):
+                raise FastPathUnsupported(f"{type(serializer).__name__}.{name}")
+            children = _compile(field, prefix + field.source + '__')
+            # The foreign key column tells a missing relation apart from one
+            # whose fields are all null
+            plan.append((name, NESTED, prefix + field.source, None, children))
+        elif isinstance(field, serializers.FileField):
+            if not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+                raise FastPathUnsupported(f"{type(serializer).__name__}.{name}")
+            storage = model._meta.get_field(field.source).storage
+            plan.append((name, FILE, prefix + field.source, storage, None))
+        elif isinstance(field, (serializers.RelatedField, serializers.ModelField)) \
+                or '.' in field.source or field.source == '*':
+            raise FastPathUnsupported(f"{type(serializer).__name__}.{name}")
+        else:
+            plan.append((name, VALUE, prefix + field.source, field.to_representation, None))
+    return plan
+
+
+def _columns(plan):
+    for name, kind, column, converter, children in plan:
+        yield column
+        if children:
+            yield from _columns(children)
+
+
+class ValuesRowSerializer:
+    """
+    Read-only fast path for list endpoints.
+
+    Compiles a (possibly sparse-fieldset pruned) ModelSerializer instance
+    into column accessors once, then builds each output dict straight from
+    ``QuerySet.values()`` rows. This skips per-row serializer binding and
+    attribute lookups while producing exactly the same data the serializer
+    would. Raises FastPathUnsupported for fields it cannot serve.
+    """
+
+    def __init__(self, serializer):
+        self.plan = _compile(serializer)
+        self.request = serializer.context.get('request')
+        self.columns = list(dict.fromkeys(_columns(self.plan)))
+
+    def _build(self, plan, row):
+        data = {}
+        for name, kind, column, converter, children in plan:
+            value = row[column]
+            if kind == NESTED:
+                data[name] = None if value is None else self._build(children, row)
+            elif kind == COLUMN:
+                data[name] = converter(value)
+            elif kind == FILE:
+                if not value:
+                    data[name] = None
+                    continue
+                url = converter.url(value)
+                data[name] = self.request.build_absolute_uri(url) if self.request is not None else url
+            else:
+                data[name] = None if value is None else converter(value)
+        return data
+
+    def to_representation(self, rows):
+        return [self._build(self.plan, row) for row in rows]
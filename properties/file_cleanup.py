@@ -0,0 +1,140 @@
+import logging
+import threading
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# S3 DeleteObjects accepts at most 1000 keys per request
+DELETE_BATCH_SIZE = 1000
+
+
+def is_s3_storage(storage):
+    return hasattr(storage, 'bucket_name') and hasattr(storage, 'connection')
+
+
+def _s3_name(storage, key):
+    """Storage name for a bucket key, i.e. the key without the location prefix."""
+    location = (getattr(storage, 'location', '') or '').strip('/')
+    if location and key.startswith(location + '/'):
+        return key[len(location) + 1:]
+    return key
+
+
+def delete_files(storage, names):
+    """
+    Delete ``names`` from ``storage`` and return the ones that failed.
+
+    On S3 the keys go out in DeleteObjects requests of up to 1000 rather than
+    one DELETE each. Keys that are already gone count as deleted, so running
+    it again over a partly applied batch is safe.
+    """
+    names = sorted(set(names))
+    failed = []
+    if not is_s3_storage(storage):
+        for name in names:
+            try:
+                storage.delete(name)
+            except OSError as e:
+                logger.warning(f"Could not delete {name}: {str(e)}")
+                failed.append(name)
+        return failed
+
+    client = storage.connection.meta.client
+    keys = {storage._normalize_name(name): name for name in names}
+    key_list = list(keys)
+    for start in range(0, len(key_list), DELETE_BATCH_SIZE):
+        batch = key_list[start:start + DELETE_BATCH_SIZE]
+        response = client.delete_objects(
+            Bucket=storage.bucket_name,
+            Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True},
+        )
+        # Quiet mode only reports the keys that could not be deleted
+        for error in response.get('Errors', []):
+            logger.warning(f"Could not delete {error['Key']}: {error.get('Code')} {error.get('Message')}")
+            failed.append(keys.get(error['Key'], error['Key']))
+    return failed
+
+
+def iter_stored_files(storage, prefix):
+    """Yield ``(name, last_modified)`` for every file under ``prefix``."""
+    if is_s3_storage(storage):
+        paginator = storage.connection.meta.client.get_paginator('list_objects_v2')
+        pages = paginator.paginate(Bucket=storage.bucket_name, Prefix=storage._normalize_name(prefix))
+        for page in pages:
+            for obj in page.get('Contents', []):
+                yield _s3_name(storage, obj['Key']), obj['LastModified']
+        return
+
+    directories = [prefix.rstrip('/')]
+    while directories:
+        directory = directories.pop()
+        if not storage.exists(directory):
+            continue
+        subdirectories, files = storage.listdir(directory)
+        directories.extend(f'{directory}/{name}' for name in subdirectories)
+        for name in files:
+            path = f'{directory}/{name}'
+            yield path, storage.get_modified_time(path)
+
+
+class _DeletionBatch:
+    """
+    Files removed by one deletion run: a single Model/QuerySet.delete()
+    call, cascades included. The first files register one on_commit
+    callback, which queues one task for everything collected by then; on
+    rollback Django discards the callback and nothing is deleted.
+    """
+
+    def __init__(self, origin):
+        self.origin = id(origin)
+        self.names = []
+        self.registered = False
+
+    def add(self, names, using):
+        self.names.extend(names)
+        if not self.registered:
+            self.registered = True
+            transaction.on_commit(self.send, using=using)
+
+    def send(self):
+        from .tasks import delete_stored_files
+        try:
+            delete_stored_files.delay(self.names)
+        except Exception as e:
+            # The rows are gone either way; sweep_orphan_images picks the files up
+            logger.error(f"Could not queue deletion of {len(self.names)} files: {str(e)}")
+
+
+# The deletion run in progress on this thread
+_local = threading.local()
+
+
+def begin_file_deletion(origin):
+    """
+    Start collecting the files of the deletion run started by ``origin``.
+    Called from pre_delete: Django sends every pre_delete of a run before
+    its post_deletes, so a batch that has already registered its callback
+    belongs to an earlier run (committed or rolled back) and is replaced.
+    """
+    batch = getattr(_local, 'batch', None)
+    if batch is None or batch.origin != id(origin) or batch.registered:
+        _local.batch = _DeletionBatch(origin)
+
+
+def schedule_file_deletion(names, using=None, origin=None):
+    """
+    Delete ``names`` from the image storage once the current transaction
+    commits; nothing is deleted if it rolls back. Files deleted by the same
+    run (``origin`` as passed to the delete signals, after
+    begin_file_deletion), such as the images cascaded from a property,
+    share one task.
+    """
+    if not names:
+        return
+    batch = getattr(_local, 'batch', None)
+    if origin is None or batch is None or batch.origin != id(origin):
+        batch = _DeletionBatch(origin)
+        if origin is not None:
+            _local.batch = batch
+    batch.add(names, using)
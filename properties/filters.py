@@ -0,0 +1,110 @@
+from django.db.models import BooleanField, Exists, OuterRef, Value
+from rest_framework.exceptions import ValidationError
+
+from .geo import parse_bbox, parse_point, filter_bbox, filter_radius
+from .models import Favorite, PropertyType
+from .search import search_properties
+
+# Exact-match fields handled by DjangoFilterBackend on the property list views
+PROPERTY_FILTERSET_FIELDS = ['listing_type', 'bedrooms', 'bathrooms', 'property_type__name']
+
+
+def _number(value):
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError("must be a number")
+
+
+def _positive_number(value):
+    value = _number(value)
+    if value <= 0:
+        raise ValueError("must be positive")
+    return value
+
+
+def _integer(value):
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError("must be an integer")
+
+
+def filter_properties(queryset, params):
+    """
+    Apply the PropertyListView query-string filters to a Property queryset.
+    Shared by every endpoint that accepts "the same filters as the list".
+
+    Raises ValidationError naming every malformed parameter: answering with
+    a filter silently dropped would return listings the client excluded.
+    """
+    errors = {}
+
+    def parse(name, parser):
+        value = params.get(name)
+        if not value:
+            return None
+        try:
+            return parser(value)
+        except ValueError as e:
+            errors[name] = [str(e)]
+            return None
+
+    min_price = parse('min_price', _number)
+    max_price = parse('max_price', _number)
+    owner = parse('owner', _integer)
+    # ?bbox=min_lng,min_lat,max_lng,max_lat
+    bbox = parse('bbox', parse_bbox)
+    # ?near=lat,lng&radius_km=5, nearest first
+    near = parse('near', parse_point)
+    radius_km = parse('radius_km', _positive_number)
+    if errors:
+        raise ValidationError(errors)
+
+    city = params.get('city')
+    property_type = params.get('property_type')
+    listing_type = params.get('listing_type')
+    status = params.get('status')
+    search = params.get('q')
+
+    if min_price is not None:
+        queryset = queryset.filter(price__gte=min_price)
+    if max_price is not None:
+        queryset = queryset.filter(price__lte=max_price)
+    if city:
+        # Served by the UPPER(city) trigram index on PostgreSQL (migration 0021)
+        queryset = queryset.filter(city__icontains=city)
+    if property_type:
+        # Resolve the small PropertyType table first so the property
+        # scan is an indexed property_type_id IN (...) instead of a join
+        type_ids = list(
+            PropertyType.objects.filter(name__icontains=property_type)
+            .values_list('id', flat=True)
+        )
+        queryset = queryset.filter(property_type_id__in=type_ids)
+    if listing_type:
+        # Choice field: an exact match can use the listing_type index
+        queryset = queryset.filter(listing_type=listing_type.lower())
+    if owner is not None:
+        queryset = queryset.filter(owner_id=owner)
+    if status:
+        queryset = queryset.filter(status=status)
+    if search:
+        queryset = search_properties(queryset, search)
+    if bbox:
+        queryset = filter_bbox(queryset, *bbox)
+    if near and radius_km:
+        queryset = filter_radius(queryset, *near, radius_km)
+    return queryset
+
+
+def annotate_is_favorited(queryset, user):
+    """
+    Annotate ``is_favorited`` for ``user``: a correlated EXISTS in the page
+    query itself, so marking a page costs no extra round trip. Constant False
+    for anonymous users.
+    """
+    if not user.is_authenticated:
+        return queryset.annotate(is_favorited=Value(False, output_field=BooleanField()))
+    favorites = Favorite.objects.filter(user=user, property=OuterRef('pk'))
+    return queryset.annotate(is_favorited=Exists(favorites))
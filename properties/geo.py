@@ -0,0 +1,168 @@
+import math
+
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+# Geohashes are stored at ~5m resolution; coarser prefixes address larger
+# cells, so a bbox becomes a handful of B-tree range scans on one column.
+GEOHASH_PRECISION = 9
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Sorts after every geohash character, closing a prefix range
+GEOHASH_RANGE_END = '{'
+MAX_COVER_CELLS = 32
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lng_range[0] = mid
+            else:
+                bits <<= 1
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def geohash_cell_size(precision):
+    """Return the (height, width) of a geohash cell in degrees."""
+    bits = precision * 5
+    lng_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+
+def geohash_cell_count(min_lat, min_lng, max_lat, max_lng, precision):
+    """Upper bound on len(geohash_cells(...)), without listing the cells."""
+    height, width = geohash_cell_size(precision)
+    return (math.ceil((max_lat - min_lat) / height) + 1) * (math.ceil((max_lng - min_lng) / width) + 1)
+
+
+def geohash_cells(min_lat, min_lng, max_lat, max_lng, precision):
+    """Geohash cells of the given precision that overlap the bbox."""
+    height, width = geohash_cell_size(precision)
+    # Snap to the cell grid so every covering cell is visited exactly once
+    lat = math.floor((min_lat + 90.0) / height) * height - 90.0
+    cells = set()
+    while lat <= max_lat:
+        lng = math.floor((min_lng + 180.0) / width) * width - 180.0
+        while lng <= max_lng:
+            cells.add(encode_geohash(
+                min(lat + height / 2, 90.0), min(lng + width / 2, 180.0), precision
+            ))
+            lng += width
+        lat += height
+    return cells
+
+
+def geohash_cover(min_lat, min_lng, max_lat, max_lng, max_cells=MAX_COVER_CELLS):
+    """
+    Geohash prefixes covering the bbox: the finest precision whose cover stays
+    within ``max_cells`` cells.
+    """
+    cover = {''}
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        if geohash_cell_count(min_lat, min_lng, max_lat, max_lng, precision) > max_cells:
+            break
+        cover = geohash_cells(min_lat, min_lng, max_lat, max_lng, precision)
+    return sorted(cover)
+
+
+def parse_bbox(value):
+    """Parse ``min_lng,min_lat,max_lng,max_lat`` (GeoJSON order)."""
+    parts = [float(part) for part in value.split(',')]
+    if len(parts) != 4:
+        raise ValueError("bbox must be min_lng,min_lat,max_lng,max_lat")
+    min_lng, min_lat, max_lng, max_lat = parts
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lng <= max_lng <= 180):
+        raise ValueError("bbox is out of range")
+    return min_lat, min_lng, max_lat, max_lng
+
+
+def parse_point(value):
+    """Parse ``lat,lng``."""
+    parts = [float(part) for part in value.split(',')]
+    if len(parts) != 2:
+        raise ValueError("near must be lat,lng")
+    latitude, longitude = parts
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError("near is out of range")
+    return latitude, longitude
+
+
+def geohash_prefix_q(prefixes):
+    """One B-tree range condition per geohash prefix, OR-ed together."""
+    cells = Q()
+    for prefix in prefixes:
+        if prefix:
+            cells |= Q(geohash__gte=prefix, geohash__lt=prefix + GEOHASH_RANGE_END)
+        else:
+            cells |= ~Q(geohash='')
+    return cells
+
+
+def filter_bbox(queryset, min_lat, min_lng, max_lat, max_lng):
+    """
+    Restrict to properties inside the bbox: an indexed range scan per covering
+    geohash prefix, then the exact coordinate check on the candidates.
+    """
+    return queryset.filter(
+        geohash_prefix_q(geohash_cover(min_lat, min_lng, max_lat, max_lng)),
+        latitude__gte=min_lat, latitude__lte=max_lat,
+        longitude__gte=min_lng, longitude__lte=max_lng,
+    )
+
+
+def haversine_km(latitude, longitude):
+    """Great-circle distance in km from a point to each row, as an expression."""
+    lat = Value(latitude, output_field=FloatField())
+    lng = Value(longitude, output_field=FloatField())
+    a = (
+        Power(Sin(Radians(F('latitude') - lat) / 2), 2) +
+        Cos(Radians(lat)) * Cos(Radians(F('latitude'))) *
+        Power(Sin(Radians(F('longitude') - lng) / 2), 2)
+    )
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(a))
+
+
+def filter_radius(queryset, latitude, longitude, radius_km):
+    """
+    Restrict to properties within ``radius_km`` of a point, nearest first.
+    The circle's bounding box narrows candidates through the geohash index;
+    the haversine distance refines them exactly.
+    """
+    if radius_km <= 0:
+        raise ValueError("radius_km must be positive")
+    dlat = radius_km / KM_PER_DEGREE
+    dlng = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    queryset = filter_bbox(
+        queryset,
+        max(latitude - dlat, -90.0), max(longitude - dlng, -180.0),
+        min(latitude + dlat, 90.0), min(longitude + dlng, 180.0),
+    )
+    return queryset.annotate(distance_km=haversine_km(latitude, longitude)) \
+        .filter(distance_km__lte=radius_km) \
+        .order_by('distance_km')
@@ -0,0 +1,103 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+# Derivative name -> target width in pixels. Originals are never upscaled.
+DERIVATIVE_WIDTHS = {
+    'thumb': 320,
+    'medium': 768,
+    'large': 1600,
+}
+# Output format -> (file extension, Pillow save options)
+DERIVATIVE_FORMATS = {
+    'webp': ('webp', {'format': 'WEBP', 'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def image_storage():
+    """The storage PropertyImage files (originals and derivatives) live in."""
+    from .models import PropertyImage
+    return PropertyImage._meta.get_field('image').storage
+
+
+def derivative_path(name, size, extension):
+    """Derivatives live next to the original: ``photo.jpg`` -> ``photo_thumb.webp``."""
+    root, _ = os.path.splitext(name)
+    return f'{root}_{size}.{extension}'
+
+
+def stored_names(name, derivatives):
+    """Every file kept for an image: the original plus its derivatives."""
+    names = [name] if name else []
+    for entry in (derivatives or {}).values():
+        names.extend(entry[output] for output in DERIVATIVE_FORMATS if entry.get(output))
+    return names
+
+
+def _flatten(image):
+    """RGB copy for JPEG, with any transparency composited onto white."""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        return background
+    return image.convert('RGB')
+
+
+def _encode(image, options):
+    buffer = BytesIO()
+    # No exif= / icc_profile= is passed, so no metadata is carried over
+    image.save(buffer, **options)
+    return buffer.getvalue()
+
+
+def generate_derivatives(storage, name):
+    """
+    Write resized WebP and JPEG copies of the image ``name`` to ``storage``
+    and return ``{size: {'width': w, 'webp': path, 'jpeg': path}}``.
+    Names are deterministic, so running it again replaces the same files.
+    """
+    with storage.open(name, 'rb') as source:
+        original = Image.open(source)
+        # Bake the EXIF orientation into the pixels before the EXIF is dropped
+        original = ImageOps.exif_transpose(original)
+        original.load()
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+
+    derivatives = {}
+    for size, width in DERIVATIVE_WIDTHS.items():
+        image = original.copy()
+        image.thumbnail((width, width * 10), Image.LANCZOS)
+        entry = {'width': image.width}
+        for output, (extension, options) in DERIVATIVE_FORMATS.items():
+            content = _encode(image if output == 'webp' else _flatten(image), options)
+            path = derivative_path(name, size, extension)
+            if storage.exists(path):
+                storage.delete(path)
+            entry[output] = storage.save(path, ContentFile(content))
+        derivatives[size] = entry
+    return derivatives
+
+
+def derivative_srcset(derivatives, storage):
+    """
+    ``srcset`` strings per format, e.g. ``{'webp': 'a.webp 320w, b.webp 768w'}``,
+    or an empty dict when no derivatives have been generated yet.
+    """
+    if not derivatives:
+        return {}
+    entries = sorted(derivatives.values(), key=lambda entry: entry['width'])
+    srcset = {}
+    for output in DERIVATIVE_FORMATS:
+        candidates = {}
+        for entry in entries:
+            # Small originals give several sizes the same width; list it once
+            candidates.setdefault(entry['width'], entry[output])
+        srcset[output] = ', '.join(
+            f'{storage.url(path)} {width}w' for width, path in candidates.items()
+        )
+    return srcset
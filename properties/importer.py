@@ -0,0 +1,188 @@
+import csv
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .cache import (
+    CACHE_TTL,
+    LIST_NAMESPACE,
+    bump_generation,
+    owner_namespace,
+    property_type_ids_cache_key,
+)
+from .maps import tile_namespaces_for
+from .models import Property, PropertyType
+
+# Columns an import row may carry; property_type is given by name
+IMPORT_FIELDS = (
+    'listing_type', 'title', 'description', 'price', 'reservation_price',
+    'property_type', 'bedrooms', 'bathrooms', 'square_feet',
+    'address', 'city', 'state', 'zip_code', 'latitude', 'longitude', 'status',
+)
+DEFAULT_BATCH_SIZE = 500
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def _decoded_lines(lines):
+    for number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            try:
+                line = line.decode('utf-8-sig' if number == 1 else 'utf-8')
+            except UnicodeDecodeError:
+                raise ImportFormatError(f"Line {number} is not valid UTF-8")
+        yield line
+
+
+def iter_csv_records(lines):
+    """
+    Yield ``(line, record)`` for each CSV row after the header, reading the
+    input one line at a time. ``line`` is where the row starts in the file.
+    A malformed row yields the error in place of the record and ends the
+    import, since the rest of the file cannot be reliably split into rows.
+    """
+    reader = csv.DictReader(_decoded_lines(lines))
+    last_line = 1
+    try:
+        for record in reader:
+            yield last_line + 1, record
+            last_line = reader.line_num
+    except csv.Error as e:
+        yield last_line + 1, ValueError(str(e))
+
+
+def iter_ndjson_records(lines):
+    """
+    Yield ``(line, record)`` for each non-blank NDJSON line. A line that is
+    not a JSON object yields the ValueError in place of the record.
+    """
+    for number, line in enumerate(_decoded_lines(lines), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("Expected a JSON object")
+        except ValueError as e:
+            record = e
+        yield number, record
+
+
+def iter_records(lines, import_format):
+    if import_format == 'csv':
+        return iter_csv_records(lines)
+    if import_format == 'ndjson':
+        return iter_ndjson_records(lines)
+    raise ImportFormatError(f"Unsupported import format '{import_format}'; use csv or ndjson")
+
+
+def property_type_ids():
+    """Lower-cased PropertyType name -> id, from one cached query."""
+    cache_key = property_type_ids_cache_key()
+    ids = cache.get(cache_key)
+    if ids is None:
+        ids = {name.lower(): pk for name, pk in PropertyType.objects.values_list('name', 'id')}
+        cache.set(cache_key, ids, CACHE_TTL)
+    return ids
+
+
+class PropertyImporter:
+    """
+    Bulk-create properties from parsed import records.
+
+    Rows are checked with the model fields' own ``clean()`` (no serializer
+    round per row), property types are resolved by name from one cached
+    lookup, and valid rows are inserted with ``bulk_create`` in batches.
+    Invalid rows are skipped and reported by line.
+    """
+
+    def __init__(self, owner, batch_size=DEFAULT_BATCH_SIZE):
+        self.owner = owner
+        self.batch_size = batch_size
+        self.fields = {
+            name: Property._meta.get_field(name)
+            for name in IMPORT_FIELDS if name != 'property_type'
+        }
+        self.type_ids = property_type_ids()
+        self.created = 0
+        self.errors = []
+
+    def build(self, record):
+        """Return ``(instance, None)`` for a valid record, else ``(None, errors)``."""
+        values = {}
+        errors = {}
+        for name, field in self.fields.items():
+            raw = record.get(name)
+            if raw is None or raw == '':
+                if field.has_default():
+                    values[name] = field.get_default()
+                elif field.null:
+                    values[name] = None
+                elif field.blank:
+                    values[name] = ''
+                else:
+                    errors[name] = ['This field is required.']
+                continue
+            try:
+                values[name] = field.clean(raw, None)
+            except ValidationError as e:
+                errors[name] = e.messages
+
+        type_name = str(record.get('property_type') or '').strip()
+        if type_name:
+            values['property_type_id'] = self.type_ids.get(type_name.lower())
+            if values['property_type_id'] is None:
+                errors['property_type'] = [f"Unknown property type '{type_name}'."]
+
+        if errors:
+            return None, errors
+        instance = Property(owner=self.owner, **values)
+        instance.apply_derived_fields()
+        return instance, None
+
+    def flush(self, batch):
+        if not batch:
+            return
+        with transaction.atomic():
+            Property.objects.bulk_create(batch, batch_size=self.batch_size)
+        self.created += len(batch)
+
+        # bulk_create sends no post_save, so invalidate what the receivers would
+        namespaces = {LIST_NAMESPACE, owner_namespace(self.owner.pk)}
+        for instance in batch:
+            if instance.geohash:
+                namespaces.update(tile_namespaces_for(instance.geohash))
+        bump_generation(*namespaces)
+
+    def run(self, records):
+        """Import ``(line, record)`` pairs and return the report."""
+        batch = []
+        try:
+            for line, record in records:
+                if isinstance(record, Exception):
+                    self.errors.append({'line': line, 'errors': {'non_field_errors': [str(record)]}})
+                    continue
+                instance, errors = self.build(record)
+                if errors:
+                    self.errors.append({'line': line, 'errors': errors})
+                    continue
+                batch.append(instance)
+                if len(batch) >= self.batch_size:
+                    self.flush(batch)
+                    batch = []
+        except ImportFormatError as e:
+            # The rest of the input is unreadable; keep the rows before it
+            self.errors.append({'line': None, 'errors': {'non_field_errors': [str(e)]}})
+        self.flush(batch)
+        return self.report()
+
+    def report(self):
+        return {
+            'created': self.created,
+            'failed': len(self.errors),
+            'errors': self.errors,
+        }
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from properties.models import Property, PropertyImage
+
+
+class Command(BaseCommand):
+    help = 'Populate Property.primary_image_path and its derivatives from existing PropertyImage rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of properties to update per batch')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        updated = 0
+
+        while True:
+            batch = list(
+                Property.objects.filter(pk__gt=last_id)
+                .order_by('pk')
+                .only('pk', 'primary_image_path', 'primary_image_derivatives')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].pk
+
+            # One query per batch: primary images sort first, then upload order
+            paths = {}
+            images = PropertyImage.objects.filter(property_id__in=[p.pk for p in batch]) \
+                .order_by('property_id', '-is_primary', 'pk') \
+                .values_list('property_id', 'image', 'derivatives')
+            for property_id, image, derivatives in images:
+                paths.setdefault(property_id, (image, derivatives))
+
+            changed = []
+            for property_obj in batch:
+                path, derivatives = paths.get(property_obj.pk, ('', {}))
+                if (property_obj.primary_image_path, property_obj.primary_image_derivatives) != (path, derivatives):
+                    property_obj.primary_image_path = path
+                    property_obj.primary_image_derivatives = derivatives
+                    changed.append(property_obj)
+            Property.objects.bulk_update(changed, ['primary_image_path', 'primary_image_derivatives'])
+            updated += len(changed)
+
+            self.stdout.write(f'Processed properties up to id {last_id} ({updated} updated)')
+
+        self.stdout.write(self.style.SUCCESS(f'Backfilled primary images for {updated} properties'))
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from properties.fast_serializers import ValuesRowSerializer
+from properties.filters import annotate_is_favorited
+from properties.models import Property
+from properties.serializers import PropertySerializer2
+
+
+class Command(BaseCommand):
+    help = 'Time PropertySerializer2 against the values() fast path on a page of properties'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100,
+                            help='Number of properties per page')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Number of timed runs per path')
+        parser.add_argument('--fields', default='',
+                            help='Optional sparse fieldset, e.g. id,title,price')
+
+    def handle(self, *args, **options):
+        page_size = options['page_size']
+        repeat = options['repeat']
+        query = f"?fields={options['fields']}" if options['fields'] else ''
+        request = Request(APIRequestFactory().get('/api/properties/' + query))
+        context = {'request': request}
+        queryset = annotate_is_favorited(Property.objects.order_by('-created_at', '-id'), request.user)
+        renderer = JSONRenderer()
+
+        def serializer_path():
+            page = list(queryset.select_related('property_type', 'owner', 'stats')[:page_size])
+            return renderer.render(PropertySerializer2(page, many=True, context=context).data)
+
+        def values_path():
+            fast = ValuesRowSerializer(PropertySerializer2(context=context))
+            page = list(queryset.values(*fast.columns)[:page_size])
+            return renderer.render(fast.to_representation(page))
+
+        if serializer_path() != values_path():
+            raise CommandError('The values() fast path does not match PropertySerializer2')
+
+        timings = {}
+        for name, path in (('serializer', serializer_path), ('values', values_path)):
+            started = time.perf_counter()
+            for _ in range(repeat):
+                path()
+            timings[name] = 1000 * (time.perf_counter() - started) / repeat
+            self.stdout.write(f'{name:>10}: {timings[name]:.2f} ms per page of {page_size}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Output identical; fast path is {timings['serializer'] / timings['values']:.1f}x faster"
+        ))
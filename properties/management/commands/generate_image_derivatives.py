@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from properties.models import PropertyImage
+from properties.tasks import generate_image_derivatives
+
+
+class Command(BaseCommand):
+    help = 'Queue thumbnail/medium/large derivative generation for existing property images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Regenerate images that already have derivatives')
+        parser.add_argument('--inline', action='store_true',
+                            help='Process images in this process instead of queueing tasks')
+
+    def handle(self, *args, **options):
+        images = PropertyImage.objects.order_by('pk')
+        if not options['all']:
+            images = images.filter(derivatives={})
+
+        count = 0
+        for image_id in images.values_list('pk', flat=True).iterator():
+            if options['inline']:
+                generate_image_derivatives(image_id)
+            else:
+                generate_image_derivatives.delay(image_id)
+            count += 1
+
+        action = 'Processed' if options['inline'] else 'Queued'
+        self.stdout.write(self.style.SUCCESS(f'{action} {count} images'))
@@ -0,0 +1,53 @@
+import json
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from properties.importer import DEFAULT_BATCH_SIZE, ImportFormatError, PropertyImporter, iter_records
+
+
+class Command(BaseCommand):
+    help = 'Bulk import properties from a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or - for stdin")
+        parser.add_argument('--owner', required=True,
+                            help='Username of the user the properties belong to')
+        parser.add_argument('--format', dest='import_format', choices=['csv', 'ndjson'],
+                            help='Input format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help='Number of properties to insert per batch')
+        parser.add_argument('--report', help='Write the per-line error report to this JSON file')
+
+    def handle(self, *args, **options):
+        try:
+            owner = get_user_model().objects.get(username=options['owner'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User '{options['owner']}' does not exist")
+
+        path = options['path']
+        import_format = options['import_format']
+        if import_format is None:
+            extension = path.rsplit('.', 1)[-1].lower()
+            import_format = 'ndjson' if extension in ('ndjson', 'jsonl') else extension
+
+        importer = PropertyImporter(owner, batch_size=options['batch_size'])
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8-sig', newline='')
+        try:
+            report = importer.run(iter_records(stream, import_format))
+        except ImportFormatError as e:
+            raise CommandError(str(e))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for error in report['errors']:
+            self.stderr.write(f"Line {error['line']}: {json.dumps(error['errors'])}")
+        if options['report']:
+            with open(options['report'], 'w') as report_file:
+                json.dump(report, report_file, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['created']} properties ({report['failed']} rows failed)"
+        ))
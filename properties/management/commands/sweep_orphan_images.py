@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from properties.file_cleanup import delete_files, iter_stored_files
+from properties.images import image_storage, stored_names
+from properties.models import PropertyImage
+from properties.uploads import UPLOAD_PREFIX
+
+
+class Command(BaseCommand):
+    help = 'Delete property image files (and derivatives) no PropertyImage refers to'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age-hours', type=float, default=24,
+                            help='Leave newer files alone; direct uploads are stored before they are confirmed')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='List the orphaned files without deleting them')
+
+    def handle(self, *args, **options):
+        storage = image_storage()
+        cutoff = timezone.now() - timedelta(hours=options['min_age_hours'])
+
+        referenced = set()
+        rows = PropertyImage.objects.values_list('image', 'derivatives').iterator(chunk_size=2000)
+        for name, derivatives in rows:
+            referenced.update(stored_names(name, derivatives))
+
+        orphans = [
+            name for name, modified in iter_stored_files(storage, UPLOAD_PREFIX)
+            if modified < cutoff and name not in referenced
+        ]
+        if options['dry_run']:
+            for name in orphans:
+                self.stdout.write(name)
+            self.stdout.write(self.style.SUCCESS(f'Found {len(orphans)} orphaned files'))
+            return
+
+        failed = delete_files(storage, orphans)
+        for name in failed:
+            self.stderr.write(f'Could not delete {name}')
+        self.stdout.write(self.style.SUCCESS(f'Deleted {len(orphans) - len(failed)} orphaned files'))
@@ -0,0 +1,103 @@
+from django.core.cache import cache
+from django.db.models import Avg, Count, Max, Min
+from django.db.models.functions import Substr
+
+from .cache import CACHE_TTL, get_generations, map_tile_namespace
+from .geo import geohash_cell_count, geohash_cells, geohash_prefix_q
+from .models import Property
+
+# Geohash precision of a cluster cell for each map zoom level (0-20). Each
+# step roughly matches the pixel size of a pin cluster at that zoom.
+ZOOM_PRECISION = [1, 1, 1, 2, 2, 3, 3, 3, 4, 4, 5, 5, 5, 6, 6, 7, 7, 7, 8, 8, 8]
+MAX_ZOOM = len(ZOOM_PRECISION) - 1
+# Clusters are computed and cached per tile: a geohash one level coarser than
+# the cluster cell, so a tile holds at most 32 clusters
+MAX_TILE_PRECISION = max(ZOOM_PRECISION) - 1
+MAX_TILES = 64
+
+
+class TooManyTiles(ValueError):
+    pass
+
+
+def _format_price(value):
+    # SQLite returns MIN/MAX of a decimal without its scale; match Postgres
+    places = Property._meta.get_field('price').decimal_places
+    return f'{value:.{places}f}'
+
+
+def cluster_precision(zoom):
+    return ZOOM_PRECISION[min(max(zoom, 0), MAX_ZOOM)]
+
+
+def tile_namespaces_for(geohash):
+    """Every map tile namespace a property at ``geohash`` contributes to."""
+    return [map_tile_namespace(geohash[:length]) for length in range(MAX_TILE_PRECISION + 1)]
+
+
+def _aggregate_tiles(tiles, precision):
+    """Cluster all properties in ``tiles`` with a single grouped query."""
+    tile_length = len(tiles[0])
+    rows = Property.objects.filter(geohash_prefix_q(tiles), status='available') \
+        .exclude(geohash='') \
+        .annotate(cell=Substr('geohash', 1, precision)) \
+        .values('cell') \
+        .annotate(
+            count=Count('id'),
+            property_id=Min('id'),
+            min_price=Min('price'),
+            max_price=Max('price'),
+            latitude=Avg('latitude'),
+            longitude=Avg('longitude'),
+        ) \
+        .order_by('cell')
+
+    clusters = {tile: [] for tile in tiles}
+    for row in rows:
+        clusters[row['cell'][:tile_length]].append({
+            'cell': row['cell'],
+            'count': row['count'],
+            'property_id': row['property_id'],
+            'min_price': _format_price(row['min_price']),
+            'max_price': _format_price(row['max_price']),
+            'latitude': row['latitude'],
+            'longitude': row['longitude'],
+        })
+    return clusters
+
+
+def get_clusters(min_lat, min_lng, max_lat, max_lng, zoom):
+    """
+    Property pin clusters for a map viewport.
+
+    The viewport is split into geohash tiles; each tile's clusters are cached
+    under its own generation, which is bumped only when a property in that
+    tile moves, changes status or changes price. Tiles missing from cache are
+    computed together in one grouped aggregate.
+    """
+    precision = cluster_precision(zoom)
+    # Checked before the tiles are listed: a wide bbox at high zoom would
+    # otherwise enumerate millions of cells
+    if geohash_cell_count(min_lat, min_lng, max_lat, max_lng, precision - 1) > MAX_TILES:
+        raise TooManyTiles("bbox is too large for this zoom level")
+    tiles = sorted(geohash_cells(min_lat, min_lng, max_lat, max_lng, precision - 1))
+
+    generations = get_generations(*[map_tile_namespace(tile) for tile in tiles])
+    keys = {
+        tile: f'map_clusters:{generation}:{precision}:{tile}'
+        for tile, generation in zip(tiles, generations)
+    }
+    cached = cache.get_many(list(keys.values()))
+
+    missing = [tile for tile in tiles if keys[tile] not in cached]
+    if missing:
+        computed = _aggregate_tiles(missing, precision)
+        cache.set_many({keys[tile]: computed[tile] for tile in missing}, CACHE_TTL)
+        cached.update({keys[tile]: computed[tile] for tile in missing})
+
+    return [
+        cluster
+        for tile in tiles
+        for cluster in cached[keys[tile]]
+        if min_lat <= cluster['latitude'] <= max_lat and min_lng <= cluster['longitude'] <= max_lng
+    ]
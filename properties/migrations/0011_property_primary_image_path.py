@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0010_alter_reservation_booking_fee_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='primary_image_path',
+            field=models.CharField(blank=True, default='', max_length=300),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.1.4 on 2026-10-17 10:03
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+SEARCH_VECTOR_SQL = """
+CREATE OR REPLACE FUNCTION properties_property_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('pg_catalog.english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('pg_catalog.english', coalesce(NEW.city, '')), 'B') ||
+        setweight(to_tsvector('pg_catalog.english', coalesce(NEW.address, '')), 'B') ||
+        setweight(to_tsvector('pg_catalog.english', coalesce(NEW.description, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER properties_property_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, description, city, address
+    ON properties_property
+    FOR EACH ROW EXECUTE FUNCTION properties_property_search_vector_update();
+
+CREATE INDEX properties_property_search_vector_gin
+    ON properties_property USING gin (search_vector);
+
+UPDATE properties_property SET title = title;
+"""
+
+DROP_SEARCH_VECTOR_SQL = """
+DROP INDEX IF EXISTS properties_property_search_vector_gin;
+DROP TRIGGER IF EXISTS properties_property_search_vector_trigger ON properties_property;
+DROP FUNCTION IF EXISTS properties_property_search_vector_update();
+"""
+
+
+def create_search_trigger(apps, schema_editor):
+    # Full-text search is PostgreSQL-only; other backends fall back to icontains
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(SEARCH_VECTOR_SQL)
+
+
+def drop_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SEARCH_VECTOR_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0011_property_primary_image_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_trigger, drop_search_trigger),
+    ]
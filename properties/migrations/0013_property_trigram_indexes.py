@@ -0,0 +1,36 @@
+# Generated by Django 5.1.4 on 2026-10-17 11:20
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+TRIGRAM_COLUMNS = ['city', 'state', 'address']
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # GIN trigram indexes let ILIKE '%x%' and similarity lookups use an index
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in TRIGRAM_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS properties_property_{column}_trgm '
+            f'ON properties_property USING gin ({column} gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in TRIGRAM_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS properties_property_{column}_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0012_property_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.4 on 2026-10-17 12:41
+
+from django.db import migrations, models
+
+from properties.geo import encode_geohash
+
+
+def populate_geohash(apps, schema_editor):
+    Property = apps.get_model('properties', 'Property')
+    batch = []
+    located = Property.objects.filter(latitude__isnull=False, longitude__isnull=False) \
+        .only('pk', 'latitude', 'longitude')
+    for property_obj in located.iterator(chunk_size=1000):
+        property_obj.geohash = encode_geohash(property_obj.latitude, property_obj.longitude)
+        batch.append(property_obj)
+        if len(batch) >= 1000:
+            Property.objects.bulk_update(batch, ['geohash'])
+            batch = []
+    if batch:
+        Property.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0013_property_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=12),
+        ),
+        migrations.RunPython(populate_geohash, migrations.RunPython.noop),
+    ]
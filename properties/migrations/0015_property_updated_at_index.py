@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-17 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0014_property_geohash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['updated_at'], name='properties__updated_057a31_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-17 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0015_property_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertyimage',
+            name='derivatives',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='primary_image_derivatives',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
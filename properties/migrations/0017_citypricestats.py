@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-17 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0016_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CityPriceStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100)),
+                ('listing_type', models.CharField(choices=[('rent', 'Rent'), ('sale', 'Sale')], max_length=10)),
+                ('bedrooms', models.IntegerField()),
+                ('listings', models.PositiveIntegerField()),
+                ('price_p25', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('price_median', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('price_p75', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('price_per_sqft_median', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['city', 'listing_type', 'bedrooms'],
+                'constraints': [models.UniqueConstraint(fields=('city', 'listing_type', 'bedrooms'), name='unique_city_price_stats')],
+            },
+        ),
+    ]
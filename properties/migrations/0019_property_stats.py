@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-17 16:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0018_saved_searches'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertyStats',
+            fields=[
+                ('property', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='properties.property')),
+                ('views', models.PositiveBigIntegerField(default=0)),
+                ('unique_viewers', models.PositiveIntegerField(default=0)),
+                ('flushed_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.4 on 2026-10-17 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0019_property_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertyViewFlush',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch', models.CharField(max_length=32, unique=True)),
+                ('flushed_at', models.DateTimeField()),
+            ],
+        ),
+    ]
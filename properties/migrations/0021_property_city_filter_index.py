@@ -0,0 +1,42 @@
+# Generated by Django 5.1.4 on 2026-10-17 19:10
+
+from django.db import migrations
+
+# Nothing filters on these with a trigram operator or ILIKE
+UNUSED_TRIGRAM_COLUMNS = ['state', 'address']
+
+
+def index_city_filter(apps, schema_editor):
+    # city__icontains compiles to UPPER("city"::text) LIKE UPPER(%s) on
+    # PostgreSQL; only an index on that same expression can serve it. The
+    # plain city trigram index stays for suggest_cities (city % text).
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS properties_property_city_upper_trgm '
+        'ON properties_property USING gin ((UPPER(city::text)) gin_trgm_ops)'
+    )
+    for column in UNUSED_TRIGRAM_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS properties_property_{column}_trgm')
+
+
+def unindex_city_filter(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS properties_property_city_upper_trgm')
+    for column in UNUSED_TRIGRAM_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS properties_property_{column}_trgm '
+            f'ON properties_property USING gin ({column} gin_trgm_ops)'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0020_property_view_flush'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_city_filter, unindex_city_filter),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
 from users.models import CustomUser
 import os
@@ -42,9 +43,20 @@ class Property(models.Model):
     zip_code = models.CharField(max_length=20)
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
+    # Precomputed from latitude/longitude in save(); prefix ranges on this
+    # indexed column drive bbox and radius searches without PostGIS
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True)
 
     status = models.CharField(max_length=20, choices=SALE_STATUS_CHOICES, default='available')
     is_verified=models.BooleanField(default=False)
+    # Storage path of the primary (or first) image, kept in sync by PropertyImage
+    # so list responses never need to join the images table
+    primary_image_path = models.CharField(max_length=300, blank=True, default='')
+    # Copy of that image's resized derivatives (see PropertyImage.derivatives)
+    primary_image_derivatives = models.JSONField(default=dict, blank=True)
+    # Weighted tsvector over title/description/city/address. On PostgreSQL it is
+    # maintained by a trigger (see migration 0012) and backed by a GIN index.
+    search_vector = SearchVectorField(null=True, editable=False)
 
     owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='properties')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -56,16 +68,117 @@ class Property(models.Model):
             models.Index(fields=['city']),
             models.Index(fields=['listing_type']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['updated_at']),
         ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded values so post_save can tell what changed
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def save(self, *args, **kwargs):
+        self.apply_derived_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        super().save(*args, **kwargs)
+
+    def apply_derived_fields(self):
+        """
+        Fill the values save() derives from other fields. bulk_create skips
+        save(), so bulk inserts call this on each instance themselves.
+        """
         # Set default reservation price to 10% of property price if not provided
         if not self.reservation_price and self.price:
             self.reservation_price = self.price * Decimal('0.1')
-        super().save(*args, **kwargs)
+        self.geohash = self.compute_geohash()
+
+    def compute_geohash(self):
+        from .geo import encode_geohash
+        if self.latitude is None or self.longitude is None:
+            return ''
+        return encode_geohash(self.latitude, self.longitude)
+
+    @classmethod
+    def sync_primary_image(cls, property_id):
+        """
+        Recompute ``primary_image_path`` from the property's images: the
+        primary image if there is one, otherwise the first uploaded.
+        """
+        path, derivatives = PropertyImage.objects.filter(property_id=property_id) \
+            .order_by('-is_primary', 'pk') \
+            .values_list('image', 'derivatives') \
+            .first() or ('', {})
+        # update() leaves updated_at alone and skips Property's save signals
+        cls.objects.filter(pk=property_id).update(
+            primary_image_path=path or '',
+            primary_image_derivatives=derivatives or {},
+        )
+
+    @property
+    def primary_image_url(self):
+        return image_url_from_path(self.primary_image_path)
+
+    @property
+    def primary_image_srcset(self):
+        return image_srcset(self.primary_image_derivatives)
+
+    @property
+    def primary_image_thumbnail_url(self):
+        return image_thumbnail_url(self.primary_image_path, self.primary_image_derivatives)
+
+
+def image_url_from_path(path):
+    """URL of a stored property image path, or None for an empty path."""
+    if not path:
+        return None
+    return PropertyImage._meta.get_field('image').storage.url(path)
+
+
+def image_thumbnail_url(path, derivatives):
+    """URL of the thumb-sized JPEG derivative, or of the original until it exists."""
+    thumb = (derivatives or {}).get('thumb') or {}
+    return image_url_from_path(thumb.get('jpeg') or path)
+
+
+def image_srcset(derivatives):
+    """``srcset`` strings per format for a PropertyImage.derivatives map."""
+    from .images import derivative_srcset
+    return derivative_srcset(derivatives, PropertyImage._meta.get_field('image').storage)
+
+
+class PropertyStats(models.Model):
+    """
+    View counters per listing. Views are buffered in Redis and added here in
+    bulk by the flush_property_views task, never on the request path.
+    """
+    property = models.OneToOneField(Property, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    views = models.PositiveBigIntegerField(default=0)
+    # HyperLogLog estimate of distinct users/IPs
+    unique_viewers = models.PositiveIntegerField(default=0)
+    flushed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.property_id}: {self.views} views"
+
+
+class PropertyViewFlush(models.Model):
+    """
+    One row per batch of view counts written to PropertyStats, inserted in
+    the same transaction, so a batch retried after a crash is never added
+    twice. Rows older than a day are pruned by the flush.
+    """
+    batch = models.CharField(max_length=32, unique=True)
+    flushed_at = models.DateTimeField()
+
+    def __str__(self):
+        return self.batch
+
 
 class PropertyImage(models.Model):
     property = models.ForeignKey(
@@ -77,6 +190,9 @@ class PropertyImage(models.Model):
         upload_to='property_images/'
     )
     is_primary = models.BooleanField(default=False)
+    # Resized WebP/JPEG copies stored next to the original, filled in by the
+    # generate_image_derivatives task: {size: {'width': w, 'webp': path, 'jpeg': path}}
+    derivatives = models.JSONField(default=dict, blank=True)
 
     def clean(self):
         """
@@ -115,10 +231,25 @@ class PropertyImage(models.Model):
                         property=self.property
                     ).exclude(pk=self.pk).update(is_primary=False)
 
+                # Keep the denormalized thumbnail on the property current
+                Property.sync_primary_image(self.property_id)
+
+                update_fields = kwargs.get('update_fields')
+                if update_fields is None or 'image' in update_fields:
+                    transaction.on_commit(self.queue_derivatives)
+
         except Exception as e:
             logger.error(f"Error saving image: {str(e)}", exc_info=True)
             raise  # Re-raise exception after logging
 
+    def queue_derivatives(self):
+        from .tasks import generate_image_derivatives
+        try:
+            generate_image_derivatives.delay(self.pk)
+        except Exception as e:
+            # The upload stands; lists fall back to the original until a rerun
+            logger.error(f"Could not queue derivatives for image {self.pk}: {str(e)}")
+
     def __str__(self):
         return f"Image for {self.property} (Primary: {self.is_primary})"
 
@@ -182,4 +313,77 @@ class Reservation(models.Model):
             self.property.status = 'available'
             self.property.save()
             
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+class CityPriceStats(models.Model):
+    """
+    Price percentiles of available listings per city, listing type and
+    bedroom count. The table is recomputed wholesale by the
+    refresh_price_stats task; nothing else writes to it.
+    """
+    # Lower-cased and trimmed, so "Nairobi " and "nairobi" share a row
+    city = models.CharField(max_length=100)
+    listing_type = models.CharField(max_length=10, choices=Property.LISTING_TYPE_CHOICES)
+    bedrooms = models.IntegerField()
+    listings = models.PositiveIntegerField()
+    price_p25 = models.DecimalField(max_digits=12, decimal_places=2)
+    price_median = models.DecimalField(max_digits=12, decimal_places=2)
+    price_p75 = models.DecimalField(max_digits=12, decimal_places=2)
+    # Null when no listing in the group has a floor area
+    price_per_sqft_median = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['city', 'listing_type', 'bedrooms'], name='unique_city_price_stats'),
+        ]
+        ordering = ['city', 'listing_type', 'bedrooms']
+
+    def __str__(self):
+        return f"{self.city} {self.listing_type} {self.bedrooms}br: {self.price_median}"
+
+
+class SavedSearch(models.Model):
+    """
+    A user's stored PropertyListView filters. The match_saved_searches task
+    checks new and updated listings against it and files the matches in the
+    user's inbox (SavedSearchMatch).
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='saved_searches')
+    name = models.CharField(max_length=100, blank=True)
+    # Canonical spec from saved_searches.normalize_filters, plus its digest
+    filters = models.JSONField(default=dict)
+    filters_hash = models.CharField(max_length=32, editable=False)
+    # Listings last changed before this have already been matched
+    matched_until = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'filters_hash'], name='unique_saved_search'),
+        ]
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.user.username}: {self.name or self.filters}"
+
+
+class SavedSearchMatch(models.Model):
+    saved_search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name='matches')
+    # Copy of saved_search.user, so polling the inbox is one indexed read
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='saved_search_matches')
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='saved_search_matches')
+    created_at = models.DateTimeField(auto_now_add=True)
+    seen_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['saved_search', 'property'], name='unique_saved_search_match'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-id'], name='saved_match_inbox_idx'),
+        ]
+        ordering = ['-id']
+
+    def __str__(self):
+        return f"{self.saved_search} -> {self.property_id}"
@@ -0,0 +1,174 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class PropertyKeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over ``(created_at, id)`` or ``(price, id)``.
+
+    Each page is fetched with a ``WHERE (key, id) < (last_key, last_id)``
+    predicate instead of an OFFSET, and no COUNT(*) is run, so the cost of a
+    page does not grow with its depth or with the size of the table. Cursors
+    are opaque base64 tokens; clients should only ever echo them back.
+
+    Selected with ``?pagination=cursor`` (or implicitly when a ``cursor`` is
+    passed); ``?ordering=`` picks the key.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    ordering_query_param = 'ordering'
+    default_ordering = '-created_at'
+    # Maps the public ordering value to (model field, descending)
+    orderings = {
+        '-created_at': ('created_at', True),
+        'created_at': ('created_at', False),
+        '-price': ('price', True),
+        'price': ('price', False),
+    }
+    invalid_cursor_message = 'Invalid cursor'
+
+    @classmethod
+    def is_requested(cls, request):
+        return (
+            request.query_params.get(cls.mode_query_param) == 'cursor'
+            or cls.cursor_query_param in request.query_params
+        )
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+            if size > 0:
+                return min(size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def get_ordering(self, request):
+        ordering = request.query_params.get(self.ordering_query_param, self.default_ordering)
+        if ordering not in self.orderings:
+            ordering = self.default_ordering
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request)
+        field, descending = self.orderings[self.ordering]
+
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['r'])
+
+        # Walking backwards means seeking the other way and flipping the page
+        seek_descending = descending != reverse
+        prefix = '-' if seek_descending else ''
+        queryset = queryset.order_by(f'{prefix}{field}', f'{prefix}id')
+
+        if cursor:
+            lookup = 'lt' if seek_descending else 'gt'
+            value = self.parse_value(field, cursor['v'])
+            queryset = queryset.filter(
+                Q(**{f'{field}__{lookup}': value}) |
+                Q(**{field: value, f'id__{lookup}': cursor['id']})
+            )
+
+        # Fetch one extra row to know whether another page follows
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.field = field
+        self.page = rows
+        if reverse:
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.build_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            # Back to the first page, still in cursor mode: it may have been
+            # chosen only by the cursor param dropped here
+            url = remove_query_param(self.base_url, self.cursor_query_param)
+            return replace_query_param(url, self.mode_query_param, 'cursor')
+        return self.build_link(self.page[0], reverse=True)
+
+    def build_link(self, obj, reverse):
+        # Pages hold model instances or values() rows
+        if isinstance(obj, dict):
+            value, pk = obj[self.field], obj['id']
+        else:
+            value, pk = getattr(obj, self.field), obj.pk
+        token = self.encode_cursor({
+            'v': value.isoformat() if hasattr(value, 'isoformat') else str(value),
+            'id': pk,
+            'r': reverse,
+        })
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def encode_cursor(self, payload):
+        raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            return {'v': str(payload['v']), 'id': int(payload['id']), 'r': bool(payload.get('r'))}
+        except (TypeError, ValueError, KeyError, binascii.Error, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def parse_value(self, field, raw):
+        if field == 'created_at':
+            value = parse_datetime(raw)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            return value
+        try:
+            return Decimal(raw)
+        except InvalidOperation:
+            raise NotFound(self.invalid_cursor_message)
@@ -0,0 +1,92 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from .cache import PRICE_STATS_NAMESPACE, bump_generation
+from .models import CityPriceStats, Property
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - only the non-PostgreSQL path needs it
+    np = None
+
+PERCENTILES = (0.25, 0.5, 0.75)
+CENTS = Decimal('0.01')
+
+# One pass over the table: percentile_cont with an array of fractions returns
+# all three price percentiles from a single sort per group
+POSTGRES_STATS_SQL = """
+    SELECT LOWER(TRIM(city)), listing_type, bedrooms, COUNT(*),
+           percentile_cont(ARRAY[%s, %s, %s]) WITHIN GROUP (ORDER BY price::float8),
+           percentile_cont(0.5) WITHIN GROUP (ORDER BY price::float8 / NULLIF(square_feet, 0))
+    FROM {table}
+    WHERE status = 'available'
+    GROUP BY 1, 2, 3
+"""
+
+
+def _decimal(value):
+    return None if value is None else Decimal(str(value)).quantize(CENTS)
+
+
+def _postgres_rows(connection):
+    table = connection.ops.quote_name(Property._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(POSTGRES_STATS_SQL.format(table=table), PERCENTILES)
+        for city, listing_type, bedrooms, listings, prices, per_sqft in cursor.fetchall():
+            yield (city, listing_type, bedrooms), listings, prices, per_sqft
+
+
+def _numpy_rows():
+    """Group in Python and interpolate like percentile_cont (NumPy's linear method)."""
+    groups = defaultdict(lambda: ([], []))
+    rows = Property.objects.filter(status='available') \
+        .values_list('city', 'listing_type', 'bedrooms', 'price', 'square_feet') \
+        .iterator(chunk_size=2000)
+    for city, listing_type, bedrooms, price, square_feet in rows:
+        prices, per_sqft = groups[(city.strip().lower(), listing_type, bedrooms)]
+        prices.append(float(price))
+        if square_feet:
+            per_sqft.append(float(price) / square_feet)
+
+    for key, (prices, per_sqft) in groups.items():
+        yield (
+            key,
+            len(prices),
+            np.percentile(prices, [100 * fraction for fraction in PERCENTILES]).tolist(),
+            float(np.median(per_sqft)) if per_sqft else None,
+        )
+
+
+def compute_price_stats(using=None):
+    """Unsaved CityPriceStats rows computed from the live Property table."""
+    using = using or router.db_for_read(Property)
+    connection = connections[using]
+    rows = _postgres_rows(connection) if connection.vendor == 'postgresql' else _numpy_rows()
+    computed_at = timezone.now()
+    return [
+        CityPriceStats(
+            city=city,
+            listing_type=listing_type,
+            bedrooms=bedrooms,
+            listings=listings,
+            price_p25=_decimal(prices[0]),
+            price_median=_decimal(prices[1]),
+            price_p75=_decimal(prices[2]),
+            price_per_sqft_median=_decimal(per_sqft),
+            computed_at=computed_at,
+        )
+        for (city, listing_type, bedrooms), listings, prices, per_sqft in rows
+    ]
+
+
+def refresh_price_stats():
+    """Replace the stats table in one transaction and invalidate cached reads."""
+    stats = compute_price_stats()
+    with transaction.atomic():
+        CityPriceStats.objects.all().delete()
+        CityPriceStats.objects.bulk_create(stats, batch_size=1000)
+    bump_generation(PRICE_STATS_NAMESPACE)
+    return len(stats)
@@ -0,0 +1,216 @@
+import hashlib
+import json
+import math
+
+from .geo import parse_bbox
+from .models import Property, SavedSearch, SavedSearchMatch
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy ships with the app
+    np = None
+
+LISTING_TYPES = [choice for choice, _ in Property.LISTING_TYPE_CHOICES]
+
+
+def _listing_type(value):
+    value = str(value).strip().lower()
+    if value not in LISTING_TYPES:
+        raise ValueError(f"listing_type must be one of {', '.join(LISTING_TYPES)}")
+    return value
+
+
+def _text(value):
+    value = str(value).strip().lower()
+    if not value:
+        raise ValueError("must not be blank")
+    return value
+
+
+def _bbox(value):
+    # Kept in the list endpoint's own min_lng,min_lat,max_lng,max_lat form,
+    # so filters read back from the API can be sent again as they are
+    if isinstance(value, (list, tuple)):
+        value = ','.join(str(part) for part in value)
+    min_lat, min_lng, max_lat, max_lng = parse_bbox(str(value))
+    return ','.join(str(coordinate) for coordinate in (min_lng, min_lat, max_lng, max_lat))
+
+
+# PropertyListView filters a saved search may use, with their parsers, in the
+# order they are evaluated. Full text (q) and radius searches need SQL.
+SAVED_SEARCH_FILTERS = {
+    'listing_type': _listing_type,
+    'city': _text,
+    'bedrooms': int,
+    'bathrooms': float,
+    'property_type': _text,
+    'min_price': float,
+    'max_price': float,
+    'bbox': _bbox,
+}
+MATCH_FIELDS = (
+    'id', 'price', 'bedrooms', 'bathrooms', 'listing_type', 'city',
+    'property_type__name', 'latitude', 'longitude', 'updated_at',
+)
+MATCH_BATCH_SIZE = 1000
+
+
+def normalize_filters(params):
+    """
+    Canonical filter spec for a dict of list filters: known keys only, typed
+    values, lower-cased text, blanks dropped. Raises ValueError with the
+    problems by field.
+    """
+    unsupported = sorted(set(params) - set(SAVED_SEARCH_FILTERS))
+    errors = {name: "Not supported in saved searches." for name in unsupported}
+    filters = {}
+    for name, parse in SAVED_SEARCH_FILTERS.items():
+        value = params.get(name)
+        if value is None or value == '':
+            continue
+        try:
+            filters[name] = parse(value)
+        except (TypeError, ValueError) as e:
+            errors[name] = str(e)
+    if errors:
+        raise ValueError(errors)
+    return filters
+
+
+def filters_hash(filters):
+    return hashlib.md5(json.dumps(filters, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ListingBatch:
+    """
+    A batch of changed listings as NumPy columns. Predicate masks are
+    memoized, so saved searches that share a predicate (say ``city=nairobi``)
+    pay for it once per batch.
+    """
+
+    def __init__(self, rows):
+        def number(value):
+            return math.nan if value is None else float(value)
+
+        self.ids = [row[0] for row in rows]
+        self.price = np.array([number(row[1]) for row in rows], dtype=np.float64)
+        self.bedrooms = np.array([row[2] for row in rows], dtype=np.int64)
+        self.bathrooms = np.array([number(row[3]) for row in rows], dtype=np.float64)
+        self.listing_type = np.array([row[4] for row in rows], dtype=str)
+        self.city = np.array([(row[5] or '').lower() for row in rows], dtype=str)
+        self.property_type = np.array([(row[6] or '').lower() for row in rows], dtype=str)
+        self.latitude = np.array([number(row[7]) for row in rows], dtype=np.float64)
+        self.longitude = np.array([number(row[8]) for row in rows], dtype=np.float64)
+        self.updated_at = np.array([row[9].timestamp() for row in rows], dtype=np.float64)
+        self._masks = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def predicate(self, name, value):
+        key = (name, json.dumps(value))
+        if key not in self._masks:
+            self._masks[key] = self._evaluate(name, value)
+        return self._masks[key]
+
+    def _evaluate(self, name, value):
+        # Same semantics as filter_properties()
+        if name == 'min_price':
+            return self.price >= value
+        if name == 'max_price':
+            return self.price <= value
+        if name == 'bedrooms':
+            return self.bedrooms == value
+        if name == 'bathrooms':
+            return self.bathrooms == value
+        if name == 'listing_type':
+            return self.listing_type == value
+        if name == 'city':
+            return np.char.find(self.city, value) >= 0
+        if name == 'property_type':
+            return np.char.find(self.property_type, value) >= 0
+        if name == 'bbox':
+            min_lat, min_lng, max_lat, max_lng = parse_bbox(value)
+            return (self.latitude >= min_lat) & (self.latitude <= max_lat) \
+                & (self.longitude >= min_lng) & (self.longitude <= max_lng)
+        raise ValueError(f"Unknown filter {name}")
+
+    def matches(self, filters):
+        mask = np.ones(len(self), dtype=bool)
+        for name in sorted(filters, key=list(SAVED_SEARCH_FILTERS).index):
+            mask &= self.predicate(name, filters[name])
+            if not mask.any():
+                break
+        return mask
+
+
+def match_saved_searches(batch_size=MATCH_BATCH_SIZE):
+    """
+    Match available listings created or updated since each saved search's
+    ``matched_until`` mark, then advance the marks. Searches with identical
+    filters are evaluated once and the hits fanned out to every owner.
+    Returns the number of new (search, listing) matches filed; re-runs are
+    harmless since a listing is filed once per search.
+    """
+    searches = list(SavedSearch.objects.values_list('id', 'user_id', 'filters_hash', 'filters', 'matched_until'))
+    if not searches:
+        return 0
+
+    # filters_hash -> (filters, [(search id, user id, mark timestamp)])
+    specs = {}
+    for search_id, user_id, digest, filters, matched_until in searches:
+        specs.setdefault(digest, (filters, []))[1].append((search_id, user_id, matched_until.timestamp()))
+    low_water = min(matched_until for *_, matched_until in searches)
+
+    # >= rather than > so rows sharing a mark's timestamp are not missed
+    rows = Property.objects.filter(status='available', updated_at__gte=low_water) \
+        .order_by('updated_at', 'id').values_list(*MATCH_FIELDS).iterator(chunk_size=batch_size)
+
+    found = 0
+    high_water = None
+    batch = []
+    for row in rows:
+        batch.append(row)
+        high_water = row[-1]
+        if len(batch) >= batch_size:
+            found += _match_batch(ListingBatch(batch), specs)
+            batch = []
+    if batch:
+        found += _match_batch(ListingBatch(batch), specs)
+
+    if high_water is not None:
+        SavedSearch.objects.filter(pk__in=[search[0] for search in searches], matched_until__lt=high_water) \
+            .update(matched_until=high_water)
+    return found
+
+
+def _match_batch(batch, specs):
+    """File a batch's matches and return how many were new."""
+    candidates = {}
+    for filters, members in specs.values():
+        positions = np.flatnonzero(batch.matches(filters))
+        if not len(positions):
+            continue
+        updated = batch.updated_at[positions]
+        for search_id, user_id, mark in members:
+            for position in positions[updated >= mark]:
+                candidates[(search_id, batch.ids[position])] = user_id
+    if not candidates:
+        return 0
+
+    # Listings re-matched after an update are already filed; leave them out
+    # so the count is of new matches only
+    filed = SavedSearchMatch.objects.filter(
+        saved_search_id__in={search_id for search_id, _ in candidates},
+        property_id__in={property_id for _, property_id in candidates},
+    ).values_list('saved_search_id', 'property_id')
+    for pair in filed.iterator():
+        candidates.pop(pair, None)
+
+    matches = [
+        SavedSearchMatch(saved_search_id=search_id, user_id=user_id, property_id=property_id)
+        for (search_id, property_id), user_id in candidates.items()
+    ]
+    # ignore_conflicts still covers a concurrent run filing the same pair
+    SavedSearchMatch.objects.bulk_create(matches, batch_size=MATCH_BATCH_SIZE, ignore_conflicts=True)
+    return len(matches)
@@ -0,0 +1,56 @@
+import difflib
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connections
+from django.db.models import F, Max, Q
+
+from .models import Property
+
+
+def is_postgres(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def search_properties(queryset, text):
+    """
+    Full-text search over title, description, city and address.
+
+    On PostgreSQL this matches against the GIN-indexed ``search_vector`` and
+    orders by ``ts_rank``. Other backends (the SQLite test database) fall back
+    to ``icontains`` matching in the default order.
+    """
+    if is_postgres(queryset):
+        query = SearchQuery(text, config='english', search_type='websearch')
+        return queryset.filter(search_vector=query) \
+            .annotate(search_rank=SearchRank(F('search_vector'), query)) \
+            .order_by('-search_rank', '-created_at')
+
+    return queryset.filter(
+        Q(title__icontains=text) |
+        Q(description__icontains=text) |
+        Q(city__icontains=text) |
+        Q(address__icontains=text)
+    )
+
+
+def suggest_cities(text, limit=5):
+    """
+    "Did you mean" suggestions for a city name.
+
+    On PostgreSQL the ``trigram_similar`` lookup (``city % text``) is served
+    by the ``gin_trgm_ops`` index on ``city``. Elsewhere the distinct cities
+    are compared in Python with difflib.
+    """
+    queryset = Property.objects.all()
+    if is_postgres(queryset):
+        rows = queryset.filter(city__trigram_similar=text) \
+            .values('city') \
+            .annotate(similarity=Max(TrigramSimilarity('city', text))) \
+            .order_by('-similarity', 'city')[:limit]
+        return [row['city'] for row in rows]
+
+    cities = {}
+    for city in queryset.values_list('city', flat=True).distinct():
+        cities.setdefault(city.lower(), city)
+    matches = difflib.get_close_matches(text.lower(), list(cities), n=limit, cutoff=0.6)
+    return [cities[match] for match in matches]
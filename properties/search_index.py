@@ -0,0 +1,257 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from .models import Property
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - the index is optional
+    np = None
+
+logger = logging.getLogger(__name__)
+
+INDEX_FIELDS = (
+    'id', 'price', 'bedrooms', 'bathrooms', 'listing_type',
+    'city', 'status', 'created_at', 'updated_at',
+)
+# Query params the index can answer exactly; anything else goes to SQL
+SUPPORTED_PARAMS = {
+    'min_price', 'max_price', 'bedrooms', 'bathrooms', 'listing_type',
+    'city', 'status', 'ordering', 'page', 'page_size', 'fields', 'omit',
+}
+ORDERINGS = {'-created_at', 'created_at', '-price', 'price'}
+LISTING_TYPES = [choice for choice, _ in Property.LISTING_TYPE_CHOICES]
+
+
+class IndexedPropertyList:
+    """
+    Sequence of property ids in result order that hydrates only the slice
+    that is asked for, so Django's paginator sends just the final page's
+    ids to the ORM.
+    """
+
+    def __init__(self, ids, queryset):
+        self.ids = ids
+        self.queryset = queryset
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError("IndexedPropertyList only supports slicing")
+        page_ids = [int(pk) for pk in self.ids[index]]
+        # The queryset may yield instances or values() rows
+        objects = {
+            row['id'] if isinstance(row, dict) else row.pk: row
+            for row in self.queryset.filter(pk__in=page_ids)
+        }
+        # Rows deleted since the last refresh are simply skipped
+        return [objects[pk] for pk in page_ids if pk in objects]
+
+
+class PropertySearchIndex:
+    """
+    Per-process columnar index of available properties.
+
+    Holds price, bedrooms, bathrooms, listing type, city and created_at as
+    NumPy arrays and evaluates list filters as vectorized masks. It refreshes
+    incrementally from an ``updated_at`` high-water mark and rebuilds fully
+    every ``rebuild_seconds`` to drop rows that were hard-deleted.
+    """
+
+    def __init__(self, refresh_seconds=5, rebuild_seconds=600):
+        self.refresh_seconds = refresh_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self._lock = threading.Lock()
+        # Columns, positions, city vocabulary and high-water mark, replaced
+        # as a whole: readers hold no lock, so they must never see a mix
+        self._snapshot = None
+        self._last_refresh = 0.0
+        self._last_rebuild = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.rebuilds = 0
+        self.query_seconds = 0.0
+
+    # Loading
+
+    @staticmethod
+    def _city_code(cities, city):
+        key = (city or '').lower()
+        if key not in cities:
+            cities[key] = len(cities)
+        return cities[key]
+
+    def _encode(self, rows, cities):
+        return {
+            'id': np.array([row[0] for row in rows], dtype=np.int64),
+            'price': np.array([float(row[1]) for row in rows], dtype=np.float64),
+            'bedrooms': np.array([row[2] for row in rows], dtype=np.int64),
+            'bathrooms': np.array([float(row[3]) for row in rows], dtype=np.float64),
+            'listing_type': np.array([
+                LISTING_TYPES.index(row[4]) if row[4] in LISTING_TYPES else -1 for row in rows
+            ], dtype=np.int8),
+            'city': np.array([self._city_code(cities, row[5]) for row in rows], dtype=np.int32),
+            'alive': np.array([row[6] == 'available' for row in rows], dtype=bool),
+            'created_at': np.array([row[7].timestamp() for row in rows], dtype=np.float64),
+        }
+
+    def rebuild(self):
+        rows = list(Property.objects.filter(status='available').values_list(*INDEX_FIELDS))
+        cities = {}
+        self._snapshot = {
+            'columns': self._encode(rows, cities),
+            'positions': {row[0]: position for position, row in enumerate(rows)},
+            'cities': cities,
+            'high_water': max((row[8] for row in rows), default=None),
+        }
+        self._last_refresh = self._last_rebuild = time.monotonic()
+        self.rebuilds += 1
+
+    def refresh(self):
+        """Apply rows changed since the high-water mark."""
+        snapshot = self._snapshot
+        queryset = Property.objects.all()
+        if snapshot['high_water'] is not None:
+            # >= rather than > so rows sharing the mark's timestamp are not missed
+            queryset = queryset.filter(updated_at__gte=snapshot['high_water'])
+        rows = list(queryset.values_list(*INDEX_FIELDS))
+        self._last_refresh = time.monotonic()
+        self.refreshes += 1
+        if not rows:
+            return
+
+        # Changes go into copies that are swapped in with one assignment
+        positions = dict(snapshot['positions'])
+        cities = dict(snapshot['cities'])
+        known = [row for row in rows if row[0] in positions]
+        added = [row for row in rows if row[0] not in positions and row[6] == 'available']
+
+        columns = {name: values.copy() for name, values in snapshot['columns'].items()}
+        if known:
+            indexes = np.array([positions[row[0]] for row in known], dtype=np.int64)
+            for name, values in self._encode(known, cities).items():
+                columns[name][indexes] = values
+        if added:
+            start = len(columns['id'])
+            encoded = self._encode(added, cities)
+            columns = {name: np.concatenate([columns[name], encoded[name]]) for name in columns}
+            for offset, row in enumerate(added):
+                positions[row[0]] = start + offset
+
+        self._snapshot = {
+            'columns': columns,
+            'positions': positions,
+            'cities': cities,
+            'high_water': max(row[8] for row in rows),
+        }
+
+    def ensure_fresh(self):
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._last_refresh < self.refresh_seconds:
+            return
+        with self._lock:
+            if self._snapshot is None or now - self._last_rebuild >= self.rebuild_seconds:
+                self.rebuild()
+            elif now - self._last_refresh >= self.refresh_seconds:
+                self.refresh()
+
+    # Querying
+
+    def parse(self, params):
+        """Return the criteria for ``params``, or None if SQL must answer."""
+        if set(params) - SUPPORTED_PARAMS or params.get('status') != 'available':
+            return None
+        ordering = params.get('ordering', '-created_at')
+        if ordering not in ORDERINGS:
+            return None
+        try:
+            return {
+                'min_price': float(params['min_price']) if params.get('min_price') else None,
+                'max_price': float(params['max_price']) if params.get('max_price') else None,
+                'bedrooms': int(params['bedrooms']) if params.get('bedrooms') else None,
+                'bathrooms': float(params['bathrooms']) if params.get('bathrooms') else None,
+                'listing_type': params.get('listing_type', '').lower() or None,
+                'city': params.get('city', '').lower() or None,
+                'ordering': ordering,
+            }
+        except ValueError:
+            return None
+
+    def search(self, criteria):
+        """Ids of matching properties in result order."""
+        # One read: columns and city codes must come from the same snapshot
+        snapshot = self._snapshot
+        columns = snapshot['columns']
+        mask = columns['alive'].copy()
+        if criteria['min_price'] is not None:
+            mask &= columns['price'] >= criteria['min_price']
+        if criteria['max_price'] is not None:
+            mask &= columns['price'] <= criteria['max_price']
+        if criteria['bedrooms'] is not None:
+            mask &= columns['bedrooms'] == criteria['bedrooms']
+        if criteria['bathrooms'] is not None:
+            mask &= columns['bathrooms'] == criteria['bathrooms']
+        if criteria['listing_type'] is not None:
+            code = LISTING_TYPES.index(criteria['listing_type']) if criteria['listing_type'] in LISTING_TYPES else -2
+            mask &= columns['listing_type'] == code
+        if criteria['city'] is not None:
+            # Same semantics as city__icontains, resolved over the city vocabulary
+            codes = [code for name, code in snapshot['cities'].items() if criteria['city'] in name]
+            mask &= np.isin(columns['city'], codes)
+
+        positions = np.flatnonzero(mask)
+        field = criteria['ordering'].lstrip('-')
+        keys = columns[field][positions]
+        ids = columns['id'][positions]
+        if criteria['ordering'].startswith('-'):
+            order = np.lexsort((-ids, -keys))
+        else:
+            order = np.lexsort((ids, keys))
+        return ids[order]
+
+    def lookup(self, params, queryset):
+        """
+        Answer a list request from the index, or return None (a miss) when
+        the query uses filters only SQL can evaluate.
+        """
+        criteria = self.parse(params)
+        if criteria is None:
+            self.misses += 1
+            return None
+        started = time.perf_counter()
+        self.ensure_fresh()
+        ids = self.search(criteria)
+        self.query_seconds += time.perf_counter() - started
+        self.hits += 1
+        return IndexedPropertyList(ids, queryset)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        snapshot = self._snapshot
+        high_water = snapshot['high_water'] if snapshot is not None else None
+        return {
+            'rows': int(snapshot['columns']['alive'].sum()) if snapshot is not None else 0,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'avg_query_ms': 1000 * self.query_seconds / self.hits if self.hits else 0.0,
+            'refreshes': self.refreshes,
+            'rebuilds': self.rebuilds,
+            'high_water': high_water.isoformat() if high_water else None,
+        }
+
+
+def is_enabled():
+    return np is not None and getattr(settings, 'PROPERTY_SEARCH_INDEX_ENABLED', False)
+
+
+search_index = PropertySearchIndex(
+    refresh_seconds=getattr(settings, 'PROPERTY_SEARCH_INDEX_REFRESH_SECONDS', 5),
+    rebuild_seconds=getattr(settings, 'PROPERTY_SEARCH_INDEX_REBUILD_SECONDS', 600),
+)
@@ -1,19 +1,78 @@
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from decimal import Decimal
-from .models import Property, PropertyType, PropertyImage, Favorite, Reservation
+from .models import (
+    Property, PropertyType, PropertyImage, Favorite, Reservation, CityPriceStats,
+    SavedSearch, SavedSearchMatch, PropertyStats,
+    image_url_from_path, image_srcset,
+)
 from users.serializers import UserSerializer
+from .saved_searches import filters_hash, normalize_filters
+
+def requested_fieldset(request):
+    """
+    Parse ``?fields=a,b`` / ``?omit=c`` from a read request into
+    ``(fields, omit)``; either is None when not given.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None, None
+    fields = request.query_params.get('fields')
+    omit = request.query_params.get('omit')
+    return (
+        [name.strip() for name in fields.split(',') if name.strip()] if fields else None,
+        [name.strip() for name in omit.split(',') if name.strip()] if omit else None,
+    )
+
+
+def view_counts(obj):
+    """
+    ``(views, unique_viewers)`` of a property, zeros before its first flush.
+    Select ``stats`` with the property, or this costs a query per row.
+    """
+    try:
+        stats = obj.stats
+    except PropertyStats.DoesNotExist:
+        return 0, 0
+    return stats.views, stats.unique_viewers
+
+
+class DynamicFieldsMixin:
+    """
+    Sparse fieldsets: drop output fields the client did not ask for, either
+    via the ``fields``/``omit`` kwargs or the request's query string.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        omit = kwargs.pop('omit', None)
+        super().__init__(*args, **kwargs)
+
+        if fields is None and omit is None:
+            fields, omit = requested_fieldset(self.context.get('request'))
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        for name in omit or []:
+            self.fields.pop(name, None)
+
 
 class PropertyImageSerializer(serializers.ModelSerializer):
+    srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = PropertyImage
-        fields = ['id', 'property', 'image', 'is_primary']
+        fields = ['id', 'property', 'image', 'is_primary', 'srcset']
+
+    def get_srcset(self, obj):
+        """{'webp': 'url 320w, ...', 'jpeg': ...}; empty until derivatives exist."""
+        return image_srcset(obj.derivatives)
 
 class PropertyTypeSerializer(serializers.ModelSerializer):
     class Meta:
         model = PropertyType
         fields = ['id', 'name']
 
-class PropertySerializer(serializers.ModelSerializer):
+class PropertySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     images = PropertyImageSerializer(many=True, read_only=True)
     property_type = PropertyTypeSerializer(read_only=True)
     property_type_id = serializers.PrimaryKeyRelatedField(
@@ -22,6 +81,8 @@ class PropertySerializer(serializers.ModelSerializer):
         write_only=True
     )
     owner = UserSerializer(read_only=True)  # Add the nested serializer
+    view_count = serializers.SerializerMethodField()
+    unique_viewers = serializers.SerializerMethodField()
 
     class Meta:
         model = Property
@@ -30,12 +91,20 @@ class PropertySerializer(serializers.ModelSerializer):
             'property_type_id', 'bedrooms', 'bathrooms', 'square_feet',
             'address', 'city', 'state', 'zip_code',
             'latitude', 'longitude', 'status', 'owner',
-            'created_at', 'updated_at', 'images', 'is_verified'
+            'created_at', 'updated_at', 'images', 'is_verified',
+            'view_count', 'unique_viewers'
         ]
         read_only_fields = ['owner', 'created_at', 'updated_at', 'is_verified']
 
-class PropertySerializer2(serializers.ModelSerializer):
+    def get_view_count(self, obj):
+        return view_counts(obj)[0]
+
+    def get_unique_viewers(self, obj):
+        return view_counts(obj)[1]
+
+class PropertySerializer2(DynamicFieldsMixin, serializers.ModelSerializer):
     images = serializers.SerializerMethodField()  # Use a method field for custom logic
+    image_srcset = serializers.SerializerMethodField()
     property_type = PropertyTypeSerializer(read_only=True)
     property_type_id = serializers.PrimaryKeyRelatedField(
         queryset=PropertyType.objects.all(),
@@ -43,6 +112,18 @@ class PropertySerializer2(serializers.ModelSerializer):
         write_only=True
     )
     owner = UserSerializer(read_only=True)
+    view_count = serializers.SerializerMethodField()
+    unique_viewers = serializers.SerializerMethodField()
+    is_favorited = serializers.SerializerMethodField()
+
+    # values() column and converter the fast list path serves method fields from
+    values_fields = {
+        'images': ('primary_image_path', lambda path: image_url_from_path(path) or []),
+        'image_srcset': ('primary_image_derivatives', lambda derivatives: image_srcset(derivatives)),
+        'view_count': ('stats__views', lambda views: views or 0),
+        'unique_viewers': ('stats__unique_viewers', lambda viewers: viewers or 0),
+        'is_favorited': ('is_favorited', bool),
+    }
 
     class Meta:
         model = Property
@@ -51,20 +132,33 @@ class PropertySerializer2(serializers.ModelSerializer):
             'property_type_id', 'bedrooms', 'bathrooms', 'square_feet',
             'address', 'city', 'state', 'zip_code',
             'latitude', 'longitude', 'status', 'owner',
-            'created_at', 'updated_at', 'images', 'is_verified'
+            'created_at', 'updated_at', 'images', 'image_srcset', 'is_verified',
+            'view_count', 'unique_viewers', 'is_favorited'
         ]
         read_only_fields = ['owner', 'created_at', 'updated_at', 'is_verified']
 
     def get_images(self, obj):
         """
         Custom method to return the URL of the primary image or the first image.
+
+        Reads the denormalized ``primary_image_path`` on the property, so list
+        serialization never touches the images table.
         """
-        primary_image = obj.images.filter(is_primary=True).first()  # Get the primary image if it exists
-        if primary_image:
-            return primary_image.image.url  # Return the URL of the primary image
-        elif obj.images.exists():
-            return obj.images.first().image.url  # Return the URL of the first image
-        return []  # Return an empty list if no images are available
+        return obj.primary_image_url or []  # Return an empty list if no images are available
+
+    def get_image_srcset(self, obj):
+        """Resized WebP/JPEG variants of that image, as srcset strings."""
+        return obj.primary_image_srcset
+
+    def get_view_count(self, obj):
+        return view_counts(obj)[0]
+
+    def get_unique_viewers(self, obj):
+        return view_counts(obj)[1]
+
+    def get_is_favorited(self, obj):
+        # Annotated by the list views (annotate_is_favorited); False elsewhere
+        return bool(getattr(obj, 'is_favorited', False))
 
     def create(self, validated_data):
         request = self.context.get('request')
@@ -75,7 +169,7 @@ class PropertySerializer2(serializers.ModelSerializer):
 
         return super().create(validated_data)
 
-class FavoriteSerializer(serializers.ModelSerializer):
+class FavoriteSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     property = PropertySerializer()
 
     class Meta:
@@ -83,12 +177,36 @@ class FavoriteSerializer(serializers.ModelSerializer):
         fields = ['id', 'property', 'created_at']
 
 
+class PropertyCardSerializer(serializers.ModelSerializer):
+    """The few columns a listing card shows; no relations beyond the property row."""
+    thumbnail = serializers.CharField(source='primary_image_thumbnail_url', read_only=True)
+
+    # Columns a card reads, for QuerySet.only()
+    only_fields = ['id', 'title', 'price', 'city', 'status', 'primary_image_path', 'primary_image_derivatives']
+
+    class Meta:
+        model = Property
+        fields = ['id', 'title', 'price', 'city', 'thumbnail', 'status']
+
+
+class FavoriteCardSerializer(serializers.ModelSerializer):
+    property = PropertyCardSerializer(read_only=True)
+
+    only_fields = ['id', 'created_at', 'property'] + [
+        f'property__{name}' for name in PropertyCardSerializer.only_fields
+    ]
+
+    class Meta:
+        model = Favorite
+        fields = ['id', 'property', 'created_at']
+
+
 class CreateFavoriteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Favorite
         fields = ['property']
 
-class ReservationSerializer(serializers.ModelSerializer):
+class ReservationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     property_details = PropertySerializer(source='property', read_only=True)
     user_details = UserSerializer(source='user', read_only=True)
     
@@ -133,4 +251,58 @@ class ReservationSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+
+class CityPriceStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CityPriceStats
+        fields = [
+            'city', 'listing_type', 'bedrooms', 'listings',
+            'price_p25', 'price_median', 'price_p75', 'price_per_sqft_median',
+            'computed_at',
+        ]
+
+
+class SavedSearchSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SavedSearch
+        fields = ['id', 'name', 'filters', 'created_at']
+        read_only_fields = ['created_at']
+
+    def validate_filters(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Expected an object of list filters.")
+        try:
+            filters = normalize_filters(value)
+        except ValueError as e:
+            raise serializers.ValidationError(e.args[0])
+        if not filters:
+            raise serializers.ValidationError("At least one filter is required.")
+        return filters
+
+    def validate(self, data):
+        if 'filters' in data:
+            data['filters_hash'] = filters_hash(data['filters'])
+            user = self.context['request'].user
+            duplicates = SavedSearch.objects.filter(user=user, filters_hash=data['filters_hash'])
+            if self.instance is not None:
+                duplicates = duplicates.exclude(pk=self.instance.pk)
+            if duplicates.exists():
+                raise serializers.ValidationError({"filters": "You already saved this search."})
+        return data
+
+
+class SavedSearchMatchSerializer(serializers.ModelSerializer):
+    title = serializers.CharField(source='property.title', read_only=True)
+    price = serializers.DecimalField(source='property.price', max_digits=12, decimal_places=2, read_only=True)
+    city = serializers.CharField(source='property.city', read_only=True)
+    listing_type = serializers.CharField(source='property.listing_type', read_only=True)
+    primary_image = serializers.CharField(source='property.primary_image_url', read_only=True)
+
+    class Meta:
+        model = SavedSearchMatch
+        fields = [
+            'id', 'saved_search', 'property', 'title', 'price', 'city', 'listing_type',
+            'primary_image', 'created_at', 'seen_at',
+        ]
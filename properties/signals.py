@@ -0,0 +1,106 @@
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .cache import (
+    LIST_NAMESPACE,
+    PROPERTY_TYPE_NAMESPACE,
+    bump_generation,
+    favorites_namespace,
+    owner_namespace,
+    property_namespace,
+)
+from .file_cleanup import begin_file_deletion, schedule_file_deletion
+from .images import stored_names
+from .maps import tile_namespaces_for
+from .models import Property, PropertyImage, PropertyType, Reservation, Favorite
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+def invalidate_property_cache(sender, instance, **kwargs):
+    bump_generation(
+        LIST_NAMESPACE,
+        property_namespace(instance.pk),
+        owner_namespace(instance.owner_id),
+    )
+
+
+# Fields that change how a property is clustered on the map
+MAP_FIELDS = ('geohash', 'status', 'price')
+
+
+@receiver(post_save, sender=Property)
+def invalidate_map_tiles_on_save(sender, instance, created, **kwargs):
+    loaded = getattr(instance, '_loaded_values', {})
+    if not created and all(loaded.get(field) == getattr(instance, field) for field in MAP_FIELDS):
+        return
+    namespaces = set(tile_namespaces_for(instance.geohash))
+    if loaded.get('geohash'):
+        # The property moved out of these tiles
+        namespaces.update(tile_namespaces_for(loaded['geohash']))
+    bump_generation(*namespaces)
+    instance._loaded_values = {**loaded, **{field: getattr(instance, field) for field in MAP_FIELDS}}
+
+
+@receiver(post_delete, sender=Property)
+def invalidate_map_tiles_on_delete(sender, instance, **kwargs):
+    if instance.geohash:
+        bump_generation(*tile_namespaces_for(instance.geohash))
+
+
+@receiver(post_save, sender=PropertyImage)
+@receiver(post_delete, sender=PropertyImage)
+def invalidate_property_image_cache(sender, instance, **kwargs):
+    bump_generation(LIST_NAMESPACE, property_namespace(instance.property_id))
+
+
+@receiver(post_delete, sender=PropertyImage)
+def sync_primary_image_on_delete(sender, instance, origin=None, **kwargs):
+    # Only direct image deletions matter; in a cascade the property is going too
+    if isinstance(origin, PropertyImage) or getattr(origin, 'model', None) is PropertyImage:
+        Property.sync_primary_image(instance.property_id)
+
+
+@receiver(pre_delete, sender=PropertyImage)
+def collect_property_image_files(sender, instance, origin=None, **kwargs):
+    begin_file_deletion(origin)
+
+
+@receiver(post_delete, sender=PropertyImage)
+def delete_property_image_files(sender, instance, using, origin=None, **kwargs):
+    schedule_file_deletion(stored_names(instance.image.name, instance.derivatives), using=using, origin=origin)
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def invalidate_reservation_cache(sender, instance, **kwargs):
+    bump_generation(property_namespace(instance.property_id), owner_namespace(instance.user_id))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def invalidate_favorite_cache(sender, instance, **kwargs):
+    bump_generation(
+        property_namespace(instance.property_id), owner_namespace(instance.user_id),
+        favorites_namespace(instance.user_id),
+    )
+
+
+@receiver(post_save, sender=PropertyType)
+@receiver(post_delete, sender=PropertyType)
+def invalidate_property_type_cache(sender, instance, **kwargs):
+    # Property lists embed the type's name
+    bump_generation(PROPERTY_TYPE_NAMESPACE, LIST_NAMESPACE)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_owner_cache(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login, which no cached representation shows
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    namespaces = [owner_namespace(instance.pk)]
+    # Property lists embed each listing's owner
+    if Property.objects.filter(owner_id=instance.pk).exists():
+        namespaces.append(LIST_NAMESPACE)
+    bump_generation(*namespaces)
@@ -0,0 +1,252 @@
+import logging
+import math
+import threading
+import time
+import uuid
+import warnings
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import similarity_matrix_cache_key, similarity_version_cache_key
+from .models import Property
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - similar listings are optional
+    np = None
+
+logger = logging.getLogger(__name__)
+
+FEATURE_FIELDS = (
+    'id', 'price', 'bedrooms', 'bathrooms', 'square_feet', 'latitude', 'longitude',
+    'property_type_id', 'listing_type', 'status', 'updated_at',
+)
+# Numeric feature -> weight of its squared z-score in the distance. Price and
+# floor area are compared on a log scale.
+FEATURE_WEIGHTS = getattr(settings, 'PROPERTY_SIMILARITY_WEIGHTS', {
+    'price': 3.0,
+    'bedrooms': 1.5,
+    'bathrooms': 1.0,
+    'square_feet': 1.5,
+    'latitude': 1.0,
+    'longitude': 1.0,
+})
+# Added to the distance when the property types differ
+PROPERTY_TYPE_WEIGHT = getattr(settings, 'PROPERTY_SIMILARITY_TYPE_WEIGHT', 2.0)
+FEATURES = tuple(FEATURE_WEIGHTS)
+LISTING_TYPES = [choice for choice, _ in Property.LISTING_TYPE_CHOICES]
+# Compact the matrix once this share of its rows are no longer available
+MAX_DEAD_FRACTION = 0.25
+# One build at a time; a build of a large table takes a while
+BUILD_LOCK_KEY = 'similarity_matrix_build_lock'
+BUILD_LOCK_SECONDS = 15 * 60
+
+
+def _raw_features(rows):
+    """Unscaled feature matrix, NaN where a value is missing."""
+    def number(value):
+        return math.nan if value is None else float(value)
+
+    raw = np.array([
+        [number(row[1]), number(row[2]), number(row[3]), number(row[4]), number(row[5]), number(row[6])]
+        for row in rows
+    ], dtype=np.float64).reshape(len(rows), len(FEATURES))
+    # Columns 0 and 3 are price and square_feet
+    raw[:, [0, 3]] = np.log1p(np.clip(raw[:, [0, 3]], 0, None))
+    return raw
+
+
+def feature_stats(rows):
+    """Per-feature mean and spread used to put features on one scale."""
+    raw = _raw_features(rows)
+    if not len(raw):
+        return np.zeros(len(FEATURES)), np.ones(len(FEATURES))
+    with warnings.catch_warnings():
+        # A column with no values at all (e.g. no coordinates yet) is all-NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = np.nan_to_num(np.nanmean(raw, axis=0))
+        std = np.nan_to_num(np.nanstd(raw, axis=0))
+    std[std == 0] = 1.0
+    return mean, std
+
+
+def encode(rows, stats):
+    """
+    Encode ``FEATURE_FIELDS`` rows as weighted z-scores, so the squared
+    Euclidean distance between two rows is the weighted distance. Missing
+    values sit at the mean and so neither attract nor repel.
+    """
+    mean, std = stats
+    weights = np.sqrt(np.array([FEATURE_WEIGHTS[name] for name in FEATURES]))
+    scaled = np.nan_to_num((_raw_features(rows) - mean) / std) * weights
+    return {
+        'id': np.array([row[0] for row in rows], dtype=np.int64),
+        'features': scaled.astype(np.float32),
+        'property_type': np.array([row[7] if row[7] is not None else -1 for row in rows], dtype=np.int64),
+        'listing_type': np.array([
+            LISTING_TYPES.index(row[8]) if row[8] in LISTING_TYPES else -1 for row in rows
+        ], dtype=np.int8),
+        'alive': np.array([row[9] == 'available' for row in rows], dtype=bool),
+    }
+
+
+def build_matrix():
+    """Feature matrix of every available property, with fresh scaling stats."""
+    rows = list(Property.objects.filter(status='available').values_list(*FEATURE_FIELDS))
+    stats = feature_stats(rows)
+    return {
+        **encode(rows, stats),
+        'stats': stats,
+        'high_water': max((row[10] for row in rows), default=None),
+    }
+
+
+def refresh_matrix(matrix):
+    """
+    Apply the rows changed since ``matrix['high_water']`` in place and return
+    how many there were. Scaling stats are kept until the next full build.
+    """
+    queryset = Property.objects.all()
+    if matrix['high_water'] is not None:
+        # >= rather than > so rows sharing the mark's timestamp are not missed
+        queryset = queryset.filter(updated_at__gte=matrix['high_water'])
+    positions = {pk: position for position, pk in enumerate(matrix['id'].tolist())}
+    rows = [
+        row for row in queryset.values_list(*FEATURE_FIELDS)
+        # Rows at the mark that are already in the matrix were applied with it
+        if matrix['high_water'] is None or row[10] > matrix['high_water'] or row[0] not in positions
+    ]
+    if not rows:
+        return 0
+
+    known = [row for row in rows if row[0] in positions]
+    added = [row for row in rows if row[0] not in positions and row[9] == 'available']
+    columns = ('id', 'features', 'property_type', 'listing_type', 'alive')
+    if known:
+        indexes = np.array([positions[row[0]] for row in known], dtype=np.int64)
+        for name, values in encode(known, matrix['stats']).items():
+            matrix[name][indexes] = values
+    if added:
+        encoded = encode(added, matrix['stats'])
+        for name in columns:
+            matrix[name] = np.concatenate([matrix[name], encoded[name]])
+    matrix['high_water'] = max(row[10] for row in rows)
+    return len(rows)
+
+
+def dead_fraction(matrix):
+    rows = len(matrix['id'])
+    return 1 - matrix['alive'].sum() / rows if rows else 0.0
+
+
+def publish_matrix(matrix):
+    """Store the matrix for every worker, then point them at the new version."""
+    matrix['version'] = uuid.uuid4().hex
+    cache.set(similarity_matrix_cache_key(), matrix, None)
+    cache.set(similarity_version_cache_key(), matrix['version'], None)
+    return matrix
+
+
+def update_matrix(full=False):
+    """
+    Build and publish a fresh matrix when asked, when none is published, or
+    when too many rows of the published one have been sold or withdrawn.
+    Otherwise the changed rows are applied to the published matrix, which
+    is stored again under the same version: running workers keep folding
+    in changes on their own copy (SimilarityIndex) without a download,
+    while a worker that starts later has only the rows since this run to
+    apply. Returns the published matrix, or None while another build holds
+    the lock. Run by the refresh_similarity_matrix task only.
+    """
+    if not cache.add(BUILD_LOCK_KEY, 1, BUILD_LOCK_SECONDS):
+        return None
+    try:
+        matrix = None if full else cache.get(similarity_matrix_cache_key())
+        if matrix is not None:
+            changed = refresh_matrix(matrix)
+            if dead_fraction(matrix) <= MAX_DEAD_FRACTION:
+                if changed:
+                    cache.set(similarity_matrix_cache_key(), matrix, None)
+                return matrix
+        return publish_matrix(build_matrix())
+    finally:
+        cache.delete(BUILD_LOCK_KEY)
+
+
+class SimilarityIndex:
+    """
+    Per-process copy of the published feature matrix. Every ``check_seconds``
+    a worker downloads the matrix if a new build was published, and
+    otherwise applies the rows changed since its copy's high-water mark, so
+    multi-MB downloads only follow rebuilds. Workers never build the matrix:
+    until the task has published one, there is nothing to answer from.
+    """
+
+    def __init__(self, check_seconds=10):
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._last_check = None
+
+    def _is_fresh(self, now):
+        return self._last_check is not None and now - self._last_check < self.check_seconds
+
+    def ensure_loaded(self):
+        """The current matrix, or None until one has been published."""
+        now = time.monotonic()
+        if self._is_fresh(now):
+            return self._matrix
+        with self._lock:
+            if self._is_fresh(now):
+                return self._matrix
+            version = cache.get(similarity_version_cache_key())
+            if version is not None and (self._matrix is None or version != self._matrix['version']):
+                matrix = cache.get(similarity_matrix_cache_key())
+                if matrix is not None:
+                    self._matrix = matrix
+            elif self._matrix is not None:
+                # Readers hold no lock, so changes go into a copy that is swapped in
+                matrix = {
+                    name: value.copy() if isinstance(value, np.ndarray) else value
+                    for name, value in self._matrix.items()
+                }
+                if refresh_matrix(matrix):
+                    self._matrix = matrix
+            self._last_check = now
+        return self._matrix
+
+    def similar(self, row, limit):
+        """
+        Ids of up to ``limit`` available properties closest to ``row`` (a
+        ``FEATURE_FIELDS`` tuple) with the same listing type, best first, or
+        None while no matrix has been published.
+        """
+        matrix = self.ensure_loaded()
+        if matrix is None:
+            return None
+        query = encode([row], matrix['stats'])
+
+        difference = matrix['features'] - query['features'][0]
+        distance = np.einsum('ij,ij->i', difference, difference)
+        distance += PROPERTY_TYPE_WEIGHT * (matrix['property_type'] != query['property_type'][0])
+        excluded = ~matrix['alive'] | (matrix['listing_type'] != query['listing_type'][0]) \
+            | (matrix['id'] == row[0])
+        distance[excluded] = np.inf
+
+        count = min(limit, int(len(distance) - excluded.sum()))
+        if count <= 0:
+            return []
+        nearest = np.argpartition(distance, count - 1)[:count]
+        # Order the top k by distance, ties by id for stable pages
+        order = np.lexsort((matrix['id'][nearest], distance[nearest]))
+        return matrix['id'][nearest[order]].tolist()
+
+
+def is_enabled():
+    return np is not None
+
+
+similarity_index = SimilarityIndex(
+    check_seconds=getattr(settings, 'PROPERTY_SIMILARITY_CHECK_SECONDS', 10),
+)
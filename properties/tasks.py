@@ -1,7 +1,16 @@
+import logging
 from datetime import timedelta
 from django.utils import timezone
 from celery import shared_task
-from .models import Reservation
+from PIL import UnidentifiedImageError
+from . import price_stats, saved_searches, view_counts
+from .cache import LIST_NAMESPACE, bump_generation, property_namespace
+from .file_cleanup import delete_files
+from .images import generate_derivatives, image_storage, stored_names
+from .models import Property, PropertyImage, Reservation
+from .similarity import update_matrix
+
+logger = logging.getLogger(__name__)
 
 @shared_task
 def cleanup_abandoned_reservations():
@@ -19,4 +28,101 @@ def cleanup_abandoned_reservations():
     
     # Mark them as expired
     count = abandoned_reservations.update(status='expired')
-    return f"Cleaned up {count} abandoned reservations"
\ No newline at end of file
+    return f"Cleaned up {count} abandoned reservations"
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def generate_image_derivatives(self, image_id):
+    """
+    Generate thumb/medium/large WebP and JPEG copies of a property image,
+    without EXIF, next to the original. Queued after PropertyImage.save.
+    """
+    image = PropertyImage.objects.filter(pk=image_id).first()
+    if image is None or not image.image:
+        return f"Image {image_id} no longer exists"
+
+    storage = image.image.storage
+    try:
+        derivatives = generate_derivatives(storage, image.image.name)
+    except UnidentifiedImageError as e:
+        # Not an image Pillow can read (an OSError too): retrying cannot help
+        logger.error(f"Image {image_id} is not a readable image: {str(e)}")
+        return f"Image {image_id} is not a readable image"
+    except OSError as e:
+        # Storage hiccups are retried
+        logger.warning(f"Derivatives for image {image_id} failed: {str(e)}")
+        raise self.retry(exc=e)
+
+    # update() avoids PropertyImage.save, which would queue this task again
+    updated = PropertyImage.objects.filter(pk=image_id, image=image.image.name) \
+        .update(derivatives=derivatives)
+    if not updated:
+        # The image was deleted or replaced meanwhile; drop the files just written
+        delete_stored_files.delay(stored_names(None, derivatives))
+        return f"Image {image_id} changed while processing"
+    Property.sync_primary_image(image.property_id)
+    bump_generation(LIST_NAMESPACE, property_namespace(image.property_id))
+    return f"Generated {len(derivatives)} derivative sizes for image {image_id}"
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=60)
+def delete_stored_files(self, names):
+    """
+    Delete property image files (originals and derivatives) in bulk, queued
+    when PropertyImage rows are deleted. A retry only carries the files that
+    failed, and deleting a file that is already gone succeeds.
+    """
+    try:
+        failed = delete_files(image_storage(), names)
+    except Exception as e:
+        # Connection and credential errors fail the whole call; retry it all
+        logger.warning(f"Deleting {len(names)} files failed: {str(e)}")
+        raise self.retry(exc=e)
+
+    if failed:
+        raise self.retry(args=[failed])
+    return f"Deleted {len(names)} files"
+
+
+@shared_task
+def refresh_similarity_matrix(full=False):
+    """
+    Keep the feature matrix behind the similar-listings endpoint current:
+    fold changed rows into the published matrix, or rebuild it when none is
+    published or too many of its rows were sold. Scheduled every few
+    minutes, with a nightly full rebuild to refresh the scaling stats.
+    """
+    matrix = update_matrix(full=full)
+    if matrix is None:
+        return "Similarity matrix is being built by another worker"
+    return f"Similarity matrix has {int(matrix['alive'].sum())} available properties"
+
+
+@shared_task
+def refresh_price_stats():
+    """
+    Recompute the per-city price percentiles served by the price stats
+    endpoint. Runs hourly.
+    """
+    count = price_stats.refresh_price_stats()
+    return f"Computed price stats for {count} city groups"
+
+
+@shared_task
+def match_saved_searches():
+    """
+    File listings created or updated since the last run into the inboxes of
+    the saved searches they match. Runs every minute.
+    """
+    found = saved_searches.match_saved_searches()
+    return f"Filed {found} saved search matches"
+
+
+@shared_task
+def flush_property_views():
+    """
+    Add the view counts buffered in Redis to PropertyStats, exactly once
+    per batch. Runs every five minutes.
+    """
+    count = view_counts.flush_view_counts()
+    return f"Flushed views for {count} properties"
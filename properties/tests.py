@@ -1,7 +1,30 @@
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.http import QueryDict
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from unittest import mock, skipUnless
 from rest_framework import serializers
 from .models import Property, PropertyType, PropertyImage, Favorite, Reservation
 from users.serializers import UserSerializer
 
+try:
+    from moto import mock_aws
+except ImportError:  # moto is a test-only dependency
+    mock_aws = None
+
+try:
+    import fakeredis
+except ImportError:  # fakeredis is a test-only dependency
+    fakeredis = None
+
+
 class PropertyImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = PropertyImage
@@ -121,4 +144,1568 @@ class ReservationSerializer(serializers.ModelSerializer):
         # Let the model's save method handle the calculations
         reservation = Reservation(**validated_data)
         reservation.save()
-        return reservation
\ No newline at end of file
+        return reservation
+
+
+User = get_user_model()
+
+# Smallest valid GIF, enough for ImageField uploads in tests
+TEST_IMAGE = (
+    b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!'
+    b'\xf9\x04\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00'
+    b'\x00\x02\x02D\x01\x00;'
+)
+
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+def create_user(username='owner'):
+    return User.objects.create_user(
+        username=username,
+        email=f'{username}@example.com',
+        password='testpass123'
+    )
+
+
+def create_property(owner, property_type, **kwargs):
+    data = {
+        'listing_type': 'rent',
+        'title': 'Test Property',
+        'description': 'A test property',
+        'price': 100000,
+        'property_type': property_type,
+        'bedrooms': 2,
+        'bathrooms': 1,
+        'square_feet': 900,
+        'address': '1 Test Road',
+        'city': 'Nairobi',
+        'state': 'Nairobi',
+        'zip_code': '00100',
+        'owner': owner,
+    }
+    data.update(kwargs)
+    return Property.objects.create(**data)
+
+
+def create_image(property_obj, is_primary=False):
+    return PropertyImage.objects.create(
+        property=property_obj,
+        image=SimpleUploadedFile('test.gif', TEST_IMAGE, content_type='image/gif'),
+        is_primary=is_primary,
+    )
+
+
+class PropertyAPITestCase(APITestCase):
+    """Stores uploads in a temporary directory per test class."""
+
+    @classmethod
+    def setUpClass(cls):
+        media = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(media.cleanup)
+        storage = override_settings(MEDIA_ROOT=media.name, STORAGES={
+            **settings.STORAGES,
+            'default': {
+                'BACKEND': 'django.core.files.storage.FileSystemStorage',
+                'OPTIONS': {'location': media.name, 'base_url': settings.MEDIA_URL},
+            },
+        })
+        storage.enable()
+        cls.addClassCleanup(storage.disable)
+        super().setUpClass()
+
+
+@override_settings(CACHES=NO_CACHE)
+class PropertyListQueryCountTests(PropertyAPITestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.property_type = PropertyType.objects.create(name='Apartment')
+        for i in range(12):
+            property_obj = create_property(self.user, self.property_type, title=f'Property {i}')
+            create_image(property_obj)
+            create_image(property_obj, is_primary=(i % 2 == 0))
+
+    def count_list_queries(self, page_size):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('property-list'), {'page_size': page_size})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), page_size)
+        return len(context.captured_queries)
+
+    def test_query_count_is_independent_of_page_size(self):
+        self.assertEqual(self.count_list_queries(2), self.count_list_queries(12))
+
+    def test_primary_image_is_preferred(self):
+        response = self.client.get(reverse('property-list'), {'page_size': 12})
+        primaries = {
+            image.property_id: image.image.url
+            for image in PropertyImage.objects.filter(is_primary=True)
+        }
+        for row in response.data['results']:
+            if row['id'] in primaries:
+                self.assertEqual(row['images'], primaries[row['id']])
+
+
+class PrimaryImagePathTests(PropertyAPITestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.property = create_property(self.user, PropertyType.objects.create(name='House'))
+
+    def test_path_follows_primary_image_and_deletion(self):
+        first = create_image(self.property)
+        self.property.refresh_from_db()
+        self.assertEqual(self.property.primary_image_path, first.image.name)
+
+        primary = create_image(self.property, is_primary=True)
+        self.property.refresh_from_db()
+        self.assertEqual(self.property.primary_image_path, primary.image.name)
+
+        primary.delete()
+        self.property.refresh_from_db()
+        self.assertEqual(self.property.primary_image_path, first.image.name)
+
+        first.delete()
+        self.property.refresh_from_db()
+        self.assertEqual(self.property.primary_image_path, '')
+
+
+@override_settings(CACHES=NO_CACHE)
+class PropertySearchTests(PropertyAPITestCase):
+    def setUp(self):
+        self.user = create_user()
+        property_type = PropertyType.objects.create(name='Apartment')
+        self.match = create_property(self.user, property_type, title='Sunny loft', description='Rooftop garden')
+        create_property(self.user, property_type, title='Basement flat', description='Quiet street')
+
+    def test_q_matches_title_and_description(self):
+        for text in ('loft', 'rooftop'):
+            response = self.client.get(reverse('property-list'), {'q': text})
+            self.assertEqual([row['id'] for row in response.data['results']], [self.match.id])
+
+
+@override_settings(CACHES=NO_CACHE)
+class PropertyGeoSearchTests(PropertyAPITestCase):
+    def setUp(self):
+        self.user = create_user()
+        property_type = PropertyType.objects.create(name='Apartment')
+        # Nairobi CBD, Westlands (~4km away) and Mombasa (~440km away)
+        self.cbd = create_property(self.user, property_type, latitude=-1.2864, longitude=36.8172)
+        self.westlands = create_property(self.user, property_type, latitude=-1.2676, longitude=36.8108)
+        self.mombasa = create_property(self.user, property_type, latitude=-4.0435, longitude=39.6682)
+
+    def result_ids(self, params):
+        response = self.client.get(reverse('property-list'), params)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_geohash_is_computed_on_save(self):
+        self.assertTrue(self.cbd.geohash.startswith('kzf0'))
+
+    def test_bbox_filter(self):
+        ids = self.result_ids({'bbox': '36.6,-1.45,37.1,-1.1'})
+        self.assertCountEqual(ids, [self.cbd.id, self.westlands.id])
+
+    def test_radius_filter_orders_by_distance(self):
+        ids = self.result_ids({'near': '-1.2650,36.8100', 'radius_km': 10})
+        self.assertEqual(ids, [self.westlands.id, self.cbd.id])
+        ids = self.result_ids({'near': '-1.2650,36.8100', 'radius_km': 1})
+        self.assertEqual(ids, [self.westlands.id])
+
+    def test_malformed_filters_are_rejected(self):
+        url = reverse('property-list')
+        cases = [
+            ({'bbox': '36.6,-1.45,37.1'}, ['bbox']),
+            ({'bbox': 'a,b,c,d'}, ['bbox']),
+            ({'near': '-1.26', 'radius_km': 5}, ['near']),
+            ({'near': '-1.26,36.81', 'radius_km': 'far'}, ['radius_km']),
+            ({'near': '-1.26,36.81', 'radius_km': -1}, ['radius_km']),
+            # An early bad filter no longer hides the later ones
+            ({'min_price': 'cheap', 'bbox': '36.6,-1.45,37.1'}, ['min_price', 'bbox']),
+            ({'owner': 'me'}, ['owner']),
+        ]
+        for params, fields in cases:
+            with self.subTest(params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertCountEqual(response.data, fields)
+        self.assertEqual(self.client.get(reverse('property-facets'), {'bbox': 'x'}).status_code, 400)
+
+
+class PropertyClusterTests(PropertyAPITestCase):
+    def setUp(self):
+        self.user = create_user()
+        property_type = PropertyType.objects.create(name='Apartment')
+        self.cbd = create_property(self.user, property_type, price=100, latitude=-1.2864, longitude=36.8172)
+        self.westlands = create_property(self.user, property_type, price=300, latitude=-1.2676, longitude=36.8108)
+
+    def get_clusters(self, zoom):
+        response = self.client.get(reverse('property-clusters'), {'bbox': '36.6,-1.45,37.1,-1.1', 'zoom': zoom})
+        self.assertEqual(response.status_code, 200)
+        return response.data['clusters']
+
+    def test_nearby_properties_share_a_cluster_when_zoomed_out(self):
+        [cluster] = self.get_clusters(5)
+        self.assertEqual(cluster['count'], 2)
+        self.assertEqual(cluster['property_id'], self.cbd.id)
+        self.assertEqual((cluster['min_price'], cluster['max_price']), ('100.00', '300.00'))
+
+    def test_status_change_invalidates_cached_tiles(self):
+        self.assertEqual(self.get_clusters(5)[0]['count'], 2)
+        self.westlands.status = 'sold'
+        self.westlands.save()
+        self.assertEqual(self.get_clusters(5)[0]['count'], 1)
+
+    def test_wide_viewport_at_high_zoom_is_rejected_before_listing_tiles(self):
+        url = reverse('property-clusters')
+        with mock.patch('properties.maps.geohash_cells') as cells:
+            response = self.client.get(url, {'bbox': '-180,-90,180,90', 'zoom': 20})
+            self.assertEqual(response.status_code, 400)
+            response = self.client.get(url, {'bbox': '36.3,-1.8,37.3,-0.8', 'zoom': 16})
+            self.assertEqual(response.status_code, 400)
+        cells.assert_not_called()
+
+
+class PropertyFacetTests(PropertyAPITestCase):
+    def setUp(self):
+        self.user = create_user()
+        apartment = PropertyType.objects.create(name='Apartment')
+        house = PropertyType.objects.create(name='House')
+        create_property(self.user, apartment, listing_type='rent', bedrooms=2, city='Nairobi', price=40000)
+        create_property(self.user, apartment, listing_type='rent', bedrooms=3, city='Nairobi', price=60000)
+        create_property(self.user, house, listing_type='sale', bedrooms=3, city='Mombasa', price=9000000)
+
+    def test_all_facets_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('property-facets'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['listing_type'], [
+            {'value': 'rent', 'count': 2}, {'value': 'sale', 'count': 1},
+        ])
+        self.assertEqual(response.data['bedrooms'], [
+            {'value': '3', 'count': 2}, {'value': '2', 'count': 1},
+        ])
+        self.assertEqual(response.data['property_type'], [
+            {'value': 'Apartment', 'count': 2}, {'value': 'House', 'count': 1},
+        ])
+        self.assertEqual(response.data['price'], [
+            {'value': '10000-50000', 'count': 1},
+            {'value': '50000-100000', 'count': 1},
+            {'value': '5000000-10000000', 'count': 1},
+        ])
+
+    def test_facets_respect_list_filters(self):
+        response = self.client.get(reverse('property-facets'), {'city': 'mombasa'})
+        self.assertEqual(response.data['city'], [{'value': 'Mombasa', 'count': 1}])
+
+
+class PropertySearchIndexTests(PropertyAPITestCase):
+    def setUp(self):
+        from .search_index import PropertySearchIndex
+        self.index = PropertySearchIndex(refresh_seconds=0)
+        self.user = create_user()
+        property_type = PropertyType.objects.create(name='Apartment')
+        self.cheap = create_property(self.user, property_type, price=30000, bedrooms=1, city='Nairobi')
+        self.mid = create_property(self.user, property_type, price=60000, bedrooms=2, city='Nairobi West')
+        self.sale = create_property(self.user, property_type, price=90000, bedrooms=2, listing_type='sale', city='Kisumu')
+        create_property(self.user, property_type, price=50000, bedrooms=2, status='sold', city='Nairobi')
+
+    def lookup_ids(self, query):
+        results = self.index.lookup(QueryDict(query), Property.objects.all())
+        return [obj.id for obj in results[:100]]
+
+    def test_matches_sql_filters(self):
+        self.assertEqual(self.lookup_ids('status=available&city=nairobi&ordering=price'), [self.cheap.id, self.mid.id])
+        self.assertEqual(self.lookup_ids('status=available&bedrooms=2&ordering=-price'), [self.sale.id, self.mid.id])
+        self.assertEqual(self.lookup_ids('status=available&listing_type=rent&max_price=40000'), [self.cheap.id])
+
+    def test_unsupported_filters_miss(self):
+        self.assertIsNone(self.index.lookup(QueryDict('status=available&q=loft'), Property.objects.all()))
+        self.assertIsNone(self.index.lookup(QueryDict('city=nairobi'), Property.objects.all()))
+        self.assertEqual(self.index.stats()['misses'], 2)
+
+    def test_incremental_refresh(self):
+        self.assertEqual(len(self.lookup_ids('status=available')), 3)
+        self.cheap.status = 'sold'
+        self.cheap.save()
+        self.assertNotIn(self.cheap.id, self.lookup_ids('status=available'))
+        self.assertEqual(self.index.stats()['rebuilds'], 1)
+
+    def test_refresh_never_changes_a_snapshot_being_read(self):
+        self.index.ensure_fresh()
+        snapshot = self.index._snapshot
+        cities, prices = dict(snapshot['cities']), snapshot['columns']['price'].copy()
+        self.cheap.price = 35000
+        self.cheap.save()
+        create_property(self.user, None, city='Eldoret')
+        self.index.refresh()
+        # A search still holding the old snapshot sees it whole
+        self.assertEqual(snapshot['cities'], cities)
+        self.assertTrue((snapshot['columns']['price'] == prices).all())
+        self.assertIn('eldoret', self.index._snapshot['cities'])
+
+    @override_settings(CACHES=NO_CACHE)
+    def test_sql_fallback_orders_like_the_index(self):
+        # Same created_at everywhere: ties must break the same way
+        Property.objects.update(created_at=self.cheap.created_at)
+        url = reverse('property-list')
+        for ordering in ('', '&ordering=-created_at', '&ordering=price', '&ordering=-price'):
+            with self.subTest(ordering=ordering):
+                query = 'status=available' + ordering
+                response = self.client.get(url + '?' + query)
+                self.assertEqual([row['id'] for row in response.data['results']], self.lookup_ids(query))
+
+
+@override_settings(CACHES=NO_CACHE)
+class SparseFieldsetTests(PropertyAPITestCase):
+    def setUp(self):
+        self.user = create_user()
+        create_property(self.user, PropertyType.objects.create(name='Apartment'))
+
+    def test_fields_and_omit(self):
+        response = self.client.get(reverse('property-list'), {'fields': 'id,title,price'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title', 'price'})
+        response = self.client.get(reverse('property-list'), {'omit': 'description,owner'})
+        self.assertNotIn('description', response.data['results'][0])
+        self.assertNotIn('owner', response.data['results'][0])
+
+    def test_omitted_relations_are_not_joined(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse('property-list'), {'fields': 'id,title'})
+        self.assertFalse(any('users_customuser' in query['sql'] for query in context.captured_queries))
+
+
+class ValuesRowSerializerTests(PropertyAPITestCase):
+    def setUp(self):
+        self.user = create_user()
+        property_type = PropertyType.objects.create(name='Apartment')
+        with_image = create_property(self.user, property_type, title='With image', latitude=-1.29, longitude=36.82)
+        create_image(with_image, is_primary=True)
+        create_property(self.user, None, title='No type', price=250000)
+
+    def render_both(self, query=''):
+        from rest_framework.renderers import JSONRenderer
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+        from .fast_serializers import ValuesRowSerializer
+        from .filters import annotate_is_favorited
+        from .serializers import PropertySerializer2
+
+        request = Request(APIRequestFactory().get('/api/properties/' + query))
+        context = {'request': request}
+        queryset = annotate_is_favorited(Property.objects.order_by('id'), request.user)
+        slow = PropertySerializer2(queryset.select_related('property_type', 'owner'), many=True, context=context).data
+        fast = ValuesRowSerializer(PropertySerializer2(context=context))
+        rows = queryset.values(*fast.columns)
+        return JSONRenderer().render(slow), JSONRenderer().render(fast.to_representation(rows))
+
+    def test_output_is_byte_identical(self):
+        slow, fast = self.render_both()
+        self.assertEqual(slow, fast)
+
+    def test_sparse_fieldset_is_byte_identical(self):
+        slow, fast = self.render_both('?fields=id,price,images,owner')
+        self.assertEqual(slow, fast)
+
+    @override_settings(CACHES=NO_CACHE)
+    def test_list_views_use_values_rows(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('property-list'))
+        self.assertEqual(len(response.data['results']), 2)
+        # values() selects only the serialized columns, never the full user row
+        self.assertFalse(any('"password"' in query['sql'] for query in context.captured_queries))
+        response = self.client.get(reverse('property-list'), {'pagination': 'cursor', 'page_size': 1})
+        self.assertIsNotNone(response.data['next'])
+        self.assertEqual(len(self.client.get(response.data['next']).data['results']), 1)
+
+
+class ConditionalGetTests(PropertyAPITestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.property = create_property(self.user, PropertyType.objects.create(name='Apartment'))
+
+    def revalidate(self, url, response, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_detail_not_modified_until_images_change(self):
+        url = reverse('property-detail', args=[self.property.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+        create_image(self.property)
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_detail_has_no_last_modified(self):
+        # Image changes leave updated_at alone, so it cannot validate the page
+        url = reverse('property-detail', args=[self.property.pk])
+        response = self.client.get(url)
+        self.assertNotIn('Last-Modified', response)
+        create_image(self.property)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['images']), 1)
+
+    def test_detail_follows_owner_and_type_changes(self):
+        url = reverse('property-detail', args=[self.property.pk])
+        response = self.client.get(url)
+        self.user.username = 'landlord'
+        self.user.save()
+        changed = self.revalidate(url, response)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.data['owner']['username'], 'landlord')
+        self.assertEqual(self.revalidate(url, changed).status_code, 304)
+
+        property_type = self.property.property_type
+        property_type.name = 'Studio'
+        property_type.save()
+        changed = self.revalidate(url, changed)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.data['property_type']['name'], 'Studio')
+
+    def test_detail_etag_depends_on_fieldset(self):
+        url = reverse('property-detail', args=[self.property.pk])
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response, fields='id').status_code, 200)
+
+    def test_list_not_modified_until_list_changes(self):
+        url = reverse('property-list')
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+        # A cache hit carries the same validator
+        self.assertEqual(self.client.get(url)['ETag'], response['ETag'])
+
+        create_property(self.user, None, title='Another')
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_property_types_and_average_rating(self):
+        url = reverse('property-types')
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+        PropertyType.objects.create(name='Bungalow')
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+        from reviews.models import Review
+        url = reverse('review-average-rating', kwargs={'property_id': self.property.pk})
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+        Review.objects.create(property=self.property, user=self.user, rating=4)
+        response = self.revalidate(url, response)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['review_count'], 1)
+
+
+class PropertyImportTests(PropertyAPITestCase):
+    CSV = (
+        'title,description,listing_type,price,property_type,bedrooms,bathrooms,square_feet,'
+        'address,city,state,zip_code,latitude,longitude\n'
+        'Loft,Open plan,rent,50000,apartment,1,1,600,1 Road,Nairobi,Nairobi,00100,-1.29,36.82\n'
+        'Villa,Garden,sale,9000000,Mansion,5,4,4000,2 Road,Nairobi,Nairobi,00100,,\n'
+        'Flat,Quiet,rent,abc,Apartment,2,1,800,3 Road,Kisumu,Kisumu,40100,,\n'
+    )
+
+    def setUp(self):
+        self.user = create_user('agent')
+        self.client.force_authenticate(self.user)
+        self.property_type = PropertyType.objects.create(name='Apartment')
+
+    def test_csv_import_reports_row_errors(self):
+        response = self.client.generic(
+            'POST', reverse('property-import'), self.CSV.encode('utf-8'), content_type='text/csv'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['failed']), (1, 2))
+        self.assertEqual(response.data['errors'][0]['line'], 3)
+        self.assertIn('property_type', response.data['errors'][0]['errors'])
+        self.assertIn('price', response.data['errors'][1]['errors'])
+
+        loft = Property.objects.get(title='Loft')
+        self.assertEqual((loft.owner, loft.property_type), (self.user, self.property_type))
+        # Derived fields still apply without Property.save
+        self.assertEqual(loft.reservation_price, 5000)
+        self.assertTrue(loft.geohash)
+
+    def test_ndjson_upload_in_batches(self):
+        lines = [
+            '{"title": "Unit %d", "description": "d", "listing_type": "rent", "price": 1000, '
+            '"bedrooms": 1, "bathrooms": 1, "square_feet": 300, "address": "a", "city": "Nakuru", '
+            '"state": "s", "zip_code": "z"}' % i
+            for i in range(5)
+        ] + ['not json']
+        upload = SimpleUploadedFile('units.ndjson', '\n'.join(lines).encode('utf-8'))
+        response = self.client.post(reverse('property-import'), {'file': upload}, format='multipart')
+        self.assertEqual((response.data['created'], response.data['failed']), (5, 1))
+        self.assertEqual(response.data['errors'][0]['line'], 6)
+        self.assertEqual(Property.objects.filter(city='Nakuru', owner=self.user).count(), 5)
+
+    def test_management_command(self):
+        import os
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'properties.csv')
+        with open(path, 'w') as source:
+            source.write(self.CSV)
+        out = StringIO()
+        call_command('import_properties', path, owner='agent', batch_size=1, stdout=out, stderr=StringIO())
+        self.assertIn('Imported 1 properties (2 rows failed)', out.getvalue())
+
+
+class ExportTests(PropertyAPITestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.other = create_user('other')
+        self.client.force_authenticate(self.user)
+        property_type = PropertyType.objects.create(name='Apartment')
+        self.nairobi = create_property(self.user, property_type, city='Nairobi', title='Say "hi", Nairobi')
+        self.kisumu = create_property(self.user, None, city='Kisumu')
+        Reservation.objects.create(property=self.nairobi, user=self.user, reservation_price=100)
+        Reservation.objects.create(property=self.kisumu, user=self.other, reservation_price=200)
+
+    def read(self, response):
+        import gzip
+        body = b''.join(response.streaming_content)
+        if response.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return body.decode('utf-8')
+
+    def test_csv_export_applies_list_filters(self):
+        import csv
+        import io
+        response = self.client.get(
+            reverse('property-export', args=['csv']), {'city': 'nairobi'}, HTTP_ACCEPT='text/csv'
+        )
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.DictReader(io.StringIO(self.read(response))))
+        self.assertEqual([row['id'] for row in rows], [str(self.nairobi.pk)])
+        self.assertEqual((rows[0]['title'], rows[0]['property_type']), ('Say "hi", Nairobi', 'Apartment'))
+
+    def test_ndjson_export_is_gzipped_on_request(self):
+        import json
+        response = self.client.get(reverse('property-export', args=['ndjson']), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual([row['id'] for row in rows], [self.nairobi.pk, self.kisumu.pk])
+        self.assertEqual(rows[1]['property_type'], None)
+
+    def test_reservation_export_is_scoped_to_user(self):
+        response = self.client.get(reverse('reservation-export', args=['csv']))
+        lines = self.read(response).splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(f'{self.nairobi.reservations.get().pk},{self.nairobi.pk},'))
+
+
+def jpeg_with_exif(width, height):
+    from io import BytesIO
+    from PIL import Image
+    image = Image.new('RGB', (width, height), (200, 30, 30))
+    exif = Image.Exif()
+    exif[0x010F] = 'TestCamera'  # Make
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG', exif=exif)
+    return buffer.getvalue()
+
+
+class ImageDerivativeTests(PropertyAPITestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.property = create_property(self.user, PropertyType.objects.create(name='House'))
+
+    def upload(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return PropertyImage.objects.create(
+                property=self.property,
+                image=SimpleUploadedFile('photo.jpg', jpeg_with_exif(1000, 500), content_type='image/jpeg'),
+                is_primary=True,
+            )
+
+    def test_derivatives_are_generated_without_exif(self):
+        from PIL import Image
+        image = self.upload()
+        image.refresh_from_db()
+        storage = image.image.storage
+        self.assertEqual(
+            {size: entry['width'] for size, entry in image.derivatives.items()},
+            {'thumb': 320, 'medium': 768, 'large': 1000},
+        )
+        for entry in image.derivatives.values():
+            for output in ('webp', 'jpeg'):
+                self.assertTrue(entry[output].startswith(image.image.name.rsplit('.', 1)[0] + '_'))
+                with storage.open(entry[output]) as f:
+                    self.assertFalse(Image.open(f).getexif())
+
+    def test_serializers_expose_srcset(self):
+        image = self.upload()
+        image.refresh_from_db()
+        thumb = image.image.storage.url(image.derivatives['thumb']['webp'])
+
+        response = self.client.get(reverse('property-detail', args=[self.property.pk]))
+        self.assertTrue(response.data['images'][0]['srcset']['webp'].startswith(f'{thumb} 320w, '))
+        response = self.client.get(reverse('property-list'))
+        self.assertTrue(response.data['results'][0]['image_srcset']['jpeg'].endswith(' 1000w'))
+
+    def test_unreadable_uploads_are_not_retried(self):
+        from .tasks import generate_image_derivatives
+        with mock.patch('properties.tasks.generate_image_derivatives.retry') as retry:
+            with self.captureOnCommitCallbacks(execute=True):
+                image = PropertyImage.objects.create(
+                    property=self.property,
+                    image=SimpleUploadedFile('photo.jpg', b'not an image', content_type='image/jpeg'),
+                )
+            self.assertEqual(generate_image_derivatives(image.pk), f"Image {image.pk} is not a readable image")
+        retry.assert_not_called()
+        image.refresh_from_db()
+        self.assertEqual(image.derivatives, {})
+
+    def test_storage_errors_are_retried(self):
+        from celery.exceptions import Retry
+        from .tasks import generate_image_derivatives
+        image = self.upload()
+        with mock.patch('properties.tasks.generate_derivatives', side_effect=OSError('timeout')), \
+                mock.patch('properties.tasks.generate_image_derivatives.retry', side_effect=Retry) as retry:
+            with self.assertRaises(Retry):
+                generate_image_derivatives(image.pk)
+        retry.assert_called_once()
+
+
+class DirectUploadTests(PropertyAPITestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.property = create_property(self.user, PropertyType.objects.create(name='House'))
+        self.client.force_authenticate(self.user)
+
+    def presign(self, **data):
+        data = {'property': self.property.pk, 'content_type': 'image/jpeg', **data}
+        return self.client.post(reverse('property-image-upload'), data, format='json')
+
+    def test_presign_post_and_confirm(self):
+        presigned = self.presign().data
+        self.assertTrue(presigned['key'].startswith('property_images/'))
+        self.assertEqual(presigned['fields']['key'], presigned['key'])
+
+        self.client.force_authenticate(None)
+        form = {**presigned['fields'], 'file': SimpleUploadedFile('photo.jpg', jpeg_with_exif(400, 300))}
+        response = self.client.post(presigned['url'], form, format='multipart')
+        self.assertEqual(response.status_code, 204)
+
+        self.client.force_authenticate(self.user)
+        confirm = reverse('property-image-upload-confirm')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                confirm, {'upload_token': presigned['upload_token'], 'is_primary': True}, format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+        image = PropertyImage.objects.get(pk=response.data['id'])
+        self.assertEqual(image.image.name, presigned['key'])
+        self.assertTrue(image.is_primary)
+        self.assertEqual(image.derivatives['thumb']['width'], 320)
+
+        # Confirming again returns the same image
+        response = self.client.post(confirm, {'upload_token': presigned['upload_token']}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(PropertyImage.objects.count(), 1)
+
+    def test_rejects_other_owners_and_content_types(self):
+        other = create_user('other')
+        self.assertEqual(self.presign(content_type='application/pdf').status_code, 400)
+
+        self.client.force_authenticate(other)
+        self.assertEqual(self.presign().status_code, 404)
+
+    def test_confirm_requires_the_uploaded_object(self):
+        presigned = self.presign().data
+        response = self.client.post(
+            reverse('property-image-upload-confirm'), {'upload_token': presigned['upload_token']}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            reverse('property-image-upload-confirm'), {'upload_token': 'forged'}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_local_upload_checks_the_policy(self):
+        presigned = self.presign().data
+        form = {
+            **presigned['fields'],
+            'key': 'property_images/elsewhere.jpg',
+            'file': SimpleUploadedFile('photo.jpg', jpeg_with_exif(40, 30)),
+        }
+        response = self.client.post(presigned['url'], form, format='multipart')
+        self.assertEqual(response.status_code, 403)
+
+
+class ImageFileDeletionTests(PropertyAPITestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.property = create_property(self.user, PropertyType.objects.create(name='House'))
+
+    def upload(self, is_primary=False):
+        with self.captureOnCommitCallbacks(execute=True):
+            return PropertyImage.objects.create(
+                property=self.property,
+                image=SimpleUploadedFile('photo.jpg', jpeg_with_exif(400, 300), content_type='image/jpeg'),
+                is_primary=is_primary,
+            )
+
+    def stored(self, image):
+        from .images import stored_names
+        image.refresh_from_db()
+        return stored_names(image.image.name, image.derivatives)
+
+    def test_property_delete_removes_all_files_in_one_task(self):
+        from .tasks import delete_stored_files
+        names = self.stored(self.upload(is_primary=True)) + self.stored(self.upload())
+        self.assertEqual(len(names), 2 * 7)
+        storage = PropertyImage._meta.get_field('image').storage
+
+        with mock.patch.object(delete_stored_files, 'delay', wraps=delete_stored_files.delay) as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.property.delete()
+        self.assertEqual(delay.call_count, 1)
+        self.assertFalse([name for name in names if storage.exists(name)])
+
+    def test_rolled_back_delete_keeps_files(self):
+        from django.db import transaction
+        image = self.upload()
+        names = self.stored(image)
+        storage = image.image.storage
+
+        images = PropertyImage.objects.filter(pk=image.pk)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    images.delete()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertTrue(all(storage.exists(name) for name in names))
+
+        # Retrying the same delete starts a fresh batch
+        with mock.patch('properties.tasks.delete_stored_files.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                images.delete()
+        self.assertEqual(len(callbacks), 1)
+        delay.assert_called_once()
+        self.assertCountEqual(delay.call_args.args[0], names)
+
+    def test_queryset_delete_shares_one_task_per_call(self):
+        from django.db import transaction
+        self.upload()
+        self.upload()
+        other = create_property(self.user, None)
+        PropertyImage.objects.create(
+            property=other, image=SimpleUploadedFile('other.gif', TEST_IMAGE, content_type='image/gif'),
+        )
+        with mock.patch('properties.tasks.delete_stored_files.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    PropertyImage.objects.filter(property=self.property).delete()
+                    other.delete()
+        self.assertEqual(delay.call_count, 2)
+        self.assertEqual(sorted(len(call.args[0]) for call in delay.call_args_list), [1, 2 * 7])
+
+    def test_sweeper_deletes_unreferenced_files_only(self):
+        from io import StringIO
+        from django.core.files.base import ContentFile
+        from django.core.management import call_command
+        image = self.upload()
+        names = self.stored(image)
+        storage = image.image.storage
+        stray = storage.save('property_images/stray.jpg', ContentFile(b'x'))
+
+        call_command('sweep_orphan_images', '--min-age-hours=0', stdout=StringIO())
+        self.assertFalse(storage.exists(stray))
+        self.assertTrue(all(storage.exists(name) for name in names))
+
+
+@skipUnless(mock_aws, 'moto is not installed')
+class S3BatchDeleteTests(PropertyAPITestCase):
+    def setUp(self):
+        from storages.backends.s3 import S3Storage
+        self.aws = mock_aws()
+        self.aws.start()
+        self.addCleanup(self.aws.stop)
+        self.storage = S3Storage(
+            bucket_name='homefinder-test',
+            region_name='us-east-1',
+            access_key='testing',
+            secret_key='testing',
+            location='media',
+        )
+        self.client_s3 = self.storage.connection.meta.client
+        self.client_s3.create_bucket(Bucket='homefinder-test')
+
+    def keys(self):
+        response = self.client_s3.list_objects_v2(Bucket='homefinder-test')
+        return sorted(obj['Key'] for obj in response.get('Contents', []))
+
+    def test_keys_are_deleted_in_batches(self):
+        from django.core.files.base import ContentFile
+        from . import file_cleanup
+        names = [self.storage.save(f'property_images/{i}.jpg', ContentFile(b'x')) for i in range(5)]
+        self.storage.save('property_images/keep.jpg', ContentFile(b'x'))
+
+        with mock.patch.object(file_cleanup, 'DELETE_BATCH_SIZE', 2), \
+                mock.patch.object(self.client_s3, 'delete_objects', wraps=self.client_s3.delete_objects) as delete:
+            failed = file_cleanup.delete_files(self.storage, names + ['property_images/missing.jpg'])
+        self.assertEqual(failed, [])
+        self.assertEqual(delete.call_count, 3)
+        self.assertEqual(self.keys(), ['media/property_images/keep.jpg'])
+
+        # Already deleted keys are not an error, so a retry is harmless
+        self.assertEqual(file_cleanup.delete_files(self.storage, names), [])
+
+    def test_stored_files_are_listed_by_storage_name(self):
+        from django.core.files.base import ContentFile
+        from .file_cleanup import iter_stored_files
+        self.storage.save('property_images/a.jpg', ContentFile(b'x'))
+        self.storage.save('other/b.jpg', ContentFile(b'x'))
+        self.assertEqual(
+            [name for name, _ in iter_stored_files(self.storage, 'property_images/')],
+            ['property_images/a.jpg'],
+        )
+
+
+class SimilarPropertiesTests(PropertyAPITestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from .similarity import SimilarityIndex
+        cache.clear()
+        patcher = mock.patch('properties.views.similarity_index', SimilarityIndex(check_seconds=0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = create_user()
+        self.house = PropertyType.objects.create(name='House')
+        self.flat = PropertyType.objects.create(name='Apartment')
+        self.target = create_property(self.user, self.house, price=100000, latitude=-1.29, longitude=36.82)
+
+    def similar(self, **params):
+        response = self.client.get(reverse('property-similar', args=[self.target.pk]), params)
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def build(self):
+        from .tasks import refresh_similarity_matrix
+        refresh_similarity_matrix()
+
+    def test_ranks_by_weighted_distance(self):
+        twin = create_property(self.user, self.house, price=105000, latitude=-1.3, longitude=36.8)
+        other_type = create_property(self.user, self.flat, price=105000, latitude=-1.3, longitude=36.8)
+        pricier = create_property(self.user, self.house, price=400000, bedrooms=4, square_feet=2500,
+                                  latitude=-0.1, longitude=34.7)
+        create_property(self.user, self.house, listing_type='sale', price=100000)
+        create_property(self.user, self.house, status='sold')
+        self.build()
+
+        self.assertEqual(self.similar(), [twin.pk, other_type.pk, pricier.pk])
+        self.assertEqual(self.similar(limit=1), [twin.pk])
+
+    def test_requests_never_build_the_matrix(self):
+        create_property(self.user, self.house, price=101000)
+        with mock.patch('properties.similarity.build_matrix') as build:
+            response = self.client.get(reverse('property-similar', args=[self.target.pk]))
+        build.assert_not_called()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '60')
+
+        self.build()
+        self.assertEqual(len(self.similar()), 1)
+
+    def test_workers_fold_in_changes_without_a_download(self):
+        from django.core.cache import cache
+        from .cache import similarity_matrix_cache_key
+        twin = create_property(self.user, self.house, price=101000)
+        self.build()
+        self.assertEqual(self.similar(), [twin.pk])
+
+        newcomer = create_property(self.user, self.house, price=100000, latitude=-1.29, longitude=36.82)
+        twin.status = 'sold'
+        twin.save()
+        with mock.patch.object(cache, 'get', wraps=cache.get) as get:
+            self.assertEqual(self.similar(), [newcomer.pk])
+        self.assertNotIn(mock.call(similarity_matrix_cache_key()), get.call_args_list)
+
+    def test_task_advances_the_published_matrix(self):
+        from django.core.cache import cache
+        from .cache import similarity_matrix_cache_key, similarity_version_cache_key
+        from .similarity import refresh_matrix
+        twin = create_property(self.user, self.house, price=101000)
+        self.build()
+        version = cache.get(similarity_version_cache_key())
+
+        newcomer = create_property(self.user, self.house, price=100000, latitude=-1.29, longitude=36.82)
+        self.build()
+        # Same version, so running workers do not download it again
+        self.assertEqual(cache.get(similarity_version_cache_key()), version)
+        published = cache.get(similarity_matrix_cache_key())
+        self.assertIn(newcomer.pk, published['id'].tolist())
+        # A worker starting now has nothing left to apply
+        self.assertEqual(refresh_matrix(published), 0)
+        self.assertEqual(self.similar(), [newcomer.pk, twin.pk])
+
+    def test_task_rebuilds_once_too_many_rows_are_sold(self):
+        from django.core.cache import cache
+        from .cache import similarity_version_cache_key
+        from .similarity import BUILD_LOCK_KEY, update_matrix
+        others = [create_property(self.user, self.house, price=100000 + i) for i in range(3)]
+        self.build()
+        version = cache.get(similarity_version_cache_key())
+
+        # A few changes are left to the workers
+        others[0].status = 'sold'
+        others[0].save()
+        self.build()
+        self.assertEqual(cache.get(similarity_version_cache_key()), version)
+
+        others[1].status = 'sold'
+        others[1].save()
+        self.build()
+        self.assertNotEqual(cache.get(similarity_version_cache_key()), version)
+        self.assertEqual(self.similar(), [others[2].pk])
+
+        # One build at a time
+        cache.add(BUILD_LOCK_KEY, 1)
+        self.assertIsNone(update_matrix(full=True))
+
+    def test_unknown_property(self):
+        response = self.client.get(reverse('property-similar', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+
+class PriceStatsTests(PropertyAPITestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = create_user()
+        house = PropertyType.objects.create(name='House')
+        for price, square_feet in [(100, 10), (200, 10), (300, 0), (400, 20)]:
+            create_property(self.user, house, price=price, square_feet=square_feet)
+        create_property(self.user, house, city='nairobi ', price=500, square_feet=50)
+        create_property(self.user, house, price=900, bedrooms=3)
+        create_property(self.user, house, price=10000, status='sold')
+
+    def test_task_computes_percentiles_per_group(self):
+        from decimal import Decimal
+        from .models import CityPriceStats
+        from .tasks import refresh_price_stats
+        refresh_price_stats()
+
+        stats = CityPriceStats.objects.get(city='nairobi', listing_type='rent', bedrooms=2)
+        self.assertEqual(stats.listings, 5)
+        # Linear interpolation, as percentile_cont does
+        self.assertEqual(
+            (stats.price_p25, stats.price_median, stats.price_p75),
+            (Decimal('200.00'), Decimal('300.00'), Decimal('400.00')),
+        )
+        # Per square foot: 10, 20, 20, 10; the zero floor area is left out
+        self.assertEqual(stats.price_per_sqft_median, Decimal('15.00'))
+        self.assertEqual(CityPriceStats.objects.count(), 2)
+
+    def test_endpoint_serves_cached_stats(self):
+        from .tasks import refresh_price_stats
+        refresh_price_stats()
+        url = reverse('price-stats')
+
+        response = self.client.get(url, {'city': 'Nairobi', 'bedrooms': 3})
+        self.assertEqual([row['price_median'] for row in response.data['results']], ['900.00'])
+        with self.assertNumQueries(0):
+            self.client.get(url, {'city': 'Nairobi', 'bedrooms': 3})
+
+        create_property(self.user, None, price=1100, bedrooms=3)
+        refresh_price_stats()
+        response = self.client.get(url, {'city': 'Nairobi', 'bedrooms': 3})
+        self.assertEqual(response.data['results'][0]['price_median'], '1000.00')
+
+        self.assertEqual(self.client.get(url, {'bedrooms': 'two'}).status_code, 400)
+
+
+class SavedSearchTests(PropertyAPITestCase):
+    def setUp(self):
+        self.user = create_user('seeker')
+        self.other = create_user('other')
+        self.owner = create_user()
+        self.house = PropertyType.objects.create(name='House')
+        self.old = create_property(self.owner, self.house, price=90000)
+        self.client.force_authenticate(self.user)
+
+    def save_search(self, filters, user=None):
+        self.client.force_authenticate(user or self.user)
+        response = self.client.post(reverse('saved-search-list'), {'filters': filters}, format='json')
+        self.client.force_authenticate(self.user)
+        return response
+
+    def inbox(self, **params):
+        response = self.client.get(reverse('saved-search-inbox'), params)
+        return [match['property'] for match in response.data['results']]
+
+    def test_filters_are_normalized_and_validated(self):
+        response = self.save_search({'city': ' Nairobi ', 'max_price': '150000', 'listing_type': 'Rent'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['filters'], {'city': 'nairobi', 'max_price': 150000.0, 'listing_type': 'rent'})
+
+        self.assertEqual(self.save_search({'listing_type': 'rent', 'max_price': 150000, 'city': 'NAIROBI'}).status_code, 400)
+        response = self.save_search({'q': 'garden', 'bedrooms': 'two'})
+        self.assertEqual(set(response.data['filters']), {'q', 'bedrooms'})
+
+    def test_bbox_round_trips_in_query_string_order(self):
+        from .saved_searches import match_saved_searches, normalize_filters
+        filters = normalize_filters({'bbox': '36.6,-1.45,37.1,-1.1'})
+        self.assertEqual(filters, {'bbox': '36.6,-1.45,37.1,-1.1'})
+        self.assertEqual(normalize_filters(filters), filters)
+        self.assertEqual(normalize_filters({'bbox': [36.6, -1.45, 37.1, -1.1]}), filters)
+
+        response = self.save_search(filters)
+        self.assertEqual(response.status_code, 201)
+        url = reverse('saved-search-detail', args=[response.data['id']])
+        stored = self.client.get(url).data['filters']
+        response = self.client.put(url, {'filters': stored}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['filters'], filters)
+
+        inside = create_property(self.owner, self.house, latitude=-1.2864, longitude=36.8172)
+        create_property(self.owner, self.house, latitude=-4.04, longitude=39.67)
+        match_saved_searches()
+        self.assertEqual(self.inbox(), [inside.pk])
+
+    def test_new_listings_are_filed_in_each_matching_inbox(self):
+        from .saved_searches import match_saved_searches
+        from .tasks import match_saved_searches as match_task
+        filters = {'city': 'nairobi', 'max_price': 150000, 'bedrooms': 2}
+        self.save_search(filters)
+        self.save_search(filters, user=self.other)
+        self.save_search({'listing_type': 'sale'})
+
+        match = create_property(self.owner, self.house, price=120000)
+        create_property(self.owner, self.house, price=200000)
+        create_property(self.owner, self.house, price=120000, city='Mombasa')
+        late = create_property(self.owner, self.house, price=300000)
+
+        self.assertEqual(match_saved_searches(batch_size=2), 2)
+        self.assertEqual(self.inbox(), [match.pk])
+
+        # Re-running files nothing twice; a price drop brings a listing in
+        late.price = 140000
+        late.save()
+        match_task()
+        self.assertEqual(self.inbox(), [late.pk, match.pk])
+        # Listings at the mark are looked at again, but only new matches count
+        self.assertEqual(match_saved_searches(), 0)
+        self.assertEqual(self.inbox(), [late.pk, match.pk])
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.inbox(), [late.pk, match.pk])
+
+    def test_mark_seen(self):
+        from .saved_searches import match_saved_searches
+        self.save_search({'city': 'nairobi'})
+        first = create_property(self.owner, self.house)
+        second = create_property(self.owner, self.house)
+        match_saved_searches()
+
+        inbox_ids = {
+            match['property']: match['id']
+            for match in self.client.get(reverse('saved-search-inbox')).data['results']
+        }
+        response = self.client.post(reverse('saved-search-mark-seen'), {'ids': [inbox_ids[first.pk]]}, format='json')
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(self.inbox(unseen='true'), [second.pk])
+        self.client.post(reverse('saved-search-mark-seen'), {}, format='json')
+        self.assertEqual(self.inbox(unseen='true'), [])
+
+        for ids in (['abc'], [None], 'all', [{'id': 1}]):
+            with self.subTest(ids=ids):
+                response = self.client.post(reverse('saved-search-mark-seen'), {'ids': ids}, format='json')
+                self.assertEqual(response.status_code, 400)
+
+
+class PropertyViewCountTests(PropertyAPITestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = create_user()
+        self.property = create_property(self.user, PropertyType.objects.create(name='House'))
+        # Listing ids are reused across tests; start with no views seen
+        from .view_counts import LocalViewCounter
+        patcher = mock.patch('properties.view_counts._local_counter', LocalViewCounter())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @skipUnless(fakeredis, 'fakeredis is not installed')
+    def test_redis_counter_dedupes_and_flushes_in_bulk(self):
+        from .models import PropertyStats
+        from .view_counts import RedisViewCounter, flush_view_counts
+        other = create_property(self.user, None)
+        counter = RedisViewCounter(fakeredis.FakeRedis())
+        for visitor in ('a', 'a', 'b'):
+            counter.record(self.property.pk, visitor)
+        counter.record(other.pk, 'a')
+        counter.record(0, 'a')  # A listing deleted since
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(flush_view_counts(counter), 2)
+        # One UPDATE for both listings, not one per listing
+        self.assertEqual(sum('UPDATE' in q['sql'] for q in queries.captured_queries), 1)
+        self.assertEqual(PropertyStats.objects.get(pk=self.property.pk).views, 2)
+        self.assertEqual(flush_view_counts(counter), 0)
+
+        # Repeat views in the same window are not counted, new visitors are
+        counter.record(self.property.pk, 'a')
+        counter.record(self.property.pk, 'c')
+        flush_view_counts(counter)
+        stats = PropertyStats.objects.get(pk=self.property.pk)
+        self.assertEqual((stats.views, stats.unique_viewers), (3, 3))
+
+    @skipUnless(fakeredis, 'fakeredis is not installed')
+    def test_unacknowledged_counts_are_drained_again(self):
+        from .view_counts import RedisViewCounter
+        counter = RedisViewCounter(fakeredis.FakeRedis())
+        counter.record(self.property.pk, 'a')
+        batch_id, pending = counter.drain()
+        self.assertEqual(pending, {self.property.pk: (1, 1)})
+        counter.record(self.property.pk, 'b')
+        # The failed batch comes back, same id, before the newer view; uniques
+        # are a running total, so they already include it
+        self.assertEqual(counter.drain(), (batch_id, {self.property.pk: (1, 2)}))
+        counter.ack('stale')
+        self.assertEqual(counter.drain()[0], batch_id)
+        counter.ack(batch_id)
+        next_id, pending = counter.drain()
+        self.assertNotEqual(next_id, batch_id)
+        self.assertEqual(pending, {self.property.pk: (1, 2)})
+
+    def test_batch_retried_after_a_crash_is_counted_once(self):
+        from .models import PropertyStats
+        from .view_counts import LocalViewCounter, flush_view_counts
+        counter = LocalViewCounter()
+        counter.record(self.property.pk, 'a')
+        counter.record(self.property.pk, 'b')
+        # The worker dies after the commit, before Redis hears about it
+        with mock.patch.object(counter, 'ack'):
+            self.assertEqual(flush_view_counts(counter), 1)
+        self.assertEqual(flush_view_counts(counter), 0)
+        self.assertEqual(PropertyStats.objects.get(pk=self.property.pk).views, 2)
+        self.assertEqual(counter.drain(), (None, {}))
+
+    def test_flush_refreshes_the_cached_detail(self):
+        from .view_counts import flush_view_counts
+        url = reverse('property-detail', args=[self.property.pk])
+        first = self.client.get(url)
+        flush_view_counts()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['view_count'], 1)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+    def test_flush_refreshes_cached_list_pages(self):
+        from .view_counts import flush_view_counts
+        list_url = reverse('property-list')
+        first = self.client.get(list_url)
+        self.assertEqual(first.data['results'][0]['view_count'], 0)
+        self.client.get(reverse('property-detail', args=[self.property.pk]))
+        flush_view_counts()
+        response = self.client.get(list_url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['view_count'], 1)
+        # A flush with nothing to add leaves the cached pages alone
+        flush_view_counts()
+        self.assertEqual(self.client.get(list_url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_forwarded_for_is_only_trusted_behind_configured_proxies(self):
+        from rest_framework.test import APIRequestFactory
+        from django.contrib.auth.models import AnonymousUser
+        from .view_counts import visitor_id
+
+        def request(forwarded):
+            request = APIRequestFactory().get('/', HTTP_X_FORWARDED_FOR=forwarded, REMOTE_ADDR='10.0.0.1')
+            request.user = AnonymousUser()
+            return request
+
+        # Without a proxy, anyone can write the header: only REMOTE_ADDR counts
+        self.assertEqual(visitor_id(request('1.1.1.1')), visitor_id(request('2.2.2.2')))
+        with mock.patch('properties.view_counts.TRUSTED_PROXIES', 1):
+            # The proxy appends the address it saw; spoofed entries precede it
+            self.assertEqual(visitor_id(request('6.6.6.6, 1.1.1.1')), visitor_id(request('1.1.1.1')))
+            self.assertNotEqual(visitor_id(request('1.1.1.1')), visitor_id(request('2.2.2.2')))
+
+    def test_detail_views_reach_the_serializers(self):
+        from .tasks import flush_property_views
+        url = reverse('property-detail', args=[self.property.pk])
+        self.client.get(url)
+        self.client.get(url)
+        self.client.force_authenticate(self.user)
+        self.client.get(url)
+        flush_property_views()
+
+        response = self.client.get(reverse('property-list'))
+        self.assertEqual(response.data['results'][0]['view_count'], 2)
+        self.assertEqual(response.data['results'][0]['unique_viewers'], 2)
+        response = self.client.get(reverse('user-properties'), {'omit': 'images'})
+        self.assertEqual(response.data['results'][0]['view_count'], 2)
+
+
+class FavoriteMarkerTests(PropertyAPITestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = create_user('buyer')
+        self.other = create_user('other')
+        property_type = PropertyType.objects.create(name='House')
+        self.liked = create_property(self.other, property_type, title='Liked')
+        self.plain = create_property(self.other, property_type, title='Plain')
+        Favorite.objects.create(user=self.user, property=self.liked)
+
+    def marks(self, response):
+        return {row['id']: row['is_favorited'] for row in response.data['results']}
+
+    def test_list_marks_favorites_in_the_page_query(self):
+        self.client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('property-list'))
+        self.assertEqual(self.marks(response), {self.liked.pk: True, self.plain.pk: False})
+        # Page COUNT plus the page itself; no query per row or per favorite
+        self.assertEqual(len(queries), 2)
+
+        # The serializer path reads the same annotation
+        response = self.client.get(reverse('property-list'), {'fields': 'id,is_favorited,property_type'})
+        self.assertEqual(self.marks(response), {self.liked.pk: True, self.plain.pk: False})
+
+    def test_cached_pages_are_per_user(self):
+        self.client.force_authenticate(self.user)
+        self.assertTrue(self.marks(self.client.get(reverse('property-list')))[self.liked.pk])
+        self.client.force_authenticate(self.other)
+        self.assertFalse(self.marks(self.client.get(reverse('property-list')))[self.liked.pk])
+        self.client.force_authenticate(None)
+        self.assertFalse(self.marks(self.client.get(reverse('property-list')))[self.liked.pk])
+
+        # A new favorite expires the user's cached pages
+        self.client.force_authenticate(self.user)
+        Favorite.objects.create(user=self.user, property=self.plain)
+        self.assertTrue(self.marks(self.client.get(reverse('property-list')))[self.plain.pk])
+
+    def test_favorite_ids_are_cached_and_invalidated(self):
+        self.client.force_authenticate(self.user)
+        url = reverse('favorite-ids')
+        self.assertEqual(self.client.get(url).data, {'count': 1, 'ids': [self.liked.pk]})
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        response = self.client.post(reverse('favorite-list'), {'property': self.plain.pk})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.client.get(url).data['ids'], [self.plain.pk, self.liked.pk])
+
+        favorite = Favorite.objects.get(user=self.user, property=self.liked)
+        self.client.delete(reverse('favorite-detail', args=[favorite.pk]))
+        self.assertEqual(self.client.get(url).data['ids'], [self.plain.pk])
+
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(url).data['ids'], [])
+
+
+class FavoriteCardTests(PropertyAPITestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = create_user('buyer')
+        owner = create_user()
+        property_type = PropertyType.objects.create(name='House')
+        self.properties = [create_property(owner, property_type, title=f'Home {i}') for i in range(3)]
+        for prop in self.properties:
+            Favorite.objects.create(user=self.user, property=prop)
+        self.client.force_authenticate(self.user)
+
+    def test_cards_load_in_constant_queries(self):
+        Property.objects.filter(pk=self.properties[0].pk).update(
+            primary_image_path='property_images/a.jpg',
+            primary_image_derivatives={'thumb': {'width': 320, 'jpeg': 'property_images/a_thumb.jpg'}},
+        )
+        # COUNT plus one joined page query, however many favorites
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('favorite-list'))
+        results = response.data['results']
+        self.assertEqual([row['property']['id'] for row in results], [p.pk for p in reversed(self.properties)])
+        card = results[-1]['property']
+        self.assertEqual(set(card), {'id', 'title', 'price', 'city', 'thumbnail', 'status'})
+        self.assertTrue(card['thumbnail'].endswith('property_images/a_thumb.jpg'))
+        self.assertIsNone(results[0]['property']['thumbnail'])
+
+        # Details still carry the full property
+        response = self.client.get(reverse('favorite-detail', args=[results[0]['id']]))
+        self.assertIn('description', response.data['property'])
+
+    def test_page_is_cached_per_user_and_invalidated(self):
+        url = reverse('favorite-list')
+        self.assertEqual(self.client.get(url).data['count'], 3)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        Favorite.objects.filter(property=self.properties[0]).delete()
+        self.assertEqual(len(self.client.get(url).data['results']), 2)
+
+        prop = self.properties[1]
+        prop.title = 'Renamed'
+        prop.save()
+        titles = [row['property']['title'] for row in self.client.get(url).data['results']]
+        self.assertIn('Renamed', titles)
+
+        other = create_user('other')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(url).data['count'], 0)
+
+
+@override_settings(CACHES=NO_CACHE)
+class KeysetPaginationTests(PropertyAPITestCase):
+    def setUp(self):
+        owner = create_user()
+        property_type = PropertyType.objects.create(name='House')
+        # Three listings tie on price, so a page boundary falls inside the tie
+        prices = [300, 100, 200, 200, 200, 400]
+        self.properties = [create_property(owner, property_type, price=price) for price in prices]
+        self.url = reverse('property-list')
+
+    def walk(self, params):
+        ids, pages = [], []
+        response = self.client.get(self.url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append(response)
+            ids.extend(row['id'] for row in response.data['results'])
+            if response.data['next'] is None:
+                return ids, pages
+            response = self.client.get(response.data['next'])
+
+    def test_ties_on_the_sort_key_span_pages_without_gaps(self):
+        ids, pages = self.walk({'pagination': 'cursor', 'ordering': 'price', 'page_size': 2})
+        expected = [p.pk for p in sorted(self.properties, key=lambda p: (p.price, p.pk))]
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(pages), 3)
+        self.assertNotIn('count', pages[0].data)
+
+        ids, _ = self.walk({'pagination': 'cursor', 'ordering': '-price', 'page_size': 2})
+        self.assertEqual(ids, list(reversed(expected)))
+
+    def test_previous_link_returns_the_preceding_page(self):
+        _, pages = self.walk({'pagination': 'cursor', 'ordering': 'price', 'page_size': 2})
+        self.assertIsNone(pages[0].data['previous'])
+        for before, page in zip(pages, pages[1:]):
+            response = self.client.get(page.data['previous'])
+            self.assertEqual(
+                [row['id'] for row in response.data['results']],
+                [row['id'] for row in before.data['results']],
+            )
+
+    def test_previous_link_of_an_empty_page_stays_in_cursor_mode(self):
+        import base64
+        import json
+        # Past the last listing; cursor mode is implied by the cursor alone
+        cursor = base64.urlsafe_b64encode(json.dumps({'v': '1000', 'id': 0}).encode()).decode().rstrip('=')
+        response = self.client.get(self.url, {'cursor': cursor, 'ordering': 'price', 'page_size': 2})
+        self.assertEqual(response.data['results'], [])
+        self.assertIn('pagination=cursor', response.data['previous'])
+        self.assertNotIn('cursor=' + cursor, response.data['previous'])
+
+        first = self.client.get(response.data['previous'])
+        self.assertNotIn('count', first.data)
+        self.assertEqual(len(first.data['results']), 2)
+
+    def test_invalid_or_tampered_cursor_is_not_found(self):
+        import base64
+        import json
+        bad_value = base64.urlsafe_b64encode(json.dumps({'v': 'cheap', 'id': 1}).encode()).decode().rstrip('=')
+        missing_id = base64.urlsafe_b64encode(json.dumps({'v': '100'}).encode()).decode().rstrip('=')
+        for cursor in ('not-a-cursor!', bad_value, missing_id):
+            response = self.client.get(self.url, {'cursor': cursor, 'ordering': 'price'})
+            self.assertEqual(response.status_code, 404, cursor)
+        response = self.client.get(self.url, {'cursor': bad_value, 'ordering': '-created_at'})
+        self.assertEqual(response.status_code, 404)
+
+
+class PropertyListPageCacheTests(PropertyAPITestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = create_user()
+        self.property = create_property(self.user, PropertyType.objects.create(name='House'))
+        self.url = reverse('property-list')
+
+    def test_reordered_params_share_one_entry_and_etag(self):
+        first = self.client.get(self.url + '?city=Nairobi&min_price=1&bedrooms=2')
+        self.assertEqual(first.data['count'], 1)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url + '?bedrooms=2&min_price=1&city=Nairobi')
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        # A different query is a different page
+        self.assertNotEqual(self.client.get(self.url + '?city=Mombasa')['ETag'], first['ETag'])
+
+    def test_saving_a_property_or_image_invalidates_the_page(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['results'][0]['images'], [])
+
+        create_image(self.property)
+        response = self.client.get(self.url)
+        self.assertIn('property_images/', response.json()['results'][0]['images'])
+
+        self.property.title = 'Renamed'
+        self.property.save()
+        self.assertEqual(self.client.get(self.url).json()['results'][0]['title'], 'Renamed')
+
+
+class GenerationInvalidationTests(PropertyAPITestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = create_user()
+        self.buyer = create_user('buyer')
+        self.property_type = PropertyType.objects.create(name='House')
+        self.property = create_property(self.user, self.property_type)
+
+    def generations(self):
+        from .cache import (
+            LIST_NAMESPACE, PROPERTY_TYPE_NAMESPACE, favorites_namespace, get_generations,
+            owner_namespace, property_namespace,
+        )
+        namespaces = {
+            'list': LIST_NAMESPACE,
+            'property_types': PROPERTY_TYPE_NAMESPACE,
+            'property': property_namespace(self.property.pk),
+            'owner': owner_namespace(self.user.pk),
+            'buyer': owner_namespace(self.buyer.pk),
+            'favorites': favorites_namespace(self.buyer.pk),
+        }
+        return dict(zip(namespaces, get_generations(*namespaces.values())))
+
+    def assertBumps(self, expected, action):
+        before = self.generations()
+        action()
+        after = self.generations()
+        self.assertEqual({name for name in after if after[name] != before[name]}, set(expected))
+
+    def test_each_model_bumps_its_namespaces(self):
+        def save_property():
+            self.property.title = 'Renamed'
+            self.property.save()
+
+        image = []
+        reservation = []
+        favorite = []
+        cases = [
+            (save_property, {'list', 'property', 'owner'}),
+            (lambda: image.append(create_image(self.property)), {'list', 'property'}),
+            (lambda: image[0].delete(), {'list', 'property'}),
+            (lambda: reservation.append(Reservation.objects.create(
+                property=self.property, user=self.buyer, reservation_price=100)), {'property', 'buyer'}),
+            (lambda: reservation[0].delete(), {'property', 'buyer'}),
+            (lambda: favorite.append(Favorite.objects.create(
+                user=self.buyer, property=self.property)), {'property', 'buyer', 'favorites'}),
+            (lambda: favorite[0].delete(), {'property', 'buyer', 'favorites'}),
+            (lambda: PropertyType.objects.create(name='Villa'), {'property_types', 'list'}),
+            # The owner of a listing appears in list pages; a buyer does not
+            (lambda: self.user.save(), {'owner', 'list'}),
+            (lambda: self.buyer.save(), {'buyer'}),
+            (lambda: self.user.save(update_fields=['last_login']), set()),
+        ]
+        for action, expected in cases:
+            with self.subTest(expected=expected):
+                self.assertBumps(expected, action)
+
+        with self.subTest('delete property'):
+            self.assertBumps({'list', 'property', 'owner'}, self.property.delete)
+
+    def test_list_and_detail_follow_the_bumps(self):
+        list_url = reverse('property-list')
+        detail_url = reverse('property-detail', args=[self.property.pk])
+        self.assertEqual(self.client.get(list_url).json()['results'][0]['title'], 'Test Property')
+        self.assertEqual(self.client.get(detail_url).json()['title'], 'Test Property')
+
+        self.property.title = 'Renamed'
+        self.property.save()
+        self.assertEqual(self.client.get(list_url).json()['results'][0]['title'], 'Renamed')
+        self.assertEqual(self.client.get(detail_url).json()['title'], 'Renamed')
+
+        self.property_type.name = 'Cottage'
+        self.property_type.save()
+        self.assertEqual(self.client.get(list_url).json()['results'][0]['property_type']['name'], 'Cottage')
+
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        self.assertEqual(self.client.get(list_url).json()['results'][0]['owner']['first_name'], 'Renamed')
+
+        create_image(self.property)
+        self.assertEqual(len(self.client.get(detail_url).json()['images']), 1)
+
+        self.property.delete()
+        self.assertEqual(self.client.get(list_url).json()['count'], 0)
+        self.assertEqual(self.client.get(detail_url).status_code, 404)
+
+
+class CitySuggestionTests(PropertyAPITestCase):
+    def setUp(self):
+        self.user = create_user()
+        property_type = PropertyType.objects.create(name='House')
+        for city in ('Nairobi', 'Nairobi', 'Nakuru', 'Mombasa'):
+            create_property(self.user, property_type, city=city)
+        self.url = reverse('city-suggest')
+
+    def test_suggests_close_city_names_once(self):
+        response = self.client.get(self.url, {'q': 'nairbi'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['suggestions'][0], 'Nairobi')
+        self.assertEqual(response.data['suggestions'].count('Nairobi'), 1)
+        self.assertNotIn('Mombasa', response.data['suggestions'])
+        self.assertEqual(self.client.get(self.url, {'q': 'zzzz'}).data['suggestions'], [])
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+
+    @skipUnless(connection.vendor == 'postgresql', 'trigram lookups need PostgreSQL (see migration 0013)')
+    def test_trigram_index_serves_suggestions(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT indexname FROM pg_indexes WHERE indexname = 'properties_property_city_trgm'")
+            self.assertIsNotNone(cursor.fetchone())
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'q': 'nairbi'})
+        self.assertEqual(response.data['suggestions'][0], 'Nairobi')
+        self.assertTrue(any(' % ' in query['sql'] for query in queries.captured_queries))
+
+    @skipUnless(connection.vendor == 'postgresql', 'trigram indexes need PostgreSQL (see migration 0021)')
+    def test_trigram_index_serves_the_city_filter(self):
+        from .filters import filter_properties
+        with connection.cursor() as cursor:
+            # A handful of rows would otherwise always be scanned
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = filter_properties(Property.objects.all(), {'city': 'airob'}).explain()
+        self.assertIn('properties_property_city_upper_trgm', plan)
+        self.assertEqual(filter_properties(Property.objects.all(), {'city': 'airob'}).count(), 2)
+
+    @override_settings(CACHES=NO_CACHE)
+    def test_listing_type_matches_exactly(self):
+        create_property(self.user, None, listing_type='sale')
+        url = reverse('property-list')
+        self.assertEqual(self.client.get(url, {'listing_type': 'rent'}).data['count'], 4)
+        self.assertEqual(self.client.get(url, {'listing_type': 'sale'}).data['count'], 1)
+        # No substring matching: 'ren' is not a listing type, it does not match 'rent'
+        for value in ('ren', 'e'):
+            response = self.client.get(url, {'listing_type': value})
+            self.assertEqual(response.status_code, 400)
+            self.assertNotIn('results', response.data)
+
+
+class CeleryBeatScheduleTests(PropertyAPITestCase):
+    def test_periodic_property_tasks_are_in_the_effective_schedule(self):
+        from HomeFinderBackend.celery import app
+        from . import tasks
+        scheduled = {name: entry['task'] for name, entry in app.conf.beat_schedule.items()}
+        expected = {
+            'refresh-similarity-matrix': tasks.refresh_similarity_matrix,
+            'rebuild-similarity-matrix': tasks.refresh_similarity_matrix,
+            'refresh-price-stats': tasks.refresh_price_stats,
+            'match-saved-searches': tasks.match_saved_searches,
+            'flush-property-views': tasks.flush_property_views,
+        }
+        for name, task in expected.items():
+            with self.subTest(name):
+                self.assertEqual(scheduled.get(name), task.name)
+        self.assertEqual(app.conf.beat_schedule['rebuild-similarity-matrix']['kwargs'], {'full': True})
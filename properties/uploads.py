@@ -0,0 +1,126 @@
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from .images import image_storage
+
+# Image types clients may upload directly, and the extension stored for each
+UPLOAD_CONTENT_TYPES = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+    'image/gif': 'gif',
+}
+UPLOAD_PREFIX = 'property_images/'
+UPLOAD_EXPIRES_SECONDS = getattr(settings, 'PROPERTY_IMAGE_UPLOAD_EXPIRES_SECONDS', 15 * 60)
+UPLOAD_MAX_BYTES = getattr(settings, 'PROPERTY_IMAGE_UPLOAD_MAX_BYTES', 20 * 1024 * 1024)
+UPLOAD_TOKEN_SALT = 'properties.uploads'
+
+
+class UploadError(ValueError):
+    pass
+
+
+def new_upload_key(content_type):
+    if content_type not in UPLOAD_CONTENT_TYPES:
+        raise UploadError(f"Unsupported content type '{content_type}'")
+    return f'{UPLOAD_PREFIX}{uuid.uuid4().hex}.{UPLOAD_CONTENT_TYPES[content_type]}'
+
+
+def make_upload_token(payload):
+    return signing.dumps(payload, salt=UPLOAD_TOKEN_SALT, compress=True)
+
+
+def read_upload_token(token):
+    """Decode a token issued within the upload window, or raise UploadError."""
+    try:
+        return signing.loads(token, salt=UPLOAD_TOKEN_SALT, max_age=UPLOAD_EXPIRES_SECONDS)
+    except signing.BadSignature:
+        raise UploadError("Invalid or expired upload token")
+
+
+class S3UploadBackend:
+    """Presigned S3 POST policies against the bucket of the image storage."""
+
+    def __init__(self, storage=None):
+        self.storage = storage or image_storage()
+
+    @property
+    def client(self):
+        return self.storage.connection.meta.client
+
+    def object_key(self, name):
+        # Storage names are relative to its location prefix (e.g. media/)
+        return self.storage._normalize_name(name)
+
+    def presign(self, request, name, content_type, max_bytes):
+        fields = {'Content-Type': content_type}
+        conditions = [{'Content-Type': content_type}, ['content-length-range', 1, max_bytes]]
+        acl = getattr(self.storage, 'default_acl', None)
+        if acl:
+            fields['acl'] = acl
+            conditions.append({'acl': acl})
+        cache_control = (getattr(self.storage, 'object_parameters', None) or {}).get('CacheControl')
+        if cache_control:
+            fields['Cache-Control'] = cache_control
+            conditions.append({'Cache-Control': cache_control})
+        return self.client.generate_presigned_post(
+            Bucket=self.storage.bucket_name,
+            Key=self.object_key(name),
+            Fields=fields,
+            Conditions=conditions,
+            ExpiresIn=UPLOAD_EXPIRES_SECONDS,
+        )
+
+    def uploaded_size(self, name):
+        """Size of the uploaded object, or None if it is not there (yet)."""
+        from botocore.exceptions import ClientError
+        try:
+            head = self.client.head_object(Bucket=self.storage.bucket_name, Key=self.object_key(name))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return head['ContentLength']
+
+
+class LocalUploadBackend:
+    """
+    Stand-in for S3 in development and tests: the "presigned" form posts to
+    LocalUploadView, which checks a signed policy and writes the file to the
+    image storage (FileSystemStorage in test_settings).
+    """
+
+    def __init__(self, storage=None):
+        self.storage = storage or image_storage()
+
+    def presign(self, request, name, content_type, max_bytes):
+        policy = make_upload_token({'key': name, 'content_type': content_type, 'max_bytes': max_bytes})
+        return {
+            'url': request.build_absolute_uri(reverse('property-image-local-upload')),
+            'fields': {'key': name, 'Content-Type': content_type, 'policy': policy},
+        }
+
+    def uploaded_size(self, name):
+        if not self.storage.exists(name):
+            return None
+        return self.storage.size(name)
+
+    def receive(self, fields, upload):
+        """Validate a posted form against its policy and store the file."""
+        policy = read_upload_token(fields.get('policy', ''))
+        if fields.get('key') != policy['key'] or fields.get('Content-Type') != policy['content_type']:
+            raise UploadError("Form fields do not match the upload policy")
+        if upload is None or not 0 < upload.size <= policy['max_bytes']:
+            raise UploadError("File is missing or exceeds the allowed size")
+        if self.storage.exists(policy['key']):
+            raise UploadError("Object already exists")
+        self.storage.save(policy['key'], upload)
+
+
+def get_upload_backend():
+    path = getattr(settings, 'PROPERTY_IMAGE_UPLOAD_BACKEND', 'properties.uploads.LocalUploadBackend')
+    return import_string(path)()
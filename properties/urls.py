@@ -1,14 +1,27 @@
-from django.urls import path, include
+from django.urls import path, re_path, include
 from .views import (
     PropertyListView,
+    CitySuggestionView,
+    PriceStatsView,
+    PropertyImportView,
+    PropertyExportView,
+    PropertyFacetView,
+    SearchIndexStatsView,
+    PropertyClusterView,
     PropertyDetailView,
+    SimilarPropertiesView,
     PropertyTypeListView,
     PropertyImageCreateView,
+    PropertyImageUploadView,
+    PropertyImageConfirmView,
+    LocalUploadView,
     PropertyImageDeleteView,
     PropertyImageListView,
     FavoriteViewSet,
+    SavedSearchViewSet,
     UserPropertyListView,
     ReservationViewSet,
+    ReservationExportView,
     PropertyAvailabilityView
 )
 from rest_framework.routers import DefaultRouter
@@ -16,21 +29,34 @@ from rest_framework.routers import DefaultRouter
 # Initialize the router and register viewsets
 router = DefaultRouter()
 router.register(r'favorites', FavoriteViewSet, basename='favorite')
+router.register(r'saved-searches', SavedSearchViewSet, basename='saved-search')
 router.register(r'reservations', ReservationViewSet, basename='reservation')
 
 urlpatterns = [
     # Existing property-related URLs
     path('properties/', PropertyListView.as_view(), name='property-list'),
+    path('properties/import/', PropertyImportView.as_view(), name='property-import'),
+    re_path(r'^properties/export\.(?P<export_format>csv|ndjson)$', PropertyExportView.as_view(), name='property-export'),
+    path('properties/facets/', PropertyFacetView.as_view(), name='property-facets'),
+    path('properties/search-index/stats/', SearchIndexStatsView.as_view(), name='search-index-stats'),
+    path('properties/price-stats/', PriceStatsView.as_view(), name='price-stats'),
+    path('properties/cities/suggest/', CitySuggestionView.as_view(), name='city-suggest'),
+    path('properties/clusters/', PropertyClusterView.as_view(), name='property-clusters'),
     path('properties/<int:pk>/', PropertyDetailView.as_view(), name='property-detail'),
+    path('properties/<int:pk>/similar/', SimilarPropertiesView.as_view(), name='property-similar'),
     path('property-types/', PropertyTypeListView.as_view(), name='property-types'),
     path('my-properties/', UserPropertyListView.as_view(), name='user-properties'),
     path('property-images/', PropertyImageCreateView.as_view(), name='property-images-create'),
+    path('property-images/uploads/', PropertyImageUploadView.as_view(), name='property-image-upload'),
+    path('property-images/uploads/confirm/', PropertyImageConfirmView.as_view(), name='property-image-upload-confirm'),
+    path('property-images/uploads/local/', LocalUploadView.as_view(), name='property-image-local-upload'),
     path('property-images/<int:pk>/delete/', PropertyImageDeleteView.as_view(), name='property-image-delete'),
     path('property-images/list/', PropertyImageListView.as_view(), name='property-images-list'),
     
     # New reservation-related URL
     path('property-availability/', PropertyAvailabilityView.as_view(), name='property-availability'),
+    re_path(r'^reservations/export\.(?P<export_format>csv|ndjson)$', ReservationExportView.as_view(), name='reservation-export'),
 
-    # Include router URLs (favorites and reservations)
+    # Include router URLs (favorites, saved searches and reservations)
     path('', include(router.urls)),
 ]
\ No newline at end of file
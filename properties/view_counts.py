@@ -0,0 +1,229 @@
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, PositiveBigIntegerField, PositiveIntegerField, Value, When
+from django.utils import timezone
+
+from .cache import LIST_NAMESPACE, bump_generation, property_namespace
+from .models import Property, PropertyStats, PropertyViewFlush
+
+logger = logging.getLogger(__name__)
+
+# A visitor's repeat views of a listing within this window count once
+VIEW_WINDOW_SECONDS = getattr(settings, 'PROPERTY_VIEW_WINDOW_SECONDS', 30 * 60)
+TRUSTED_PROXIES = getattr(settings, 'PROPERTY_VIEW_TRUSTED_PROXIES', 0)
+PENDING_KEY = 'pv:pending'
+FLUSHING_KEY = 'pv:flushing'
+# Field of the flushing hash holding the batch id (the others are listing ids)
+BATCH_FIELD = 'batch'
+FLUSH_CHUNK_SIZE = 500
+
+
+def seen_key(property_id, window):
+    return f'pv:seen:{property_id}:{window}'
+
+
+def uniques_key(property_id):
+    return f'pv:uniques:{property_id}'
+
+
+def client_ip(request):
+    """
+    REMOTE_ADDR, or the address the outermost trusted proxy saw. Entries to
+    the left of that in X-Forwarded-For come from the client and are ignored.
+    """
+    if TRUSTED_PROXIES:
+        hops = [hop.strip() for hop in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if hop.strip()]
+        if len(hops) >= TRUSTED_PROXIES:
+            return hops[-TRUSTED_PROXIES]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def visitor_id(request):
+    """Short, stable id for the user, or for the client IP when anonymous."""
+    if request.user.is_authenticated:
+        identity = f'u:{request.user.pk}'
+    else:
+        identity = 'ip:' + client_ip(request)
+    return hashlib.md5(identity.encode('utf-8')).hexdigest()[:16]
+
+
+class RedisViewCounter:
+    """
+    Views are buffered in Redis: a per-window set of visitors per listing
+    drops repeat views, ``HINCRBY`` on one hash counts the rest, and a
+    HyperLogLog per listing (at most 12 KB) estimates distinct viewers.
+    """
+
+    def __init__(self, client=None):
+        if client is None:
+            from django_redis import get_redis_connection
+            client = get_redis_connection('default')
+        self.client = client
+
+    def record(self, property_id, visitor):
+        window = int(time.time() // VIEW_WINDOW_SECONDS)
+        key = seen_key(property_id, window)
+        pipe = self.client.pipeline()
+        pipe.sadd(key, visitor)
+        pipe.expire(key, VIEW_WINDOW_SECONDS)
+        pipe.pfadd(uniques_key(property_id), visitor)
+        is_new = pipe.execute()[0]
+        if is_new:
+            self.client.hincrby(PENDING_KEY, property_id, 1)
+
+    def drain(self):
+        """
+        Move the pending counts aside and return ``(batch_id, {property_id:
+        (views, unique_viewers)})``. A batch left by a flush that failed is
+        returned again, with the same id, until ack() confirms it was stored.
+        """
+        from redis.exceptions import ResponseError
+        if not self.client.exists(FLUSHING_KEY):
+            try:
+                # Atomic: views recorded from here on go to a fresh hash
+                self.client.rename(PENDING_KEY, FLUSHING_KEY)
+            except ResponseError:
+                return None, {}  # Nothing pending
+        # The id lives in the batch itself; set once, even across a crash here
+        self.client.hsetnx(FLUSHING_KEY, BATCH_FIELD, uuid.uuid4().hex)
+        fields = {_text(key): value for key, value in self.client.hgetall(FLUSHING_KEY).items()}
+        batch_id = _text(fields.pop(BATCH_FIELD))
+        views = {int(pk): int(count) for pk, count in fields.items()}
+        pipe = self.client.pipeline()
+        for property_id in views:
+            pipe.pfcount(uniques_key(property_id))
+        return batch_id, {
+            property_id: (count, uniques)
+            for (property_id, count), uniques in zip(views.items(), pipe.execute())
+        }
+
+    def ack(self, batch_id):
+        """Drop the batch, unless a newer one has taken its place meanwhile."""
+        def delete_if_current(pipe):
+            if _text(pipe.hget(FLUSHING_KEY, BATCH_FIELD)) == batch_id:
+                pipe.multi()
+                pipe.delete(FLUSHING_KEY)
+        self.client.transaction(delete_if_current, FLUSHING_KEY)
+
+
+def _text(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+class LocalViewCounter:
+    """
+    In-process stand-in used when the cache is not Redis (development and
+    tests). Same behaviour, but counts are per process and exact.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seen = {}
+        self._uniques = defaultdict(set)
+        self._pending = defaultdict(int)
+        self._flushing = None
+        self._batch_id = None
+
+    def record(self, property_id, visitor):
+        window = int(time.time() // VIEW_WINDOW_SECONDS)
+        with self._lock:
+            self._uniques[property_id].add(visitor)
+            if self._seen.get((property_id, visitor)) != window:
+                self._seen[(property_id, visitor)] = window
+                self._pending[property_id] += 1
+
+    def drain(self):
+        with self._lock:
+            if self._flushing is None:
+                if not self._pending:
+                    return None, {}
+                self._flushing, self._pending = self._pending, defaultdict(int)
+                self._batch_id = uuid.uuid4().hex
+            return self._batch_id, {
+                property_id: (count, len(self._uniques[property_id]))
+                for property_id, count in self._flushing.items()
+            }
+
+    def ack(self, batch_id):
+        with self._lock:
+            if batch_id == self._batch_id:
+                self._flushing = None
+
+
+_local_counter = LocalViewCounter()
+
+
+def get_view_counter():
+    if 'django_redis' in settings.CACHES.get('default', {}).get('BACKEND', ''):
+        return RedisViewCounter()
+    return _local_counter
+
+
+def record_view(request, property_id):
+    """Count a detail view. Never fails the request: counting is best effort."""
+    try:
+        get_view_counter().record(property_id, visitor_id(request))
+    except Exception as e:
+        logger.warning(f"Could not record view of property {property_id}: {str(e)}")
+
+
+def _apply_counts(pending, now):
+    """Add ``pending`` to PropertyStats and return the listing ids updated."""
+    # Listings deleted since they were viewed are dropped
+    ids = list(Property.objects.filter(pk__in=pending).values_list('pk', flat=True))
+    PropertyStats.objects.bulk_create(
+        [PropertyStats(property_id=property_id, flushed_at=now) for property_id in ids],
+        ignore_conflicts=True,
+    )
+    for start in range(0, len(ids), FLUSH_CHUNK_SIZE):
+        chunk = ids[start:start + FLUSH_CHUNK_SIZE]
+        # One UPDATE per chunk; the database adds to whatever total it holds
+        PropertyStats.objects.filter(pk__in=chunk).update(
+            views=F('views') + Case(
+                *[When(pk=property_id, then=Value(pending[property_id][0])) for property_id in chunk],
+                default=Value(0), output_field=PositiveBigIntegerField(),
+            ),
+            unique_viewers=Case(
+                *[When(pk=property_id, then=Value(pending[property_id][1])) for property_id in chunk],
+                default=F('unique_viewers'), output_field=PositiveIntegerField(),
+            ),
+            flushed_at=now,
+        )
+    return ids
+
+
+def flush_view_counts(counter=None):
+    """
+    Add the buffered counts to PropertyStats and return how many listings
+    were updated. A batch is applied exactly once: its PropertyViewFlush row
+    is inserted in the same transaction as the increments, so a batch
+    retried after a crash before ack() is only acknowledged.
+    """
+    counter = counter or get_view_counter()
+    batch_id, pending = counter.drain()
+    if batch_id is None:
+        return 0
+    now = timezone.now()
+    ids = []
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                PropertyViewFlush.objects.create(batch=batch_id, flushed_at=now)
+        except IntegrityError:
+            logger.info(f"View batch {batch_id} was already flushed")
+        else:
+            ids = _apply_counts(pending, now)
+            PropertyViewFlush.objects.filter(flushed_at__lt=now - timedelta(days=1)).delete()
+    counter.ack(batch_id)
+    # Cached detail and list pages, and their ETags, show the counts
+    if ids:
+        bump_generation(LIST_NAMESPACE, *[property_namespace(property_id) for property_id in ids])
+    return len(ids)
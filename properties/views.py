@@ -1,5 +1,6 @@
-from rest_framework import generics, status, viewsets, serializers
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework import generics, status, viewsets, serializers, mixins
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, IsAdminUser
 from rest_framework.pagination import PageNumberPagination
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework_simplejwt.authentication import JWTAuthentication
@@ -8,16 +9,68 @@ from rest_framework.response import Response
 from django.core.cache import cache
 from django.core.cache.backends.base import DEFAULT_TIMEOUT
 from django.conf import settings
-from django.db.models import Prefetch
-from .models import PropertyType, PropertyImage, Property, Favorite, Reservation
+from django.http import HttpResponse
+from django.utils import timezone
+from .models import (
+    PropertyType, PropertyImage, Property, Favorite, Reservation, CityPriceStats,
+    SavedSearch, SavedSearchMatch,
+)
+from .pagination import PropertyKeysetPagination
+from .search import suggest_cities
+from .filters import PROPERTY_FILTERSET_FIELDS, annotate_is_favorited, filter_properties
+from .geo import parse_bbox
+from .maps import get_clusters
+from .facets import compute_facets
+from .importer import ImportFormatError, PropertyImporter, iter_records
+from .uploads import (
+    UPLOAD_EXPIRES_SECONDS,
+    UPLOAD_MAX_BYTES,
+    LocalUploadBackend,
+    UploadError,
+    get_upload_backend,
+    make_upload_token,
+    new_upload_key,
+    read_upload_token,
+)
+from .export import (
+    PROPERTY_EXPORT_COLUMNS,
+    RESERVATION_EXPORT_COLUMNS,
+    ExportContentNegotiation,
+    export_response,
+)
+from .search_index import ORDERINGS, search_index, is_enabled as search_index_enabled
+from .view_counts import record_view
+from .similarity import FEATURE_FIELDS, similarity_index, is_enabled as similarity_enabled
+from .fast_serializers import FastPathUnsupported, ValuesRowSerializer
+from .conditional import conditional, make_etag, not_modified, set_validators
+from .cache import (
+    PROPERTY_TYPE_NAMESPACE,
+    get_generations,
+    owner_namespace,
+    property_namespace,
+    query_fingerprint,
+    property_list_cache_key,
+    property_facets_cache_key,
+    property_detail_cache_key,
+    property_images_cache_key,
+    property_types_cache_key,
+    price_stats_cache_key,
+    favorite_cards_cache_key,
+    favorite_ids_cache_key,
+)
 from .serializers import (
     PropertyTypeSerializer,
+    CityPriceStatsSerializer,
     PropertyImageSerializer,
     PropertySerializer,
     PropertySerializer2,
     CreateFavoriteSerializer,
+    FavoriteCardSerializer,
     FavoriteSerializer,
-    ReservationSerializer
+    ReservationSerializer,
+    SavedSearchSerializer,
+    SavedSearchMatchSerializer,
+    requested_fieldset,
 )
 from rest_framework.parsers import MultiPartParser, FormParser
 
@@ -28,55 +81,161 @@ class StandardResultsSetPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 100
 
-class PropertyListView(generics.ListCreateAPIView):
+class SparseFieldsetMixin:
+    """
+    Only join/prefetch the relations the response will render: relations
+    behind fields dropped with ``?fields=``/``?omit=`` are skipped.
+    """
+    # Serializer field name -> select_related / prefetch_related paths it needs
+    select_related_fields = {}
+    prefetch_related_fields = {}
+    # Serializer field name -> function(queryset, user) adding the annotation it reads
+    annotated_fields = {}
+
+    def field_wanted(self, name):
+        fields, omit = requested_fieldset(self.request)
+        return (fields is None or name in fields) and name not in (omit or [])
+
+    def optimize_queryset(self, queryset):
+        wanted = self.field_wanted
+        select = [path for name, paths in self.select_related_fields.items() if wanted(name) for path in paths]
+        prefetch = [path for name, paths in self.prefetch_related_fields.items() if wanted(name) for path in paths]
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        for name, annotate in self.annotated_fields.items():
+            if wanted(name):
+                queryset = annotate(queryset, self.request.user)
+        return queryset
+
+
+class ValuesListMixin:
+    """
+    Serve list pages from ``values()`` rows through ValuesRowSerializer
+    instead of hydrating model instances and binding a serializer per row.
+    Falls back to the regular serializer when a field cannot be served
+    from columns.
+    """
+    # Columns the paginators order and seek on
+    pagination_columns = ['id', 'created_at', 'price']
+
+    def get_values_serializer(self):
+        try:
+            return ValuesRowSerializer(self.get_serializer())
+        except FastPathUnsupported:
+            return None
+
+    def values_queryset(self, queryset, values_serializer):
+        columns = dict.fromkeys(values_serializer.columns + self.pagination_columns)
+        return queryset.values(*columns)
+
+    def list_values(self, rows, values_serializer):
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(values_serializer.to_representation(page))
+        return Response(values_serializer.to_representation(rows))
+
+    def list(self, request, *args, **kwargs):
+        values_serializer = self.get_values_serializer()
+        if values_serializer is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.list_values(self.values_queryset(queryset, values_serializer), values_serializer)
+
+
+class PropertyListView(ValuesListMixin, SparseFieldsetMixin, generics.ListCreateAPIView):
     serializer_class = PropertySerializer2
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['listing_type', 'bedrooms', 'bathrooms', 'property_type__name']
+    filterset_fields = PROPERTY_FILTERSET_FIELDS
     permission_classes = [IsAuthenticatedOrReadOnly]
     authentication_classes = [JWTAuthentication]
     pagination_class = StandardResultsSetPagination
+    select_related_fields = {
+        'property_type': ['property_type'], 'owner': ['owner'],
+        'view_count': ['stats'], 'unique_viewers': ['stats'],
+    }
+    annotated_fields = {'is_favorited': annotate_is_favorited}
+
+    @property
+    def paginator(self):
+        """
+        Use keyset pagination when the client asks for it (``?pagination=cursor``
+        or a ``cursor`` param); it skips the COUNT(*) and OFFSET scan.
+        """
+        if not hasattr(self, '_paginator'):
+            if PropertyKeysetPagination.is_requested(self.request):
+                self._paginator = PropertyKeysetPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_base_queryset(self):
+        # Optimize query with select_related; the thumbnail comes from
+        # Property.primary_image_path, so images need no prefetch
+        return self.optimize_queryset(Property.objects.all())
 
     def get_queryset(self):
-        cache_key = f"property_list_{self.request.query_params}"
-        queryset = cache.get(cache_key)
+        queryset = filter_properties(self.get_base_queryset(), self.request.query_params)
+        # The search index's order, ties newest id first, so both paths
+        # return the same pages
+        ordering = self.request.query_params.get('ordering', '-created_at')
+        if ordering not in ORDERINGS:
+            ordering = '-created_at'
+        return queryset.order_by(ordering, '-id' if ordering.startswith('-') else 'id')
+
+    def list(self, request, *args, **kwargs):
+        """
+        Serve the rendered JSON page from cache. Only the final bytes are
+        cached (after pagination and serialization), so a hit runs no SQL.
+        """
+        if request.accepted_renderer.format != 'json':
+            return self.list_uncached(request, *args, **kwargs)
 
-        if queryset is None:
-            queryset = Property.objects.all()
+        # The key embeds the list generation, so it doubles as the page's ETag.
+        # is_favorited makes an authenticated user's page their own.
+        per_user = request.user.is_authenticated and self.field_wanted('is_favorited')
+        cache_key = property_list_cache_key(request, request.user.pk if per_user else None)
+        etag = make_etag(cache_key)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
 
-            # Optimize query with select_related and prefetch_related
-            queryset = queryset.select_related('property_type', 'owner') \
-                .prefetch_related(
-                Prefetch('images')
-            )
+        content = cache.get(cache_key)
+        if content is not None:
+            response = HttpResponse(content, content_type=request.accepted_renderer.media_type)
+            return set_validators(response, etag)
 
-            # Apply filters
-            min_price = self.request.query_params.get('min_price')
-            max_price = self.request.query_params.get('max_price')
-            city = self.request.query_params.get('city')
-            property_type = self.request.query_params.get('property_type')
-            listing_type = self.request.query_params.get('listing_type')
-            owner = self.request.query_params.get('owner')
+        response = self.list_uncached(request, *args, **kwargs)
 
-            try:
-                if min_price:
-                    queryset = queryset.filter(price__gte=float(min_price))
-                if max_price:
-                    queryset = queryset.filter(price__lte=float(max_price))
-                if city:
-                    queryset = queryset.filter(city__icontains=city)
-                if property_type:
-                    queryset = queryset.filter(property_type__name__icontains=property_type)
-                if listing_type:
-                    queryset = queryset.filter(listing_type__icontains=listing_type)
-                if owner:
-                    queryset = queryset.filter(owner_id=owner)
-
-                cache.set(cache_key, queryset, CACHE_TTL)
-
-            except ValueError as e:
-                print(f"Filtering error: {str(e)}")
+        def store_page(rendered):
+            if rendered.status_code == status.HTTP_200_OK:
+                cache.set(cache_key, rendered.content, CACHE_TTL)
 
-        return queryset
+        response.add_post_render_callback(store_page)
+        return set_validators(response, etag)
+
+    def list_uncached(self, request, *args, **kwargs):
+        """
+        Answer from the in-process search index when it is enabled and can
+        evaluate every filter; otherwise run the SQL path. Either way rows
+        are serialized from ``values()`` when the fieldset allows it.
+        """
+        values_serializer = self.get_values_serializer()
+        results = None
+        if search_index_enabled():
+            queryset = self.get_base_queryset()
+            if values_serializer is not None:
+                queryset = self.values_queryset(queryset, values_serializer)
+            results = search_index.lookup(request.query_params, queryset)
+        if results is None:
+            return super().list(request, *args, **kwargs)
+
+        if values_serializer is not None:
+            return self.list_values(results, values_serializer)
+        page = self.paginate_queryset(results)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
@@ -91,22 +250,228 @@ class PropertyListView(generics.ListCreateAPIView):
             )
 
 
+class PropertyImportView(generics.GenericAPIView):
+    """
+    Bulk import of properties owned by the requesting user.
+
+    Accepts a CSV (header row of Property field names) or NDJSON body, either
+    raw with a ``text/csv`` / ``application/x-ndjson`` content type or as a
+    multipart ``file`` upload. The input is parsed line by line and valid
+    rows are inserted in batches; the response reports per-line errors.
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [JWTAuthentication]
+    parser_classes = (MultiPartParser,)
+    content_types = {
+        'text/csv': 'csv',
+        'application/x-ndjson': 'ndjson',
+        'application/ndjson': 'ndjson',
+        'application/jsonl': 'ndjson',
+    }
+    extensions = {'csv': 'csv', 'ndjson': 'ndjson', 'jsonl': 'ndjson'}
+
+    def get_source(self, request):
+        """Return ``(lines, import_format)`` for the uploaded file or raw body."""
+        if request.content_type.startswith('multipart/'):
+            upload = request.FILES.get('file')
+            if upload is None:
+                raise ImportFormatError("Missing file upload")
+            extension = upload.name.rsplit('.', 1)[-1].lower()
+            import_format = self.extensions.get(extension) or self.content_types.get(upload.content_type)
+            return upload, import_format
+        # Read the raw body as a stream instead of buffering request.data
+        media_type = request.content_type.split(';')[0].strip().lower()
+        return request._request, self.content_types.get(media_type)
+
+    def post(self, request, *args, **kwargs):
+        try:
+            lines, import_format = self.get_source(request)
+            records = iter_records(lines, import_format)
+            report = PropertyImporter(request.user).run(records)
+        except ImportFormatError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_200_OK)
+
+
+class PropertyExportView(generics.GenericAPIView):
+    """
+    Streams every property matching the PropertyListView filters as
+    ``export.csv`` or ``export.ndjson``, gzip-encoded when accepted.
+    """
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = PROPERTY_FILTERSET_FIELDS
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [JWTAuthentication]
+    content_negotiation_class = ExportContentNegotiation
+
+    def get_queryset(self):
+        return filter_properties(Property.objects.all(), self.request.query_params)
+
+    def get(self, request, export_format, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).order_by('pk')
+        return export_response(request, queryset, PROPERTY_EXPORT_COLUMNS, export_format, 'properties')
+
+
+class PropertyFacetView(generics.GenericAPIView):
+    """
+    Facet counts for the search sidebar. Accepts the same filters as
+    PropertyListView and is cached under the same list generation.
+    """
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = PROPERTY_FILTERSET_FIELDS
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get_queryset(self):
+        return filter_properties(Property.objects.all(), self.request.query_params)
+
+    def get(self, request, *args, **kwargs):
+        cache_key = property_facets_cache_key(request)
+        facets = cache.get(cache_key)
+        if facets is None:
+            facets = compute_facets(self.filter_queryset(self.get_queryset()))
+            cache.set(cache_key, facets, CACHE_TTL)
+        return Response(facets)
+
+
+class SearchIndexStatsView(generics.GenericAPIView):
+    """
+    Hit/miss and timing stats of this worker's in-process search index.
+    """
+    permission_classes = [IsAdminUser]
+    authentication_classes = [JWTAuthentication]
+
+    def get(self, request, *args, **kwargs):
+        return Response({"enabled": search_index_enabled(), **search_index.stats()})
+
+
+class PriceStatsView(generics.GenericAPIView):
+    """
+    Typical prices (p25/median/p75 and median price per square foot) by
+    city, listing type and bedrooms, e.g. ?city=Nairobi&listing_type=rent.
+    Read from the table the refresh_price_stats task fills, never from
+    the live listings.
+    """
+    serializer_class = CityPriceStatsSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get_queryset(self):
+        queryset = CityPriceStats.objects.all()
+        params = self.request.query_params
+        if params.get('city'):
+            queryset = queryset.filter(city=params['city'].strip().lower())
+        if params.get('listing_type'):
+            queryset = queryset.filter(listing_type=params['listing_type'].lower())
+        if params.get('bedrooms'):
+            queryset = queryset.filter(bedrooms=int(params['bedrooms']))
+        return queryset
+
+    def get(self, request, *args, **kwargs):
+        cache_key = price_stats_cache_key(request)
+        data = cache.get(cache_key)
+        if data is None:
+            try:
+                queryset = self.get_queryset()
+            except ValueError:
+                return Response({"error": "bedrooms must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+            data = {"results": list(self.get_serializer(queryset, many=True).data)}
+            cache.set(cache_key, data, CACHE_TTL)
+        return Response(data)
+
+
+class CitySuggestionView(generics.GenericAPIView):
+    """
+    "Did you mean" suggestions for a misspelt city, e.g. ?q=nairbi.
+    """
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    max_suggestions = 5
+
+    def get(self, request, *args, **kwargs):
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({"error": "Missing required q parameter"}, status=400)
+        return Response({
+            "query": text,
+            "suggestions": suggest_cities(text, limit=self.max_suggestions),
+        })
+
+
+class PropertyClusterView(generics.GenericAPIView):
+    """
+    Server-side map clustering: pin counts per grid cell for a viewport.
+    Expects ?bbox=min_lng,min_lat,max_lng,max_lat&zoom=<0-20>.
+    """
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get(self, request, *args, **kwargs):
+        bbox = request.query_params.get('bbox')
+        zoom = request.query_params.get('zoom')
+        if not bbox or zoom is None:
+            return Response({"error": "Missing required bbox and zoom parameters"}, status=400)
+
+        try:
+            zoom = int(zoom)
+            clusters = get_clusters(*parse_bbox(bbox), zoom)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+
+        return Response({"zoom": zoom, "clusters": clusters})
+
+
 class PropertyDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Property.objects.select_related('property_type', 'owner') \
+    queryset = Property.objects.select_related('property_type', 'owner', 'stats') \
         .prefetch_related('images')
     serializer_class = PropertySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     authentication_classes = [JWTAuthentication]
 
     def get_object(self):
+        """
+        Cache individual property details. The key embeds the property's
+        generation, so any change to it or its images misses naturally. The
+        entry also records the owner generation it was built under and is
+        rebuilt once that moves, so the embedded owner is never stale.
+        """
+        cache_key = property_detail_cache_key(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        cached = cache.get(cache_key)
+        if cached is not None:
+            obj, owner_generation = cached
+            if get_generations(owner_namespace(obj.owner_id)) == [owner_generation]:
+                self.check_object_permissions(self.request, obj)
+                return obj
         obj = super().get_object()
-        # Cache individual property details
-        cache_key = f"property_detail_{obj.id}"
-        cached_data = cache.get(cache_key)
-        if cached_data is None:
-            cache.set(cache_key, obj, CACHE_TTL)
+        owner_generation, = get_generations(owner_namespace(obj.owner_id))
+        cache.set(cache_key, (obj, owner_generation), CACHE_TTL)
         return obj
 
+    def get_etag(self, request, instance):
+        """
+        Strong ETag over the listing's updated_at and the generations the
+        cached instance depends on (property: images, reservations,
+        favorites; owner; property types), plus the sparse fieldset and
+        format the response is rendered with.
+        """
+        generations = get_generations(
+            property_namespace(instance.pk), owner_namespace(instance.owner_id), PROPERTY_TYPE_NAMESPACE,
+        )
+        return make_etag(
+            instance.pk, instance.updated_at.isoformat(), *generations,
+            query_fingerprint(request.query_params), request.accepted_renderer.format,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        # Answer If-None-Match from the cached instance, before anything is
+        # serialized. No Last-Modified: image changes leave updated_at alone,
+        # so only the ETag covers every input.
+        instance = self.get_object()
+        # Buffered in Redis; flush_property_views writes the totals
+        record_view(request, instance.pk)
+        etag = self.get_etag(request, instance)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        serializer = self.get_serializer(instance)
+        return set_validators(Response(serializer.data), etag)
+
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
         if instance.owner != request.user:
@@ -114,10 +479,7 @@ class PropertyDetailView(generics.RetrieveUpdateDestroyAPIView):
                 {"detail": "You do not have permission to update this property."},
                 status=status.HTTP_403_FORBIDDEN
             )
-        response = super().update(request, *args, **kwargs)
-        # Invalidate cache after update
-        cache.delete(f"property_detail_{instance.id}")
-        return response
+        return super().update(request, *args, **kwargs)
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -126,10 +488,65 @@ class PropertyDetailView(generics.RetrieveUpdateDestroyAPIView):
                 {"detail": "You do not have permission to delete this property."},
                 status=status.HTTP_403_FORBIDDEN
             )
-        response = super().destroy(request, *args, **kwargs)
-        # Invalidate cache after deletion
-        cache.delete(f"property_detail_{instance.id}")
-        return response
+        return super().destroy(request, *args, **kwargs)
+
+
+def property_types_validators(view, request, *args, **kwargs):
+    generation, = get_generations(PROPERTY_TYPE_NAMESPACE)
+    etag = make_etag(generation, query_fingerprint(request.query_params), request.accepted_renderer.format)
+    return etag, None
+
+
+class SimilarPropertiesView(ValuesListMixin, SparseFieldsetMixin, generics.GenericAPIView):
+    """
+    Available listings most like this one by price, size, rooms, location
+    and type, best match first. Scored in-process against the cached feature
+    matrix, then the top ids are hydrated in one query.
+    """
+    serializer_class = PropertySerializer2
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    authentication_classes = [JWTAuthentication]
+    select_related_fields = {
+        'property_type': ['property_type'], 'owner': ['owner'],
+        'view_count': ['stats'], 'unique_viewers': ['stats'],
+    }
+    annotated_fields = {'is_favorited': annotate_is_favorited}
+    default_limit = 6
+    max_limit = 24
+
+    def get(self, request, pk, *args, **kwargs):
+        if not similarity_enabled():
+            return Response({"detail": "Similar listings are unavailable."}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, self.max_limit))
+
+        row = Property.objects.filter(pk=pk).values_list(*FEATURE_FIELDS).first()
+        if row is None:
+            return Response({"detail": "Property not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        # Ask for spares in case some were sold since the matrix was refreshed
+        ids = similarity_index.similar(row, limit * 2)
+        if ids is None:
+            # Built by the refresh_similarity_matrix task, never in a request
+            response = Response({"detail": "Similar listings are not ready yet."},
+                                status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response['Retry-After'] = '60'
+            return response
+        queryset = self.optimize_queryset(Property.objects.filter(pk__in=ids, status='available'))
+        values_serializer = self.get_values_serializer()
+        if values_serializer is not None:
+            queryset = self.values_queryset(queryset, values_serializer)
+        found = {item['id'] if isinstance(item, dict) else item.pk: item for item in queryset}
+        results = [found[pk] for pk in ids if pk in found][:limit]
+
+        if values_serializer is not None:
+            data = values_serializer.to_representation(results)
+        else:
+            data = self.get_serializer(results, many=True).data
+        return Response({"count": len(data), "results": data})
 
 
 class PropertyTypeListView(generics.ListAPIView):
@@ -138,8 +555,12 @@ class PropertyTypeListView(generics.ListAPIView):
     authentication_classes = [JWTAuthentication]
     pagination_class = StandardResultsSetPagination
 
+    @conditional(property_types_validators)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     def get_queryset(self):
-        cache_key = "property_types_list"
+        cache_key = property_types_cache_key()
         queryset = cache.get(cache_key)
 
         if queryset is None:
@@ -156,12 +577,14 @@ class PropertyImageListView(generics.ListAPIView):
 
     def get_queryset(self):
         property_id = self.request.query_params.get('property_id')
-        cache_key = f"property_images_{property_id}"
+        cache_key = property_images_cache_key(property_id)
         queryset = cache.get(cache_key)
 
         if queryset is None:
-            queryset = PropertyImage.objects.filter(property_id=property_id) \
+            queryset = list(
+                PropertyImage.objects.filter(property_id=property_id)
                 .select_related('property')
+            )
             cache.set(cache_key, queryset, CACHE_TTL)
 
         return queryset
@@ -174,15 +597,101 @@ class PropertyImageCreateView(generics.CreateAPIView):
 
     def perform_create(self, serializer):
         try:
-            instance = serializer.save()
-            # Invalidate image cache for this property
-            cache.delete(f"property_images_{instance.property_id}")
-            return instance
+            return serializer.save()
         except Exception as e:
             print("Error details:", str(e))
             raise ValidationError(f"Error creating property image: {str(e)}")
 
 
+class PropertyImageUploadView(generics.GenericAPIView):
+    """
+    Step one of a direct-to-storage upload. Returns a presigned POST (``url``
+    plus form ``fields``) the client sends the file to, bypassing the API
+    workers, and an ``upload_token`` for PropertyImageConfirmView.
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [JWTAuthentication]
+
+    def post(self, request, *args, **kwargs):
+        property_obj = Property.objects.filter(
+            pk=request.data.get('property') or 0, owner=request.user
+        ).first()
+        if property_obj is None:
+            return Response({"detail": "Property not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            key = new_upload_key(request.data.get('content_type'))
+        except UploadError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        presigned = get_upload_backend().presign(request, key, request.data['content_type'], UPLOAD_MAX_BYTES)
+        return Response({
+            "url": presigned['url'],
+            "fields": presigned['fields'],
+            "key": key,
+            "upload_token": make_upload_token({'key': key, 'property': property_obj.pk, 'user': request.user.pk}),
+            "expires_in": UPLOAD_EXPIRES_SECONDS,
+            "max_bytes": UPLOAD_MAX_BYTES,
+        }, status=status.HTTP_201_CREATED)
+
+
+class PropertyImageConfirmView(generics.GenericAPIView):
+    """
+    Step two: once the object is in storage, create its PropertyImage row.
+    Confirming the same upload twice returns the existing image.
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [JWTAuthentication]
+    serializer_class = PropertyImageSerializer
+
+    def post(self, request, *args, **kwargs):
+        try:
+            upload = read_upload_token(request.data.get('upload_token', ''))
+        except UploadError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if upload['user'] != request.user.pk:
+            return Response({"detail": "Not authorized."}, status=status.HTTP_403_FORBIDDEN)
+
+        existing = PropertyImage.objects.filter(image=upload['key']).first()
+        if existing is not None:
+            return Response(self.get_serializer(existing).data)
+
+        size = get_upload_backend().uploaded_size(upload['key'])
+        if size is None:
+            return Response({"detail": "Upload not found."}, status=status.HTTP_400_BAD_REQUEST)
+
+        image = PropertyImage(
+            property_id=upload['property'],
+            image=upload['key'],
+            is_primary=serializers.BooleanField().to_internal_value(request.data.get('is_primary', False)),
+        )
+        try:
+            image.save()
+        except ValidationError as e:
+            return Response({"detail": e.messages}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(image).data, status=status.HTTP_201_CREATED)
+
+
+class LocalUploadView(generics.GenericAPIView):
+    """
+    Receives "presigned" form posts for LocalUploadBackend, standing in for
+    S3 in development and tests. The signed policy is the credential.
+    """
+    permission_classes = []
+    authentication_classes = []
+    parser_classes = (MultiPartParser,)
+
+    def post(self, request, *args, **kwargs):
+        backend = get_upload_backend()
+        if not isinstance(backend, LocalUploadBackend):
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        try:
+            backend.receive(request.data, request.FILES.get('file'))
+        except UploadError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_403_FORBIDDEN)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class PropertyImageDeleteView(generics.DestroyAPIView):
     queryset = PropertyImage.objects.all()
     permission_classes = [IsAuthenticated]
@@ -191,10 +700,7 @@ class PropertyImageDeleteView(generics.DestroyAPIView):
     def destroy(self, request, *args, **kwargs):
         try:
             instance = self.get_object()
-            property_id = instance.property_id
             instance.delete()
-            # Invalidate image cache for this property
-            cache.delete(f"property_images_{property_id}")
             return Response(status=status.HTTP_204_NO_CONTENT)
         except PropertyImage.DoesNotExist:
             return Response(
@@ -208,37 +714,135 @@ class PropertyImageDeleteView(generics.DestroyAPIView):
             )
 
 
-class FavoriteViewSet(viewsets.ModelViewSet):
+class FavoriteViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = FavoriteSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
+    select_related_fields = {
+        'property': ['property', 'property__property_type', 'property__owner', 'property__stats'],
+    }
+    prefetch_related_fields = {'property': ['property__images']}
 
     def get_queryset(self):
         # Filter favorites to return only those for the authenticated user
-        return Favorite.objects.filter(user=self.request.user).select_related('property', 'property__property_type')
+        queryset = Favorite.objects.filter(user=self.request.user)
+        if self.action == 'list':
+            # Cards read a few property columns: one query per page, no prefetch
+            return queryset.select_related('property').only(*FavoriteCardSerializer.only_fields) \
+                .order_by('-created_at', '-id')
+        return self.optimize_queryset(queryset)
 
     def get_serializer_class(self):
         if self.action == 'create':
             return CreateFavoriteSerializer
+        if self.action == 'list':
+            return FavoriteCardSerializer
         return FavoriteSerializer
 
+    def list(self, request, *args, **kwargs):
+        """
+        The user's favorites as compact listing cards, newest first. The
+        rendered page is cached per user until a favorite is added or
+        removed, or a listing changes; the key doubles as the ETag.
+        """
+        if request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+
+        cache_key = favorite_cards_cache_key(request)
+        etag = make_etag(cache_key)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        content = cache.get(cache_key)
+        if content is not None:
+            response = HttpResponse(content, content_type=request.accepted_renderer.media_type)
+            return set_validators(response, etag)
+
+        response = super().list(request, *args, **kwargs)
+
+        def store_page(rendered):
+            if rendered.status_code == status.HTTP_200_OK:
+                cache.set(cache_key, rendered.content, CACHE_TTL)
+
+        response.add_post_render_callback(store_page)
+        return set_validators(response, etag)
+
     def perform_create(self, serializer):
         # Automatically associate the favorite with the authenticated user
-        instance = serializer.save(user=self.request.user)
-        # Invalidate favorites cache
-        cache.delete(f"user_favorites_{self.request.user.id}")
-        return instance
+        return serializer.save(user=self.request.user)
+
+    @action(detail=False, methods=['get'])
+    def ids(self, request):
+        """
+        Ids of the properties the user has favorited, newest first: enough
+        for clients to mark listings without fetching the full favorites.
+        """
+        cache_key = favorite_ids_cache_key(request.user.pk)
+        ids = cache.get(cache_key)
+        if ids is None:
+            ids = list(Favorite.objects.filter(user=request.user)
+                       .order_by('-created_at', '-id').values_list('property_id', flat=True))
+            cache.set(cache_key, ids, CACHE_TTL)
+        return Response({"count": len(ids), "ids": ids})
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         if instance.user != request.user:
             return Response({"detail": "Not authorized."}, status=403)
         instance.delete()
-        # Invalidate favorites cache
-        cache.delete(f"user_favorites_{self.request.user.id}")
         return Response(status=204)
 
-class UserPropertyListView(generics.ListAPIView):
+class SavedSearchViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                         mixins.UpdateModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    The user's saved list filters. New and updated listings are matched
+    against them in the background and land in ``inbox/``, so clients poll
+    one indexed table instead of re-running the searches.
+    """
+    serializer_class = SavedSearchSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = StandardResultsSetPagination
+
+    def get_queryset(self):
+        return SavedSearch.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        # Only listings that change from now on are matched
+        serializer.save(user=self.request.user, matched_until=timezone.now())
+
+    @action(detail=False, serializer_class=SavedSearchMatchSerializer)
+    def inbox(self, request):
+        """Matches newest first; ``?unseen=true`` and ``?saved_search=<id>`` narrow it."""
+        queryset = SavedSearchMatch.objects.filter(user=request.user).select_related('property').only(
+            'id', 'saved_search_id', 'property_id', 'created_at', 'seen_at',
+            'property__title', 'property__price', 'property__city',
+            'property__listing_type', 'property__primary_image_path',
+        )
+        if request.query_params.get('unseen', '').lower() in ('1', 'true'):
+            queryset = queryset.filter(seen_at__isnull=True)
+        if request.query_params.get('saved_search', '').isdigit():
+            queryset = queryset.filter(saved_search_id=request.query_params['saved_search'])
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    @action(detail=False, methods=['post'], url_path='inbox/seen')
+    def mark_seen(self, request):
+        """Mark the given match ``ids`` as seen, or the whole inbox if none are given."""
+        queryset = SavedSearchMatch.objects.filter(user=request.user, seen_at__isnull=True)
+        ids = request.data.get('ids')
+        if ids is not None:
+            try:
+                if not isinstance(ids, list):
+                    raise TypeError
+                ids = [int(pk) for pk in ids]
+            except (TypeError, ValueError):
+                return Response({"error": "ids must be a list of integers"}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(pk__in=ids)
+        return Response({"updated": queryset.update(seen_at=timezone.now())})
+
+
+class UserPropertyListView(ValuesListMixin, SparseFieldsetMixin, generics.ListAPIView):
     """
     View to list all properties owned by the authenticated user.
     """
@@ -246,25 +850,35 @@ class UserPropertyListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     authentication_classes = [JWTAuthentication]
     pagination_class = StandardResultsSetPagination
+    select_related_fields = {
+        'property_type': ['property_type'], 'owner': ['owner'],
+        'view_count': ['stats'], 'unique_viewers': ['stats'],
+    }
+    annotated_fields = {'is_favorited': annotate_is_favorited}
 
     def get_queryset(self):
         """
         This view returns a list of properties for the currently authenticated user.
         """
-        return Property.objects.filter(owner=self.request.user)
+        return self.optimize_queryset(Property.objects.filter(owner=self.request.user))
 
-class ReservationViewSet(viewsets.ModelViewSet):
+class ReservationViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = ReservationSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
+    select_related_fields = {
+        'property_details': ['property', 'property__owner', 'property__property_type', 'property__stats'],
+        'user_details': ['user'],
+    }
+    prefetch_related_fields = {'property_details': ['property__images']}
     
     def get_queryset(self):
         user = self.request.user
         if user.is_staff:
-            return Reservation.objects.all().select_related('property', 'user', 'property__owner')
-        return Reservation.objects.filter(
+            return self.optimize_queryset(Reservation.objects.all())
+        return self.optimize_queryset(Reservation.objects.filter(
             user=user
-        ).select_related('property', 'user', 'property__owner')
+        ))
     
     def perform_create(self, serializer):
         property_obj = serializer.validated_data['property']
@@ -311,6 +925,27 @@ class ReservationViewSet(viewsets.ModelViewSet):
             )
         return super().update(request, *args, **kwargs)
 
+class ReservationExportView(generics.GenericAPIView):
+    """
+    Streams reservations as ``export.csv`` or ``export.ndjson``: all of them
+    for staff, otherwise the user's own, like ReservationViewSet.
+    """
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['status', 'payment_status', 'property']
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [JWTAuthentication]
+    content_negotiation_class = ExportContentNegotiation
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.is_staff:
+            return Reservation.objects.all()
+        return Reservation.objects.filter(user=user)
+
+    def get(self, request, export_format, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).order_by('pk')
+        return export_response(request, queryset, RESERVATION_EXPORT_COLUMNS, export_format, 'reservations')
+
 # API endpoint to check property availability
 class PropertyAvailabilityView(generics.RetrieveAPIView):
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from properties.cache import bump_generation, property_reviews_namespace
+from .models import Review
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_review_cache(sender, instance, **kwargs):
+    bump_generation(property_reviews_namespace(instance.property_id))
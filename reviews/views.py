@@ -4,11 +4,18 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.decorators import action
 from django.core.exceptions import ValidationError
+from properties.cache import get_generations, property_reviews_namespace
+from properties.conditional import conditional, make_etag
 from .models import Review, Requests
 from .serializers import ReviewSerializer, RequestsSerializer
 from rest_framework import permissions
 
 
+def average_rating_validators(view, request, property_id=None, **kwargs):
+    generation, = get_generations(property_reviews_namespace(property_id))
+    return make_etag('average_rating', property_id, generation, request.accepted_renderer.format), None
+
+
 class ReviewViewSet(viewsets.ModelViewSet):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
@@ -50,6 +57,7 @@ class ReviewViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
     @action(detail=False, methods=['get'], url_path=r'property/(?P<property_id>\d+)/average-rating')
+    @conditional(average_rating_validators)
     def average_rating(self, request, property_id=None):
         # Filter reviews by the property ID
         reviews = Review.objects.filter(property_id=property_id)
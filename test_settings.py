@@ -91,6 +91,9 @@ STORAGES = {
     },
 }
 
+# Direct uploads go to the local storage instead of a presigned S3 POST
+PROPERTY_IMAGE_UPLOAD_BACKEND = 'properties.uploads.LocalUploadBackend'
+
 # Media/Static files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = 'test_media/'